@@ -0,0 +1 @@
+"""Benchmarks for the funds API, run them from the project root e.g. `python -m benchmarks.get_db_bench`."""
@@ -0,0 +1,206 @@
+"""Load test comparing the requests per second of the WSGI and the ASGI app as the number of clients grows.
+
+Each server runs in its own process. The WSGI app is served by a pool of `THREADS` threads, like the threads of a
+gunicorn worker, and the ASGI app by hypercorn on one event loop. Clients keep their connection open and send
+`GET /funds/<id>` requests one after the other for `DURATION` seconds, reconnecting when the server closes the
+connection.
+
+The `remote` storage adds `LATENCY` seconds to every database call but `refresh()`, standing in for the round trips
+to a MySQL server: a thread sleeps through it while a coroutine awaits it.
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import pathlib
+import random
+import socket
+import tempfile
+import time
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from .data import write_data_file
+
+
+COUNT = 10_000
+THREADS = 8
+CLIENTS = [8, 64, 256]
+DURATION = 3
+LATENCY = 0.005
+STORAGES = {'local': 0, 'remote': LATENCY}
+
+
+class _RemoteDb:
+    """Delays every call of the database by `latency` seconds, blocking the calling thread."""
+    def __init__(self, db, latency):
+        self.db = db
+        self.latency = latency
+
+    def refresh(self):
+        # MySQL databases are always up to date.
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+
+        def call(*args, **kwargs):
+            time.sleep(self.latency)
+            return method(*args, **kwargs)
+
+        return call
+
+
+class _AsyncRemoteDb(_RemoteDb):
+    """Delays every call of the database by `latency` seconds without blocking the event loop."""
+    async def refresh(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(self.latency)
+            return method(*args, **kwargs)
+
+        return call
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """Serves each connection in one of `threads` threads."""
+    multithread = True
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app, handler=_QuietHandler)
+        self._executor = concurrent.futures.ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def _serve_wsgi(port, path, latency):
+    from funds_api import create_app, database
+
+    if latency:
+        create_db = database._create_db
+        database._create_db = lambda config: _RemoteDb(create_db(config), latency)
+
+    app = create_app({'DATABASE_PATH': path, 'RESPONSE_CACHE': 'none'})
+    _PooledWSGIServer('127.0.0.1', port, app, THREADS).serve_forever()
+
+
+def _serve_asgi(port, path, latency):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    from funds_api import database
+    from funds_api.asgi import create_asgi_app
+
+    if latency:
+        database._create_async_db = lambda config: _AsyncRemoteDb(database._create_db(config), latency)
+
+    config = Config()
+    config.bind = [f'127.0.0.1:{port}']
+    config.accesslog = None
+    config.loglevel = 'WARNING'
+    config.backlog = 1024
+    asyncio.run(serve(create_asgi_app({'DATABASE_PATH': path, 'RESPONSE_CACHE': 'none'}), config))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(port):
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+async def _client(port, deadline, rng):
+    """Sends requests one after the other until the deadline, returns the number of responses.
+
+    The connection is kept open unless the server closes it after a response.
+    """
+    responses = 0
+    writer = None
+    try:
+        while time.monotonic() < deadline:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+            writer.write(f'GET /funds/{rng.randint(1, COUNT)} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            headers = (await reader.readuntil(b'\r\n\r\n')).decode().lower()
+            assert headers.startswith('http/1.1 200'), headers
+            length = int(headers.split('content-length:')[1].split('\r\n')[0])
+            await reader.readexactly(length)
+            responses += 1
+
+            if 'connection: close' in headers:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return responses
+
+
+async def _load(port, clients, duration):
+    rng = random.Random(0)
+    start = time.monotonic()
+    counts = await asyncio.gather(*(_client(port, start + duration, rng) for _ in range(clients)))
+    return sum(counts) / (time.monotonic() - start)
+
+
+def main():
+    print(f'{"storage":>8} {"clients":>8} {"wsgi req/s":>11} {"asgi req/s":>11}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'data.json'
+        write_data_file(path, COUNT)
+
+        for storage, latency in STORAGES.items():
+            for clients in CLIENTS:
+                rates = []
+                for serve in (_serve_wsgi, _serve_asgi):
+                    port = _free_port()
+                    server = multiprocessing.Process(target=serve, args=(port, path, latency), daemon=True)
+                    server.start()
+                    try:
+                        _wait_for(port)
+                        # Loads the database before the measure.
+                        asyncio.run(_load(port, 1, 0.5))
+                        rates.append(asyncio.run(_load(port, clients, DURATION)))
+                    finally:
+                        server.terminate()
+                        server.join()
+
+                print(f'{storage:>8} {clients:>8} {rates[0]:>11.0f} {rates[1]:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
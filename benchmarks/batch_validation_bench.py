@@ -0,0 +1,49 @@
+"""Compares validating migration chunks fund by fund and with the columnar `validate_batch`."""
+import timeit
+
+from funds_api.scripts.data_migration import _validate_data, validate_batch
+
+from .data import generate_funds
+
+
+COUNT = 100_000
+CHUNK_SIZE = 1000
+
+
+def _per_fund(funds):
+    mask = []
+    for fund in funds:
+        try:
+            _validate_data(fund)
+        except ValueError:
+            mask.append(False)
+        else:
+            mask.append(True)
+
+    return mask
+
+
+def _chunked(function, chunk_size=CHUNK_SIZE):
+    return lambda funds: [valid for i in range(0, len(funds), chunk_size) for valid in function(funds[i:i + chunk_size])]
+
+
+def main():
+    clean_funds = list(generate_funds(COUNT))
+    dirty_funds = list(generate_funds(COUNT))
+    # One invalid fund in a hundred.
+    for fund in dirty_funds[::100]:
+        fund['date'] = '2021/05/01'
+
+    print(f'{"validator":>14} {"clean rows/s":>13} {"1% invalid rows/s":>18}  (chunks of {CHUNK_SIZE})')
+    for name, function in [('per fund', _per_fund), ('validate_batch', validate_batch)]:
+        function = _chunked(function)
+        assert function(dirty_funds) == _per_fund(dirty_funds)
+        clean, dirty = (
+            COUNT / min(timeit.repeat(lambda: function(funds), number=1, repeat=3))
+            for funds in (clean_funds, dirty_funds)
+        )
+        print(f'{name:>14} {clean:>13,.0f} {dirty:>18,.0f}')
+
+
+if __name__ == '__main__':
+    main()
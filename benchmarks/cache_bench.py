@@ -0,0 +1,37 @@
+"""Compares the time of repeated GET requests with and without the response cache."""
+import pathlib
+import tempfile
+import timeit
+
+from funds_api import create_app
+
+from .data import write_data_file
+
+
+SIZES = [10_000, 100_000]
+URLS = ['/funds', '/funds?limit=100', '/funds?sort=-performance&limit=10', '/funds/stats?group_by=month']
+CALLS = 20
+
+
+def main():
+    print(f'{"funds":>8} {"url":>34} {"no cache ms":>12} {"cached ms":>10}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            path = pathlib.Path(tmp_dir) / f'data_{count}.json'
+            write_data_file(path, count)
+            clients = [
+                create_app({'DATABASE_PATH': path, 'RESPONSE_CACHE': cache}).test_client()
+                for cache in ('none', 'memory')
+            ]
+
+            for url in URLS:
+                timings = []
+                for client in clients:
+                    client.get(url)
+                    timings.append(min(timeit.repeat(lambda: client.get(url), number=CALLS, repeat=3)) / CALLS)
+
+                print(f'{count:>8} {url:>34} {timings[0] * 1000:>12.3f} {timings[1] * 1000:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Compares the time and body size of polling GET /funds and GET /funds/<id> with and without `If-None-Match`."""
+import pathlib
+import tempfile
+import timeit
+
+from funds_api import create_app
+
+from .data import write_data_file
+
+
+SIZES = [10_000, 100_000]
+CALLS = 20
+
+
+def main():
+    print(f'{"funds":>8} {"url":>20} {"200 ms":>9} {"304 ms":>9} {"200 bytes":>11} {"304 bytes":>10}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            path = pathlib.Path(tmp_dir) / f'data_{count}.json'
+            write_data_file(path, count)
+            client = create_app({'DATABASE_PATH': path, 'RESPONSE_CACHE': 'none'}).test_client()
+
+            for url in ['/funds', '/funds?limit=100', '/funds/1']:
+                response = client.get(url)
+                headers = {'If-None-Match': response.headers['ETag']}
+                not_modified = client.get(url, headers=headers)
+                assert not_modified.status_code == 304
+
+                full = min(timeit.repeat(lambda: client.get(url), number=CALLS, repeat=3)) / CALLS * 1000
+                cached = min(timeit.repeat(lambda: client.get(url, headers=headers), number=CALLS, repeat=3))
+                print(f'{count:>8} {url:>20} {full:>9.3f} {cached / CALLS * 1000:>9.3f} '
+                      f'{len(response.data):>11} {len(not_modified.data):>10}')
+
+
+if __name__ == '__main__':
+    main()
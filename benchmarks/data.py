@@ -0,0 +1,59 @@
+"""Synthetic fund data used by the benchmarks.
+
+`python -m benchmarks.data 1000000 data.json` writes a catalogue of a million funds, `--binary` as a snapshot.
+"""
+import argparse
+import json
+import random
+
+from funds_api.database.json_db import atomic_write
+from funds_api.database.snapshot import pack_snapshot
+
+
+MANAGERS = ['Alice Johnson', 'Bob Smith', 'Carol Williams', 'David Brown', 'Eve Davis']
+
+
+def generate_funds(count, seed=0):
+    """Generates `count` valid funds with ids from 1 to `count`."""
+    rng = random.Random(seed)
+    for id in range(1, count + 1):
+        yield {
+            'id': id,
+            'name': f'Fund {id}',
+            'manager_name': rng.choice(MANAGERS),
+            'description': f'Synthetic fund number {id} used for benchmarking.',
+            'nav': round(rng.uniform(10, 500), 2),
+            'date': f'{rng.randint(2010, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'performance': round(rng.uniform(-20, 40), 2),
+        }
+
+
+def write_data_file(path, count, seed=0, binary=False):
+    """Writes a database file of `count` funds, in the same format as `init_db()` or as a binary snapshot.
+
+    JSON is written a fund at a time such that large catalogues do not have to fit in memory twice.
+    """
+    if binary:
+        atomic_write(path, pack_snapshot((fund['id'], fund) for fund in generate_funds(count, seed)))
+        return
+
+    with open(path, 'w') as handler:
+        handler.write('{')
+        for i, fund in enumerate(generate_funds(count, seed)):
+            # Same layout as `json.dump(funds, handler, indent=4)`.
+            handler.write(f'{"," if i else ""}\n    "{fund["id"]}": ' + json.dumps(fund, indent=4).replace('\n', '\n    '))
+        handler.write('\n}' if count else '}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic catalogue of funds.')
+    parser.add_argument('count', type=int, help='Number of funds, e.g. 1000 to 1000000.')
+    parser.add_argument('path', help='Database file to write.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the generator, the same seed gives the same funds.')
+    parser.add_argument('--binary', action='store_true', help='Write a binary snapshot instead of JSON.')
+    args = parser.parse_args()
+    write_data_file(args.path, args.count, args.seed, args.binary)
+
+
+if __name__ == '__main__':
+    main()
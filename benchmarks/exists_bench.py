@@ -0,0 +1,33 @@
+"""Measures the per-request cost of `services.get_fund` with the id scan it used to do and with `exists()`."""
+import timeit
+
+from funds_api.database import JsonDb
+from funds_api.services import services
+
+from .data import generate_funds
+
+
+SIZES = [1_000, 10_000, 100_000]
+CALLS = 2_000
+
+
+class _ScanningDb(JsonDb):
+    """Previous behaviour which looked up the id in a fresh list of every id."""
+    def exists(self, id):
+        return id in self.get_all_ids()
+
+
+def _measure(db, count):
+    db._data = {fund['id']: fund for fund in generate_funds(count)}
+    # Look up the last id, the worst case of the scan.
+    return min(timeit.repeat(lambda: services.get_fund(db, count), number=CALLS, repeat=3)) / CALLS * 1e6
+
+
+def main():
+    print(f'{"funds":>8} {"scan us":>10} {"exists us":>10}  (per get_fund call)')
+    for count in SIZES:
+        print(f'{count:>8} {_measure(_ScanningDb(), count):>10.2f} {_measure(JsonDb(), count):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Compares GET /funds/<id> latency with a database loaded per request and the shared database instance."""
+import pathlib
+import statistics
+import tempfile
+import time
+
+from funds_api import create_app
+from funds_api.bp import funds
+from funds_api.database import JsonDb
+
+from .data import write_data_file
+
+
+SIZES = [1_000, 10_000, 50_000]
+REQUESTS = 200
+
+
+def _measure(client, count):
+    latencies = []
+    for i in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.get(f'/funds/{i % count + 1}')
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def main():
+    print(f'{"funds":>8} {"uncached p50":>14} {"uncached p99":>14} {"shared p50":>12} {"shared p99":>12}  (ms)')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            path = pathlib.Path(tmp_dir) / f'data_{count}.json'
+            write_data_file(path, count)
+            client = create_app({'DATABASE_PATH': path}).test_client()
+
+            shared_get_db = funds.get_db
+
+            def load_per_request():
+                db = JsonDb()
+                db.connect(path)
+                return db
+
+            funds.get_db = load_per_request
+            try:
+                uncached = _measure(client, count)
+            finally:
+                funds.get_db = shared_get_db
+
+            shared = _measure(client, count)
+            print(f'{count:>8} {uncached[0]:>14.3f} {uncached[1]:>14.3f} {shared[0]:>12.3f} {shared[1]:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compares history range queries of the history store with a scan of the same points held as a list of dicts."""
+import datetime
+import itertools
+import random
+import tempfile
+import timeit
+
+from funds_api.database.history import HistoryStore
+
+
+YEARS = [1, 10, 40]
+CALLS = 100
+# The query of the last year, with and without downsampling to a point a week.
+QUERIES = [(None,), (52,)]
+
+
+def _daily_points(years, seed=0):
+    """A write a day at noon UTC until the end of 2024."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 12, 31, 12, tzinfo=datetime.timezone.utc) - datetime.timedelta(days=365 * years)
+    nav = 100.0
+    for day in range(365 * years):
+        nav *= 1 + rng.gauss(0, 0.01)
+        yield {
+            'id': 1,
+            'time': start + datetime.timedelta(days=day + 1),
+            'nav': round(nav, 2),
+            'performance': round(rng.uniform(-20, 40), 2),
+        }
+
+
+def _scan(points, date_from, date_to, max_points):
+    selected = [
+        {'time': point['time'].isoformat(), 'nav': point['nav'], 'performance': point['performance']}
+        for point in points if date_from <= point['time'].date().isoformat() <= date_to
+    ]
+    if max_points is None or len(selected) <= max_points:
+        return selected
+
+    return [selected[(bucket + 1) * len(selected) // max_points - 1] for bucket in range(max_points)]
+
+
+def _measure(function, calls=CALLS):
+    return min(timeit.repeat(function, number=calls, repeat=3)) / calls * 1_000_000
+
+
+def main():
+    print(f'{"points":>8} {"max_points":>11} {"scan us":>9} {"store us":>9} {"cold load ms":>13}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for years in YEARS:
+            points = list(_daily_points(years))
+            store = HistoryStore(f'{tmp_dir}/{years}')
+            for time, day_points in itertools.groupby(points, key=lambda point: point['time']):
+                store.record(day_points, time.timestamp())
+            date_from, date_to = '2024-01-01', '2024-12-31'
+
+            for max_points, in QUERIES:
+                assert store.get(1, date_from, date_to, max_points) == _scan(points, date_from, date_to, max_points)
+                scan = _measure(lambda: _scan(points, date_from, date_to, max_points))
+                query = _measure(lambda: store.get(1, date_from, date_to, max_points))
+                cold = _measure(lambda: HistoryStore(f'{tmp_dir}/{years}').get(1, date_to=date_from), 5) / 1000
+                print(f'{len(points):>8} {str(max_points):>11} {scan:>9.1f} {query:>9.1f} {cold:>13.2f}')
+
+            record = _measure(lambda: store.record([points[-1]]))
+            print(f'{"":>8} record one point: {record:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
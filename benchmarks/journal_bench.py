@@ -0,0 +1,56 @@
+"""Compares the cost of updating one fund with full JSON rewrites and with the journaled database."""
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+
+from funds_api.database import JournaledJsonDb, JsonDb
+
+from .data import write_data_file
+
+
+SIZES = [1_000, 10_000, 50_000]
+UPDATES = 50
+
+
+def _measure(db, path):
+    db.connect(path)
+    fund = dict(db.get_fund(1))
+    written = 0
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        fund['performance'] = float(i)
+        before = _disk_size(path)
+        db.update_fund(1, dict(fund))
+        written += max(_disk_size(path) - before, 0) if isinstance(db, JournaledJsonDb) else _disk_size(path)
+
+    elapsed = time.perf_counter() - start
+    return elapsed / UPDATES * 1000, written / UPDATES
+
+
+def _disk_size(path):
+    return sum(os.path.getsize(p) for p in (path, f'{path}.log') if os.path.exists(p))
+
+
+def main():
+    print(f'{"funds":>8} {"rewrite ms":>11} {"rewrite B":>11} {"journal ms":>11} {"journal B":>10}  (per update)')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            source = pathlib.Path(tmp_dir) / f'source_{count}.json'
+            write_data_file(source, count)
+
+            rewrite_path = pathlib.Path(tmp_dir) / f'rewrite_{count}.json'
+            shutil.copy(source, rewrite_path)
+            rewrite = _measure(JsonDb(), rewrite_path)
+
+            journal_path = pathlib.Path(tmp_dir) / f'journal_{count}.json'
+            shutil.copy(source, journal_path)
+            # Compaction is left out to measure the steady state between two compactions.
+            journal = _measure(JournaledJsonDb(compact_threshold=UPDATES + 1), journal_path)
+
+            print(f'{count:>8} {rewrite[0]:>11.3f} {rewrite[1]:>11.0f} {journal[0]:>11.3f} {journal[1]:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compares peak memory and time of reading the JSON database with `json.load` and with the incremental reader."""
+import json
+import os
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from funds_api.database.json_stream import iter_funds
+
+from .data import write_data_file
+
+
+SIZES = [10_000, 100_000, 300_000]
+
+
+def _json_load(path):
+    with open(path) as handler:
+        return {int(key): value for key, value in json.load(handler).items()}
+
+
+def _stream_to_dict(path):
+    return dict(iter_funds(path))
+
+
+def _stream_and_drop(path):
+    """What the migration does, every fund is released once it is inserted."""
+    for _ in iter_funds(path):
+        pass
+
+
+def _measure(function, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(path)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2 ** 20
+
+
+def main():
+    print(f'{"funds":>8} {"file MiB":>9} {"reader":>16} {"seconds":>8} {"peak MiB":>9}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            path = pathlib.Path(tmp_dir) / f'data_{count}.json'
+            write_data_file(path, count)
+            size = os.path.getsize(path) / 2 ** 20
+            for name, function in [
+                ('json.load', _json_load),
+                ('stream to dict', _stream_to_dict),
+                ('stream and drop', _stream_and_drop),
+            ]:
+                seconds, peak = _measure(function, path)
+                print(f'{count:>8} {size:>9.1f} {name:>16} {seconds:>8.2f} {peak:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""In process load driver sending a mix of reads and writes to the app.
+
+Each client is a thread sending one request after the other for a duration. Requests go through the Flask test client,
+which measures the app without a network stack, or through a local WSGI server on a random port with connections kept
+alive. The clients and the server share the interpreter, hence the throughput is the one of a single worker process.
+"""
+import collections
+import http.client
+import json
+import random
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from .results import summarize
+
+
+# Weight of each kind of request.
+WORKLOADS = {
+    'read': {'get_fund': 80, 'list_page': 10, 'list_top': 5, 'stats': 5},
+    'mixed': {'get_fund': 60, 'list_page': 10, 'list_top': 5, 'stats': 5, 'update_performance': 20},
+    'write': {'get_fund': 50, 'update_performance': 50},
+}
+TRANSPORTS = ('client', 'server')
+
+
+def _request(kind, rng, count):
+    """Method, path and JSON body of a request of the kind."""
+    if kind == 'get_fund':
+        return 'GET', f'/funds/{rng.randint(1, count)}', None
+    if kind == 'list_page':
+        return 'GET', f'/funds?after_id={rng.randint(1, count)}&limit=100', None
+    if kind == 'list_top':
+        return 'GET', '/funds?sort=-performance&limit=10', None
+    if kind == 'stats':
+        return 'GET', '/funds/stats?group_by=manager_name', None
+    if kind == 'update_performance':
+        return 'PATCH', f'/funds/{rng.randint(1, count)}', {'performance': round(rng.uniform(-20, 40), 2)}
+
+    raise ValueError(f'Unknown request {kind}')
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class _TestClientTransport:
+    def __init__(self, app):
+        self._app = app
+
+    def connect(self):
+        """Returns a function sending a request and returning the response status, for the calling thread only."""
+        client = self._app.test_client()
+        return lambda method, path, body: client.open(path, method=method, json=body).status_code
+
+    def close(self):
+        pass
+
+
+class _ServerTransport:
+    def __init__(self, app):
+        self._server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_KeepAliveHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def connect(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self._server.port)
+
+        def send(method, path, body):
+            headers = {} if body is None else {'Content-Type': 'application/json'}
+            connection.request(method, path, None if body is None else json.dumps(body), headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+
+        return send
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run(app, count, workload, clients=4, duration=5.0, transport='client', seed=0):
+    """Sends the workload with `clients` threads for `duration` seconds, returns the summaries of every kind of
+    request and of all of them under `all`, and the number of error responses."""
+    kinds, weights = zip(*WORKLOADS[workload].items())
+    connections = (_TestClientTransport if transport == 'client' else _ServerTransport)(app)
+    latencies = collections.defaultdict(list)
+    errors = []
+    lock = threading.Lock()
+
+    def client(i, deadline):
+        rng = random.Random(seed + i)
+        send = connections.connect()
+        local_latencies = collections.defaultdict(list)
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, body = _request(kind, rng, count)
+            start = time.perf_counter()
+            status = send(method, path, body)
+            local_latencies[kind].append(time.perf_counter() - start)
+            local_errors += status >= 400
+
+        with lock:
+            for kind, values in local_latencies.items():
+                latencies[kind].extend(values)
+            errors.append(local_errors)
+
+    try:
+        # Loads the database and builds the indexes before the measure.
+        send = connections.connect()
+        for kind in kinds:
+            send(*_request(kind, random.Random(seed), count))
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i, start + duration)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        connections.close()
+
+    summaries = {kind: summarize(values, elapsed) for kind, values in latencies.items()}
+    summaries['all'] = summarize([value for values in latencies.values() for value in values], elapsed)
+    return summaries, sum(errors)
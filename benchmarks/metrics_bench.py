@@ -0,0 +1,54 @@
+"""Measures the overhead of the request instrumentation and of the sampling profiler on the test client."""
+import pathlib
+import statistics
+import tempfile
+import time
+
+from funds_api import create_app
+
+from .data import write_data_file
+
+
+COUNT = 1_000
+REQUESTS = 1_000
+CONFIGS = [
+    ('off', {'METRICS': False}),
+    ('metrics', {'METRICS': True}),
+    # Every request is sampled, none is slow enough to be written.
+    ('metrics+profiler', {'METRICS': True, 'PROFILER_THRESHOLD': 60}),
+]
+
+
+def _measure(client, request):
+    latencies = []
+    for i in range(REQUESTS):
+        start = time.perf_counter()
+        response = request(client, i % COUNT + 1)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+
+    return statistics.median(latencies) * 1_000_000
+
+
+def main():
+    requests = {
+        'GET /funds/<id>': lambda client, id: client.get(f'/funds/{id}'),
+        'PATCH /funds/<id>': lambda client, id: client.patch(f'/funds/{id}', json={'performance': 1.5}),
+    }
+    print(f'{"request":>18} ' + ' '.join(f'{name:>18}' for name, _ in CONFIGS) + '  (median us)')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        clients = []
+        for name, config in CONFIGS:
+            path = pathlib.Path(tmp_dir) / f'data_{name}.json'
+            write_data_file(path, COUNT)
+            clients.append(create_app({
+                'DATABASE_PATH': path, 'DATABASE_HISTORY': False, 'RESPONSE_CACHE': 'none', **config
+            }).test_client())
+
+        # Every configuration serves the reads before any serves the writes, whose syncs slow the disk down after.
+        for request_name, request in requests.items():
+            latencies = [_measure(client, request) for client in clients]
+            print(f'{request_name:>18} ' + ' '.join(f'{latency:>18.1f}' for latency in latencies))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Microbenchmarks of the service functions on every storage backend.
+
+Each operation is called one call after the other for a time budget, every call is timed on its own.
+"""
+import itertools
+import os
+import random
+import time
+
+from funds_api.database import JournaledJsonDb, JsonDb, MySqlDb
+from funds_api.services import services
+
+from .data import MANAGERS, generate_funds, write_data_file
+from .results import summarize
+
+
+BACKENDS = ('json', 'journal', 'binary', 'mysql')
+# Calls of an operation, unless its time budget runs out first.
+MAX_CALLS = 100_000
+
+
+def open_backend(backend, directory, count, seed=0, mysql_config=None):
+    """Returns a database instance of the backend holding a catalogue of `count` funds.
+
+    The `mysql` backend replaces every fund of the `funds` table of `mysql_config['database']`.
+    """
+    if backend == 'mysql':
+        db = MySqlDb.from_config(**mysql_config)
+        db.delete_funds(db.get_all_ids())
+        funds = generate_funds(count, seed)
+        while chunk := list(itertools.islice(funds, 1000)):
+            db.add_funds(chunk)
+        return db
+
+    binary = backend == 'binary'
+    path = os.path.join(directory, f'{backend}_{count}.{"bin" if binary else "json"}')
+    write_data_file(path, count, seed, binary)
+    db = JournaledJsonDb(binary=binary) if backend == 'journal' else JsonDb(binary=binary)
+    db.connect(path)
+    return db
+
+
+def operations(count, rng):
+    """The operations by name, functions of the database instance. Writes come last and leave `count` funds."""
+    def random_id():
+        return rng.randint(1, count)
+
+    def add_delete(db):
+        fund = next(generate_funds(1, rng.random()))
+        services.add_fund(db, {**fund, 'id': count + 1})
+        services.delete_fund(db, count + 1)
+
+    return {
+        'get_fund': lambda db: services.get_fund(db, random_id()),
+        'get_fund_version': lambda db: services.get_fund_version(db, random_id()),
+        'list_page': lambda db: services.get_funds(db, {'after_id': str(random_id()), 'limit': '100'}),
+        'list_filtered': lambda db: services.get_funds(
+            db, {'manager_name': rng.choice(MANAGERS), 'performance_min': '30', 'limit': '100'}
+        ),
+        'list_top': lambda db: services.get_funds(db, {'sort': '-performance', 'limit': '10'}),
+        'stats': lambda db: services.get_stats(db, {'group_by': 'manager_name'}),
+        'update_performance': lambda db: services.update_performance(
+            db, random_id(), {'performance': round(rng.uniform(-20, 40), 2)}
+        ),
+        'add_delete': add_delete,
+    }
+
+
+def measure(function, budget, max_calls=MAX_CALLS):
+    """Calls the function until `budget` seconds passed, at least once, and summarizes the latencies."""
+    latencies = []
+    start = time.perf_counter()
+    while True:
+        call_start = time.perf_counter()
+        function()
+        end = time.perf_counter()
+        latencies.append(end - call_start)
+        if end - start >= budget or len(latencies) >= max_calls:
+            return summarize(latencies, sum(latencies))
+
+
+def run(backends, sizes, directory, budget=1.0, seed=0, mysql_config=None, report=print):
+    """Runs every operation on every backend and catalogue size, returns the summaries by
+    `micro/<backend>/<size>/<operation>`."""
+    results = {}
+    for backend in backends:
+        for count in sizes:
+            start = time.perf_counter()
+            db = open_backend(backend, directory, count, seed, mysql_config)
+            report(f'micro {backend} {count}: loaded in {time.perf_counter() - start:.2f} s')
+
+            for name, operation in operations(count, random.Random(seed)).items():
+                results[f'micro/{backend}/{count}/{name}'] = summary = measure(lambda: operation(db), budget)
+                report(f'micro {backend} {count} {name}: {summary["ops_per_s"]:.1f} ops/s')
+
+    return results
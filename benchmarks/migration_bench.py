@@ -0,0 +1,78 @@
+"""Compares the migration throughput with one insert per fund and with chunked `executemany` inserts.
+
+The MySQL server is replaced by a stand-in which only charges a fixed latency per round trip, such that the
+benchmark runs without a server and shows what the number of round trips costs.
+"""
+import os
+import tempfile
+import time
+
+from funds_api.scripts.data_migration import Checkpoint, migrate
+
+from .data import generate_funds
+
+
+COUNT = 20_000
+# Typical round trip to a MySQL server on the same network.
+ROUND_TRIP_SECONDS = 0.0002
+
+
+class _RoundTripCursor:
+    def execute(self, sql, params=()):
+        time.sleep(ROUND_TRIP_SECONDS)
+
+    def executemany(self, sql, seq_params):
+        # The connector sends one multi-row `INSERT` per call.
+        time.sleep(ROUND_TRIP_SECONDS)
+
+    def close(self):
+        pass
+
+
+class _PerRowCursor(_RoundTripCursor):
+    """Previous behaviour which sent every fund in its own statement."""
+    def executemany(self, sql, seq_params):
+        for params in seq_params:
+            self.execute(sql, params)
+
+
+class _RoundTripConnection:
+    def __init__(self, cursor_cls):
+        self._cursor_cls = cursor_cls
+
+    def cursor(self):
+        return self._cursor_cls()
+
+    def commit(self):
+        time.sleep(ROUND_TRIP_SECONDS)
+
+    def rollback(self):
+        pass
+
+
+def main():
+    funds = list(generate_funds(COUNT))
+    print(f'{"mode":>22} {"rows/s":>10}')
+    for name, cursor_cls, chunk_size, workers, dry_run in [
+        ('per row', _PerRowCursor, COUNT, 1, False),
+        ('chunks of 1000', _RoundTripCursor, 1000, 1, False),
+        ('dry run', None, 1000, 1, True),
+        ('dry run, 4 workers', None, 1000, 4, True),
+    ]:
+        conn = None if dry_run else _RoundTripConnection(cursor_cls)
+        result = migrate(conn, funds, chunk_size=chunk_size, workers=workers, dry_run=dry_run)
+        print(f'{name:>22} {result.rows_per_second:>10,.0f}')
+
+    print(f'\n{"sync":>22} {"seconds":>10}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoint = Checkpoint(os.path.join(tmp_dir, 'data.json.migration'))
+        for name, changed in [('first run', COUNT), ('1% changed', COUNT // 100)]:
+            for fund in funds[:changed]:
+                fund['performance'] += 1
+
+            result = migrate(_RoundTripConnection(_RoundTripCursor), funds, checkpoint=checkpoint)
+            print(f'{name:>22} {result.seconds:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
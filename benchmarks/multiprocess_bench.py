@@ -0,0 +1,50 @@
+"""Measures the write throughput of processes sharing one JSON database, each writing its own funds."""
+import multiprocessing
+import pathlib
+import tempfile
+import time
+
+from funds_api.database import JournaledJsonDb, JsonDb
+
+from .data import generate_funds, write_data_file
+
+
+COUNT = 10_000
+WRITES = 200
+PROCESSES = [1, 2, 4]
+
+
+def _write(path, journal, worker):
+    db = JournaledJsonDb() if journal else JsonDb()
+    db.connect(path)
+    for fund_data in generate_funds(WRITES, seed=worker):
+        db.add_fund({**fund_data, 'id': worker * COUNT + fund_data['id']})
+
+
+def main():
+    print(f'{"mode":>8} {"processes":>10} {"writes/s":>10}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for journal in (False, True):
+            for processes in PROCESSES:
+                path = pathlib.Path(tmp_dir) / f'data_{journal}_{processes}.json'
+                write_data_file(path, COUNT)
+                workers = [
+                    multiprocessing.Process(target=_write, args=(path, journal, worker))
+                    for worker in range(1, processes + 1)
+                ]
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                seconds = time.perf_counter() - start
+
+                db = JournaledJsonDb() if journal else JsonDb()
+                db.connect(path)
+                assert len(db.get_all_ids()) == COUNT + processes * WRITES
+                mode = 'journal' if journal else 'json'
+                print(f'{mode:>8} {processes:>10} {processes * WRITES / seconds:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
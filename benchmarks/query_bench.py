@@ -0,0 +1,49 @@
+"""Compares filtered and top N queries answered by the JSON database indexes and by a scan of every fund."""
+import timeit
+
+from funds_api.database import JsonDb
+
+from .data import generate_funds
+
+
+SIZES = [10_000, 100_000]
+CALLS = 20
+QUERIES = {
+    'top 10 performance': dict(sort='performance', descending=True, limit=10),
+    'manager, top 10 nav': dict(equals={'manager_name': 'Alice Johnson'}, sort='nav', limit=10),
+    'one month of dates': dict(ranges={'date': ('2015-03-01', '2015-03-31')}),
+    'nav range, page of 50': dict(ranges={'nav': (100, 110)}, limit=50),
+}
+
+
+def _scan(db, equals=None, ranges=None, sort=None, descending=False, limit=None):
+    funds = [
+        fund for fund in db.get_all()
+        if all(fund[field] == value for field, value in (equals or {}).items())
+        and all(low <= fund[field] <= high for field, (low, high) in (ranges or {}).items())
+    ]
+    funds.sort(key=lambda fund: (fund[sort], fund['id']) if sort else fund['id'], reverse=descending)
+    return funds[:limit]
+
+
+def _measure(function):
+    return min(timeit.repeat(function, number=CALLS, repeat=3)) / CALLS * 1000
+
+
+def main():
+    print(f'{"funds":>8} {"query":>24} {"scan ms":>9} {"index ms":>9}')
+    for count in SIZES:
+        db = JsonDb()
+        db._data = {fund['id']: fund for fund in generate_funds(count)}
+        db._ids = sorted(db._data)
+        for index in db._indexes():
+            index.rebuild(db._data)
+
+        for name, query in QUERIES.items():
+            assert db.find(**query) == _scan(db, **query)
+            print(f'{count:>8} {name:>24} {_measure(lambda: _scan(db, **query)):>9.3f} '
+                  f'{_measure(lambda: db.find(**query)):>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Compares GET /funds latency for the full listing and for a page seeked with the `after_id` cursor."""
+import pathlib
+import tempfile
+import timeit
+
+from funds_api import create_app
+
+from .data import write_data_file
+
+
+SIZES = [1_000, 10_000, 100_000]
+PAGE_SIZE = 50
+REQUESTS = 20
+
+
+def _measure(client, url):
+    return min(timeit.repeat(lambda: client.get(url), number=REQUESTS, repeat=3)) / REQUESTS * 1000
+
+
+def main():
+    print(f'{"funds":>8} {"full ms":>10} {"page ms":>10}  (page of {PAGE_SIZE} from the middle)')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            path = pathlib.Path(tmp_dir) / f'data_{count}.json'
+            write_data_file(path, count)
+            client = create_app({'DATABASE_PATH': path}).test_client()
+
+            full = _measure(client, '/funds')
+            page = _measure(client, f'/funds?limit={PAGE_SIZE}&after_id={count // 2}')
+            print(f'{count:>8} {full:>10.3f} {page:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
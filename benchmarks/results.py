@@ -0,0 +1,69 @@
+"""Summaries of measured latencies, their files and the comparison of two runs."""
+import json
+import platform
+import sys
+import time
+
+
+def percentile(ordered, fraction):
+    """Nearest rank percentile of sorted values."""
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles of `latencies` seconds measured over `elapsed` seconds."""
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'ops_per_s': len(ordered) / elapsed if elapsed else 0.0,
+        'p50_us': percentile(ordered, 0.50) * 1_000_000,
+        'p99_us': percentile(ordered, 0.99) * 1_000_000,
+    }
+
+
+def save(path, results, settings):
+    with open(path, 'w') as handler:
+        json.dump({
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'settings': settings,
+            'results': results,
+        }, handler, indent=4)
+
+
+def load(path):
+    with open(path) as handler:
+        return json.load(handler)['results']
+
+
+def compare(results, baseline, tolerance):
+    """Returns the regressions of `results` against `baseline`, the benchmarks both ran.
+
+    A benchmark regressed when its throughput dropped or its p99 latency grew by more than `tolerance`, a fraction.
+    Each regression is `(name, metric, baseline value, value, relative change)`.
+    """
+    regressions = []
+    for name in sorted(results.keys() & baseline.keys()):
+        current, before = results[name], baseline[name]
+        if before['ops_per_s'] and current['ops_per_s'] < before['ops_per_s'] * (1 - tolerance):
+            change = current['ops_per_s'] / before['ops_per_s'] - 1
+            regressions.append((name, 'ops_per_s', before['ops_per_s'], current['ops_per_s'], change))
+        if before['p99_us'] and current['p99_us'] > before['p99_us'] * (1 + tolerance):
+            change = current['p99_us'] / before['p99_us'] - 1
+            regressions.append((name, 'p99_us', before['p99_us'], current['p99_us'], change))
+
+    return regressions
+
+
+def format_table(results):
+    """Lines of a table of the results ordered by name."""
+    width = max([len(name) for name in results] + [9])
+    lines = [f'{"benchmark":<{width}} {"count":>8} {"ops/s":>10} {"p50 us":>10} {"p99 us":>10}']
+    for name, summary in sorted(results.items()):
+        lines.append(
+            f'{name:<{width}} {summary["count"]:>8} {summary["ops_per_s"]:>10.1f} {summary["p50_us"]:>10.1f} '
+            f'{summary["p99_us"]:>10.1f}'
+        )
+
+    return lines
@@ -0,0 +1,63 @@
+"""Compares the cold start and the lookups of a JSON database file with a binary snapshot of the same funds."""
+import os
+import random
+import tempfile
+import time
+import timeit
+
+from funds_api.database import JsonDb, convert_db
+
+from .data import write_data_file
+
+
+SIZES = [1_000, 10_000, 100_000]
+LOOKUPS = 10_000
+
+
+def _connect(path, binary):
+    db = JsonDb(binary=binary)
+    db.connect(path)
+    return db
+
+
+def _elapsed_ms(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    print(
+        f'{"funds":>8} {"format":>7} {"size MB":>8} {"connect ms":>11} {"first get ms":>13} {"get us":>7} '
+        f'{"first find ms":>14} {"write ms":>9}'
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            json_path = os.path.join(tmp_dir, f'data_{count}.json')
+            binary_path = os.path.join(tmp_dir, f'data_{count}.bin')
+            write_data_file(json_path, count)
+            convert_db(json_path, binary_path)
+            ids = [random.Random(0).randint(1, count) for _ in range(LOOKUPS)]
+
+            for name, path, binary in [('json', json_path, False), ('binary', binary_path, True)]:
+                size = os.path.getsize(path) / 2 ** 20
+                connect = min(_elapsed_ms(lambda: _connect(path, binary)) for _ in range(3))
+                # A cold worker answering its first request for a single fund.
+                first_get = min(_elapsed_ms(lambda: _connect(path, binary).get_fund(ids[0])) for _ in range(3))
+                db = _connect(path, binary)
+                get = timeit.timeit(lambda: [db.get_fund(id) for id in ids], number=1) / LOOKUPS * 1_000_000
+                # The first listing query of a cold worker decodes every fund of a snapshot.
+                first_find = min(
+                    _elapsed_ms(lambda: _connect(path, binary).find(sort='nav', limit=10)) for _ in range(3)
+                )
+                # Writing rewrites the whole file in either format, measured once every fund is decoded.
+                db.find(limit=1)
+                write = _elapsed_ms(lambda: db.update_fund(1, db.get_fund(1)))
+                print(
+                    f'{count:>8} {name:>7} {size:>8.1f} {connect:>11.2f} {first_get:>13.2f} {get:>7.2f} '
+                    f'{first_find:>14.1f} {write:>9.1f}'
+                )
+
+
+if __name__ == '__main__':
+    main()
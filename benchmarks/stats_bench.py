@@ -0,0 +1,52 @@
+"""Compares the grouped statistics of the JSON database columnar view with computing them from `get_all()`."""
+import timeit
+
+from funds_api.database import JsonDb
+from funds_api.database.columns import GROUP_KEYS, group_stats
+
+from .data import generate_funds
+
+
+SIZES = [10_000, 100_000]
+GROUPS = [None, 'manager_name', 'month']
+CALLS = 5
+
+
+def _stats_from_all(db, group_by):
+    groups = {}
+    for fund in db.get_all():
+        groups.setdefault(GROUP_KEYS[group_by](fund), []).append(fund)
+
+    return [
+        group_stats([fund['nav'] for fund in funds], [fund['performance'] for fund in funds])
+        for group, funds in sorted(groups.items())
+    ]
+
+
+def _measure(function):
+    return min(timeit.repeat(function, number=CALLS, repeat=3)) / CALLS * 1000
+
+
+def main():
+    print(f'{"funds":>8} {"group_by":>13} {"get_all ms":>11} {"view ms":>9} {"update + view ms":>17}')
+    for count in SIZES:
+        db = JsonDb()
+        db._data = {fund['id']: fund for fund in generate_funds(count)}
+        db._ids = sorted(db._data)
+        for index in db._indexes():
+            index.rebuild(db._data)
+
+        for group_by in GROUPS:
+            def after_update():
+                # What `_apply()` does to the view for an update, without writing the file.
+                fund_data = db._data[1]
+                db._columns.remove(1, fund_data)
+                db._columns.add(1, fund_data)
+                db.stats(group_by)
+
+            print(f'{count:>8} {str(group_by):>13} {_measure(lambda: _stats_from_all(db, group_by)):>11.2f} '
+                  f'{_measure(lambda: db.stats(group_by)):>9.3f} {_measure(after_update):>17.3f}')
+
+
+if __name__ == '__main__':
+    main()
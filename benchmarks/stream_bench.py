@@ -0,0 +1,52 @@
+"""Compares peak memory and time to first byte of GET /funds with `jsonify` and with the streamed response."""
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from funds_api import create_app
+
+from .data import write_data_file
+
+
+SIZES = [10_000, 100_000]
+
+
+def _measure(client, url, headers=None):
+    """Returns the time to first byte in ms, the total time in ms and the peak memory in MiB of one request."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    first_byte = time.perf_counter() - start
+    for _ in chunks:
+        pass
+    response.close()
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte * 1000, total * 1000, peak / 2 ** 20
+
+
+def main():
+    print(f'{"funds":>8} {"mode":>8} {"ttfb ms":>10} {"total ms":>10} {"peak MiB":>10}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in SIZES:
+            path = pathlib.Path(tmp_dir) / f'data_{count}.json'
+            write_data_file(path, count)
+            client = create_app({'DATABASE_PATH': path}).test_client()
+            # Load the shared database before measuring.
+            client.get('/funds?limit=1')
+
+            for mode, url, headers in [
+                ('jsonify', '/funds', None),
+                ('stream', '/funds?stream=true', None),
+                ('ndjson', '/funds', {'Accept': 'application/x-ndjson'}),
+            ]:
+                first_byte, total, peak = _measure(client, url, headers)
+                print(f'{count:>8} {mode:>8} {first_byte:>10.2f} {total:>10.2f} {peak:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark suite of the funds API: microbenchmarks of the services on every backend and load tests of the app.
+
+    python -m benchmarks.suite --sizes 1000,100000 --output results.json
+    python -m benchmarks.suite --baseline results.json
+
+Catalogues are generated from `--seed`, hence two runs with the same settings measure the same data and requests.
+With `--baseline` the results are compared with a previous run and every benchmark whose throughput dropped, or whose
+p99 latency grew, by more than `--tolerance` is reported as a regression, the exit status is then 1. `--input` compares
+saved results instead of running the benchmarks.
+"""
+import argparse
+import sys
+import tempfile
+
+from funds_api import create_app
+
+from . import load, micro, results
+from .data import write_data_file
+
+
+def _list(value):
+    return [item for item in value.split(',') if item]
+
+
+def _parser():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite of the funds API.')
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in _list(value)], default=[1_000, 10_000],
+                        help='Comma separated catalogue sizes, from 1000 to 1000000.')
+    parser.add_argument('--backends', type=_list, default=['json', 'journal', 'binary'],
+                        help=f'Comma separated backends among {", ".join(micro.BACKENDS)}.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the catalogues and of the requests.')
+    parser.add_argument('--budget', type=float, default=1.0, help='Seconds spent on each microbenchmark.')
+    parser.add_argument('--workloads', type=_list, default=['read', 'mixed'],
+                        help=f'Comma separated load workloads among {", ".join(load.WORKLOADS)}.')
+    parser.add_argument('--transport', choices=load.TRANSPORTS, default='client',
+                        help='Send the load through the Flask test client or a local WSGI server.')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent clients of the load tests.')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds of each load test.')
+    parser.add_argument('--skip-micro', action='store_true', help='Do not run the microbenchmarks.')
+    parser.add_argument('--skip-load', action='store_true', help='Do not run the load tests.')
+    parser.add_argument('--output', help='Write the results into this JSON file.')
+    parser.add_argument('--input', help='Read the results from this JSON file instead of running the benchmarks.')
+    parser.add_argument('--baseline', help='Results of a previous run to compare with.')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Relative change beyond which a benchmark regressed, 0.15 for 15%%.')
+    mysql = parser.add_argument_group('mysql', 'Server of the `mysql` backend, whose `funds` table is replaced.')
+    mysql.add_argument('--mysql-user')
+    mysql.add_argument('--mysql-password')
+    mysql.add_argument('--mysql-host', default='127.0.0.1')
+    mysql.add_argument('--mysql-port', type=int, default=3306)
+    mysql.add_argument('--mysql-database', default='fund_bench')
+    return parser
+
+
+def _app_config(backend, path, args):
+    config = {'DATABASE_PATH': path}
+    if backend == 'mysql':
+        config.update(
+            DATABASE_BACKEND='mysql',
+            MYSQL_USER=args.mysql_user,
+            MYSQL_PASSWORD=args.mysql_password,
+            MYSQL_HOST=args.mysql_host,
+            MYSQL_PORT=args.mysql_port,
+            MYSQL_DATABASE=args.mysql_database,
+        )
+    config.update(DATABASE_JOURNAL=backend == 'journal', DATABASE_FORMAT='binary' if backend == 'binary' else 'json')
+    return config
+
+
+def _run_load(args, directory, mysql_config):
+    summaries = {}
+    for backend in args.backends:
+        for count in args.sizes:
+            for workload in args.workloads:
+                path = f'{directory}/load_{backend}_{count}_{workload}.{"bin" if backend == "binary" else "json"}'
+                if backend == 'mysql':
+                    micro.open_backend(backend, directory, count, args.seed, mysql_config)
+                else:
+                    # A fresh catalogue per workload such that the writes of one do not change the next.
+                    write_data_file(path, count, args.seed, binary=backend == 'binary')
+
+                app = create_app(_app_config(backend, path, args))
+                workload_summaries, errors = load.run(
+                    app, count, workload, args.clients, args.duration, args.transport, args.seed
+                )
+                prefix = f'load/{args.transport}/{backend}/{count}/{workload}'
+                for kind, summary in workload_summaries.items():
+                    summaries[f'{prefix}/{kind}'] = summary
+
+                total = workload_summaries['all']
+                print(
+                    f'load {backend} {count} {workload}: {total["ops_per_s"]:.1f} req/s, '
+                    f'p50 {total["p50_us"]:.0f} us, p99 {total["p99_us"]:.0f} us, {errors} errors'
+                )
+
+    return summaries
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    unknown = set(args.backends) - set(micro.BACKENDS)
+    if unknown:
+        sys.exit(f'Unknown backends {", ".join(sorted(unknown))}')
+    if 'mysql' in args.backends and args.mysql_user is None:
+        sys.exit('The mysql backend needs --mysql-user and --mysql-password')
+
+    mysql_config = {
+        'user': args.mysql_user,
+        'password': args.mysql_password,
+        'host': args.mysql_host,
+        'port': args.mysql_port,
+        'database': args.mysql_database,
+    }
+
+    if args.input:
+        summaries = results.load(args.input)
+    else:
+        summaries = {}
+        with tempfile.TemporaryDirectory() as directory:
+            if not args.skip_micro:
+                summaries.update(micro.run(args.backends, args.sizes, directory, args.budget, args.seed, mysql_config))
+            if not args.skip_load:
+                summaries.update(_run_load(args, directory, mysql_config))
+
+    print()
+    print('\n'.join(results.format_table(summaries)))
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if not key.startswith('mysql_password')}
+        results.save(args.output, summaries, settings)
+
+    if args.baseline:
+        regressions = results.compare(summaries, results.load(args.baseline), args.tolerance)
+        print()
+        for name, metric, before, after, change in regressions:
+            print(f'REGRESSION {name} {metric}: {before:.1f} -> {after:.1f} ({change:+.0%})')
+        print(f'{len(regressions)} regressions beyond {args.tolerance:.0%} against {args.baseline}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Measures fund validations per second with `jsonschema.validate`, the cached validator and the fast path."""
+import timeit
+
+from jsonschema import validate
+
+from funds_api.database import model
+
+from .data import generate_funds
+
+
+CALLS = 20_000
+
+
+def _measure(function, fund):
+    return CALLS / min(timeit.repeat(lambda: function(fund), number=CALLS, repeat=3))
+
+
+def main():
+    fund = next(generate_funds(1))
+    invalid_fund = {**fund, 'nav': 'unknown'}
+
+    def cached_validator(fund_data):
+        error = model.best_match(model.fund_validator.iter_errors(fund_data))
+        if error is not None:
+            raise error
+
+    def ignore_errors(function):
+        def wrapper(fund_data):
+            try:
+                function(fund_data)
+            except model.ValidationError:
+                pass
+        return wrapper
+
+    print(f'{"validator":>18} {"valid /s":>12} {"invalid /s":>12}')
+    for name, function in [
+        ('jsonschema', lambda fund_data: validate(fund_data, model.fund_schema)),
+        ('cached validator', cached_validator),
+        ('validate_fund', model.validate_fund),
+    ]:
+        valid = _measure(function, fund)
+        invalid = _measure(ignore_errors(function), invalid_fund)
+        print(f'{name:>18} {valid:>12,.0f} {invalid:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,77 @@
 """Flask app entry point."""
 from flask import Flask
 
-from funds_api.bp import funds
-from funds_api.database import init_db_command, init_db
+from funds_api.bp import cache, funds, metrics
+from funds_api.database import DATA_FILE, convert_db_command, init_db_command, init_db
+from funds_api.metrics import TimedJSONProvider
 from funds_api.scripts import create_schema, data_migration
 
 
-def create_app():
+def configure(app, test_config=None):
+    """Loads the settings of the app, shared by the Flask and the ASGI app."""
+    app.config.from_mapping(
+        # Either `json` or `mysql`.
+        DATABASE_BACKEND='json',
+        DATABASE_PATH=DATA_FILE,
+        # Either `json` or `binary`, a memory mapped snapshot written by `convert-db`.
+        DATABASE_FORMAT='json',
+        # Append mutations to a log file and only rewrite the JSON file every `DATABASE_COMPACT_THRESHOLD` records.
+        DATABASE_JOURNAL=False,
+        DATABASE_COMPACT_THRESHOLD=1000,
+        # Seconds a commit waits such that concurrent writes share one write and fsync.
+        DATABASE_GROUP_COMMIT_WINDOW=0,
+        # Seconds within which a write applied in memory is persisted by a background thread, `None` persists every
+        # write before responding. `DATABASE_WRITE_BEHIND_MAX_DIRTY` changed funds are persisted right away.
+        DATABASE_WRITE_BEHIND_INTERVAL=None,
+        DATABASE_WRITE_BEHIND_MAX_DIRTY=1000,
+        # Record the nav and performance of every write in `<DATABASE_PATH>.history`, one file per fund.
+        DATABASE_HISTORY=False,
+        MYSQL_USER=None,
+        MYSQL_PASSWORD=None,
+        MYSQL_HOST='127.0.0.1',
+        MYSQL_PORT=3306,
+        MYSQL_DATABASE='fund_db',
+        # Connections per worker process.
+        MYSQL_POOL_SIZE=5,
+        # Serialized responses are cached in process with `memory`, in Redis with `redis` or not at all with `none`.
+        RESPONSE_CACHE='memory',
+        RESPONSE_CACHE_URL='redis://localhost:6379/0',
+        # Seconds before a cached response expires.
+        RESPONSE_CACHE_TTL=60,
+        RESPONSE_CACHE_MAX_ENTRIES=10_000,
+        RESPONSE_CACHE_MAX_BYTES=64 * 2 ** 20,
+        # Time every request, its stages and the database calls, served by `/metrics`.
+        METRICS=True,
+        # Seconds above which the sampled profile of a request is written into `PROFILER_DIRECTORY`, `None` disables
+        # the profiler.
+        PROFILER_THRESHOLD=None,
+        # Seconds between two samples of the stack of a profiled request.
+        PROFILER_INTERVAL=0.005,
+        PROFILER_DIRECTORY='profiles',
+    )
+
+    if test_config is None:
+        # Settings can be overridden through environment variables, e.g. `FLASK_DATABASE_JOURNAL=true`.
+        app.config.from_prefixed_env()
+    else:
+        app.config.from_mapping(test_config)
+
+    if app.config['DATABASE_BACKEND'] == 'json':
+        init_db(app.config['DATABASE_PATH'], binary=app.config['DATABASE_FORMAT'] == 'binary')
+
+
+def create_app(test_config=None):
     # create and configure the app
-    init_db()
     app = Flask(__name__)
+    app.json = TimedJSONProvider(app)
+    configure(app, test_config)
+
     app.cli.add_command(init_db_command)
+    app.cli.add_command(convert_db_command)
     app.cli.add_command(create_schema)
     app.cli.add_command(data_migration)
     app.register_blueprint(funds.bp)
+    app.register_blueprint(cache.bp)
+    app.register_blueprint(metrics.bp)
 
-    return app
\ No newline at end of file
+    return app
@@ -0,0 +1,19 @@
+"""ASGI app entry point, serving the funds endpoints with coroutines.
+
+Run it with an ASGI server, e.g. `hypercorn 'funds_api.asgi:create_asgi_app()'`.
+"""
+from quart import Quart
+
+from funds_api import configure
+from funds_api.bp import async_funds
+from funds_api.database import close_async_db
+
+
+def create_asgi_app(test_config=None):
+    app = Quart(__name__)
+    configure(app, test_config)
+
+    app.register_blueprint(async_funds.bp)
+    app.after_serving(close_async_db)
+
+    return app
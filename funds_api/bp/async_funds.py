@@ -0,0 +1,201 @@
+"""Endpoints of the ASGI app for fund related operations, the coroutine counterparts of the `funds` blueprint."""
+import json
+
+from quart import Blueprint, Response, request, jsonify
+
+from funds_api.database import get_async_db
+from funds_api.services import async_services, exceptions
+from .conditional import is_modified, query_tag, with_version
+from .funds import (
+    HTTP_CREATED_CODE,
+    HTTP_INPUT_ERROR_CODE,
+    HTTP_NO_CONTENT_CODE,
+    HTTP_NOT_FOUND_CODE,
+    HTTP_NOT_MODIFIED_CODE,
+    HTTP_OK_CODE,
+    HTTP_PRECONDITION_FAILED_CODE,
+    NDJSON_MIMETYPE,
+)
+
+
+bp = Blueprint('async_funds', __name__)
+
+
+async def _json_array_chunks(funds):
+    """Encodes the funds as one JSON array, a fund at a time."""
+    yield b'['
+    i = 0
+    async for fund in funds:
+        yield ((',' if i else '') + json.dumps(fund)).encode()
+        i += 1
+    yield b']'
+
+
+async def _ndjson_chunks(funds):
+    async for fund in funds:
+        yield (json.dumps(fund) + '\n').encode()
+
+
+def _not_modified(tag, last_modified):
+    return with_version(Response('', HTTP_NOT_MODIFIED_CODE), tag, last_modified)
+
+
+@bp.route('/funds', methods=['POST'])
+async def add_fund():
+    db = await get_async_db()
+
+    try:
+        response = await async_services.add_fund(db, await request.get_json())
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return jsonify(response), HTTP_CREATED_CODE
+
+
+@bp.route('/funds:batch', methods=['POST'])
+async def add_funds():
+    db = await get_async_db()
+
+    try:
+        response = await async_services.add_funds(db, await request.get_json())
+    except exceptions.BatchError as exc:
+        return jsonify({'error': str(exc), 'errors': exc.errors}), HTTP_INPUT_ERROR_CODE
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return jsonify(response), HTTP_CREATED_CODE
+
+
+@bp.route('/funds:batch', methods=['PATCH'])
+async def update_performances():
+    db = await get_async_db()
+
+    try:
+        response = await async_services.update_performances(db, await request.get_json())
+    except exceptions.BatchError as exc:
+        return jsonify({'error': str(exc), 'errors': exc.errors}), HTTP_INPUT_ERROR_CODE
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return jsonify(response), HTTP_OK_CODE
+
+
+@bp.route('/funds:batch', methods=['DELETE'])
+async def delete_funds():
+    db = await get_async_db()
+
+    try:
+        response = await async_services.delete_funds(db, await request.get_json())
+    except exceptions.BatchError as exc:
+        return jsonify({'error': str(exc), 'errors': exc.errors}), HTTP_INPUT_ERROR_CODE
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return jsonify(response), HTTP_NO_CONTENT_CODE
+
+
+@bp.route('/funds', methods=['GET'])
+async def get_all_funds():
+    db = await get_async_db()
+    ndjson = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+    stream = ndjson or request.args.get('stream', '').lower() in ('1', 'true')
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+
+    # Read before the funds such that the response is never older than its tag.
+    tag, last_modified = await async_services.get_version(db)
+    tag = query_tag(tag, mimetype, request.query_string)
+    if not is_modified(request.headers, tag, last_modified):
+        return _not_modified(tag, last_modified)
+
+    try:
+        if stream:
+            funds = async_services.iter_funds(db, request.args)
+        else:
+            response = jsonify(await async_services.get_funds(db, request.args))
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    if ndjson:
+        response = Response(_ndjson_chunks(funds), HTTP_OK_CODE, mimetype=NDJSON_MIMETYPE)
+    elif stream:
+        response = Response(_json_array_chunks(funds), HTTP_OK_CODE, mimetype=mimetype)
+
+    response.vary.add('Accept')
+    return with_version(response, tag, last_modified)
+
+
+@bp.route('/funds/stats', methods=['GET'])
+async def get_stats():
+    db = await get_async_db()
+
+    tag, last_modified = await async_services.get_version(db)
+    tag = query_tag(tag, 'application/json', request.query_string)
+    if not is_modified(request.headers, tag, last_modified):
+        return _not_modified(tag, last_modified)
+
+    try:
+        response = jsonify(await async_services.get_stats(db, request.args))
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return with_version(response, tag, last_modified)
+
+
+@bp.route('/funds/<int:fund_id>', methods=['GET'])
+async def get_fund(fund_id):
+    db = await get_async_db()
+
+    try:
+        tag, last_modified = await async_services.get_fund_version(db, fund_id)
+        if not is_modified(request.headers, tag, last_modified):
+            return _not_modified(tag, last_modified)
+
+        response = jsonify(await async_services.get_fund(db, fund_id))
+    except exceptions.NotFoundError as exc:
+        return jsonify({'error': str(exc)}), HTTP_NOT_FOUND_CODE
+
+    return with_version(response, tag, last_modified)
+
+
+@bp.route('/funds/<int:fund_id>/history', methods=['GET'])
+async def get_history(fund_id):
+    db = await get_async_db()
+
+    try:
+        response = await async_services.get_history(db, fund_id, request.args)
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+    except exceptions.NotFoundError as exc:
+        return jsonify({'error': str(exc)}), HTTP_NOT_FOUND_CODE
+
+    return jsonify(response), HTTP_OK_CODE
+
+
+@bp.route('/funds/<int:fund_id>', methods=['PATCH'])
+async def update_performance(fund_id):
+    db = await get_async_db()
+
+    try:
+        response = await async_services.update_performance(
+            db, fund_id, await request.get_json(), if_match=request.if_match or None
+        )
+        tag, last_modified = await async_services.get_fund_version(db, fund_id)
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+    except exceptions.NotFoundError as exc:
+        return jsonify({'error': str(exc)}), HTTP_NOT_FOUND_CODE
+    except exceptions.PreconditionFailedError as exc:
+        return jsonify({'error': str(exc)}), HTTP_PRECONDITION_FAILED_CODE
+
+    return with_version(jsonify(response), tag, last_modified)
+
+
+@bp.route('/funds/<int:fund_id>', methods=['DELETE'])
+async def delete_fund(fund_id):
+    db = await get_async_db()
+    try:
+        response = await async_services.delete_fund(db, fund_id)
+    except exceptions.NotFoundError as exc:
+        return jsonify({'error': str(exc)}), HTTP_NOT_FOUND_CODE
+
+    return jsonify(response), HTTP_NO_CONTENT_CODE
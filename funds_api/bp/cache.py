@@ -0,0 +1,19 @@
+"""Endpoints exposing the response cache."""
+from flask import Blueprint, jsonify
+
+from funds_api.cache import get_cache
+
+
+bp = Blueprint('cache', __name__)
+HTTP_OK_CODE = 200
+HTTP_NOT_FOUND_CODE = 404
+
+
+@bp.route('/cache/stats', methods=['GET'])
+def get_stats():
+    """Hit and miss counters of the response cache of this worker process."""
+    cache = get_cache()
+    if cache is None:
+        return jsonify({'error': 'The response cache is disabled'}), HTTP_NOT_FOUND_CODE
+
+    return jsonify(cache.stats()), HTTP_OK_CODE
@@ -0,0 +1,32 @@
+"""Conditional request helpers shared by the `funds` and `async_funds` blueprints."""
+import hashlib
+from datetime import datetime, timezone
+
+from werkzeug.sansio.http import is_resource_modified
+
+
+def query_tag(tag, mimetype, query_string):
+    """Tag of a response computed from every fund, which also depends on the query and the format."""
+    text = f'{tag} {mimetype} {query_string.decode()}'
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def _last_modified(timestamp):
+    return None if timestamp is None else datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def is_modified(headers, tag, last_modified):
+    """Whether the client does not hold the current response, according to `If-None-Match` or `If-Modified-Since`."""
+    return is_resource_modified(
+        http_if_none_match=headers.get('If-None-Match'),
+        http_if_modified_since=headers.get('If-Modified-Since'),
+        etag=tag,
+        last_modified=_last_modified(last_modified),
+    )
+
+
+def with_version(response, tag, last_modified):
+    """Sets the `ETag` and `Last-Modified` headers of a Flask or Quart response."""
+    response.set_etag(tag)
+    response.last_modified = _last_modified(last_modified)
+    return response
@@ -1,8 +1,12 @@
 """Endpoints for fund related operations."""
-from flask import Blueprint, request, jsonify
+import json
 
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from funds_api.cache import get_cache
 from funds_api.database import get_db
 from funds_api.services import exceptions, services
+from .conditional import is_modified, query_tag, with_version
 
 
 bp = Blueprint('funds', __name__)
@@ -10,7 +14,45 @@ HTTP_OK_CODE = 200
 HTTP_CREATED_CODE = 201
 HTTP_NO_CONTENT_CODE = 204
 HTTP_INPUT_ERROR_CODE = 400
+HTTP_NOT_MODIFIED_CODE = 304
 HTTP_NOT_FOUND_CODE = 404
+HTTP_PRECONDITION_FAILED_CODE = 412
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def _json_array_chunks(funds):
+    """Encodes the funds as one JSON array, a fund at a time."""
+    yield '['
+    for i, fund in enumerate(funds):
+        yield (',' if i else '') + json.dumps(fund)
+    yield ']'
+
+
+def _ndjson_chunks(funds):
+    for fund in funds:
+        yield json.dumps(fund) + '\n'
+
+
+def _not_modified(tag, last_modified):
+    return with_version(Response(status=HTTP_NOT_MODIFIED_CODE), tag, last_modified)
+
+
+def _cached_json(key, tag, produce):
+    """JSON response of the data returned by `produce()`, served from the cache while `tag` is unchanged."""
+    cache = get_cache()
+    body = None if cache is None else cache.get(key, tag)
+    if body is not None:
+        response = Response(body, HTTP_OK_CODE, mimetype='application/json')
+        response.headers['X-Cache'] = 'HIT'
+        return response
+
+    response = jsonify(produce())
+    if cache is not None:
+        cache.set(key, tag, response.get_data())
+        response.headers['X-Cache'] = 'MISS'
+
+    return response
+
 
 @bp.route('/funds', methods=['POST'])
 def add_fund():
@@ -24,10 +66,98 @@ def add_fund():
     return jsonify(response), HTTP_CREATED_CODE
 
 
+@bp.route('/funds:batch', methods=['POST'])
+def add_funds():
+    db = get_db()
+
+    try:
+        response = services.add_funds(db, request.json)
+    except exceptions.BatchError as exc:
+        return jsonify({'error': str(exc), 'errors': exc.errors}), HTTP_INPUT_ERROR_CODE
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return jsonify(response), HTTP_CREATED_CODE
+
+
+@bp.route('/funds:batch', methods=['PATCH'])
+def update_performances():
+    db = get_db()
+
+    try:
+        response = services.update_performances(db, request.json)
+    except exceptions.BatchError as exc:
+        return jsonify({'error': str(exc), 'errors': exc.errors}), HTTP_INPUT_ERROR_CODE
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return jsonify(response), HTTP_OK_CODE
+
+
+@bp.route('/funds:batch', methods=['DELETE'])
+def delete_funds():
+    db = get_db()
+
+    try:
+        response = services.delete_funds(db, request.json)
+    except exceptions.BatchError as exc:
+        return jsonify({'error': str(exc), 'errors': exc.errors}), HTTP_INPUT_ERROR_CODE
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return jsonify(response), HTTP_NO_CONTENT_CODE
+
+
 @bp.route('/funds', methods=['GET'])
 def get_all_funds():
     db = get_db()
-    return jsonify(db.get_all()), HTTP_OK_CODE
+    ndjson = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+    stream = ndjson or request.args.get('stream', '').lower() in ('1', 'true')
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+
+    # Read before the funds such that the response is never older than its tag.
+    tag, last_modified = services.get_version(db)
+    tag = query_tag(tag, mimetype, request.query_string)
+    if not is_modified(request.headers, tag, last_modified):
+        return _not_modified(tag, last_modified)
+
+    try:
+        if stream:
+            funds = services.iter_funds(db, request.args)
+        else:
+            response = _cached_json(
+                f'funds:{request.query_string.decode()}', tag, lambda: services.get_funds(db, request.args)
+            )
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    # Streamed responses are not cached, they are meant for listings too large to hold in memory.
+    if ndjson:
+        response = Response(stream_with_context(_ndjson_chunks(funds)), HTTP_OK_CODE, mimetype=NDJSON_MIMETYPE)
+    elif stream:
+        response = Response(stream_with_context(_json_array_chunks(funds)), HTTP_OK_CODE, mimetype=mimetype)
+
+    response.vary.add('Accept')
+    return with_version(response, tag, last_modified)
+
+
+@bp.route('/funds/stats', methods=['GET'])
+def get_stats():
+    db = get_db()
+
+    tag, last_modified = services.get_version(db)
+    tag = query_tag(tag, 'application/json', request.query_string)
+    if not is_modified(request.headers, tag, last_modified):
+        return _not_modified(tag, last_modified)
+
+    try:
+        response = _cached_json(
+            f'stats:{request.query_string.decode()}', tag, lambda: services.get_stats(db, request.args)
+        )
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
+
+    return with_version(response, tag, last_modified)
 
 
 @bp.route('/funds/<int:fund_id>', methods=['GET'])
@@ -35,7 +165,26 @@ def get_fund(fund_id):
     db = get_db()
 
     try:
-        response = services.get_fund(db, fund_id)
+        tag, last_modified = services.get_fund_version(db, fund_id)
+        if not is_modified(request.headers, tag, last_modified):
+            return _not_modified(tag, last_modified)
+
+        # Not cached, computing the tag reads the fund already.
+        response = jsonify(services.get_fund(db, fund_id))
+    except exceptions.NotFoundError as exc:
+        return jsonify({'error': str(exc)}), HTTP_NOT_FOUND_CODE
+
+    return with_version(response, tag, last_modified)
+
+
+@bp.route('/funds/<int:fund_id>/history', methods=['GET'])
+def get_history(fund_id):
+    db = get_db()
+
+    try:
+        response = services.get_history(db, fund_id, request.args)
+    except exceptions.InvalidInputError as exc:
+        return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
     except exceptions.NotFoundError as exc:
         return jsonify({'error': str(exc)}), HTTP_NOT_FOUND_CODE
 
@@ -47,13 +196,16 @@ def update_performance(fund_id):
     db = get_db()
 
     try:
-        response = services.update_performance(db, fund_id, request.json)
+        response = services.update_performance(db, fund_id, request.json, if_match=request.if_match or None)
+        tag, last_modified = services.get_fund_version(db, fund_id)
     except exceptions.InvalidInputError as exc:
         return jsonify({'error': str(exc)}), HTTP_INPUT_ERROR_CODE
     except exceptions.NotFoundError as exc:
         return jsonify({'error': str(exc)}), HTTP_NOT_FOUND_CODE
+    except exceptions.PreconditionFailedError as exc:
+        return jsonify({'error': str(exc)}), HTTP_PRECONDITION_FAILED_CODE
 
-    return jsonify(response), HTTP_OK_CODE
+    return with_version(jsonify(response), tag, last_modified)
 
 
 @bp.route('/funds/<int:fund_id>', methods=['DELETE'])
@@ -0,0 +1,59 @@
+"""Endpoint exposing the instrumentation, and the hooks timing every request of the app."""
+import os
+import time
+
+from flask import Blueprint, Response, g, jsonify, request, current_app
+
+from funds_api.metrics import CONTENT_TYPE, get_metrics, get_profiler, start_timings, stop_timings, write_profile
+
+
+bp = Blueprint('metrics', __name__)
+HTTP_OK_CODE = 200
+HTTP_NOT_FOUND_CODE = 404
+
+
+@bp.before_app_request
+def _start_request():
+    metrics = get_metrics()
+    profiler = get_profiler()
+    if metrics is None and profiler is None:
+        return
+
+    if metrics is not None:
+        start_timings()
+    if profiler is not None:
+        profiler.start()
+    g.funds_request = time.perf_counter(), metrics, profiler
+
+
+@bp.teardown_app_request
+def _finish_request(exc):
+    """Observes the duration of the request and its stages, and dumps the profile of a slow request."""
+    started = g.pop('funds_request', None)
+    if started is None:
+        return
+
+    start, metrics, profiler = started
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or 'unmatched'
+    if metrics is not None:
+        timings = stop_timings()
+        metrics.requests.labels(endpoint, request.method).observe(elapsed)
+        for stage, seconds in timings.seconds.items():
+            metrics.stages.labels(endpoint, stage).observe(seconds)
+
+    if profiler is not None:
+        profile = profiler.stop()
+        if profile and elapsed >= current_app.config['PROFILER_THRESHOLD']:
+            name = f'{time.time_ns()}-{request.method}-{endpoint}-{elapsed * 1000:.0f}ms.folded'
+            write_profile(os.path.join(current_app.config['PROFILER_DIRECTORY'], name), profile)
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics_text():
+    """Histograms of this worker process in the Prometheus text format."""
+    metrics = get_metrics()
+    if metrics is None:
+        return jsonify({'error': 'The metrics are disabled'}), HTTP_NOT_FOUND_CODE
+
+    return Response(metrics.render(), HTTP_OK_CODE, content_type=CONTENT_TYPE)
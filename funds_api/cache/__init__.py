@@ -0,0 +1,38 @@
+"""Response cache module."""
+import threading
+
+from flask import current_app
+
+from .memory_cache import LruCache
+from .shared_cache import SharedCache
+
+_cache_lock = threading.Lock()
+
+
+def _create_cache(config):
+    """Creates the cache selected by the app config, or returns `None` when caching is disabled."""
+    if config['RESPONSE_CACHE'] == 'memory':
+        return LruCache(
+            max_entries=config['RESPONSE_CACHE_MAX_ENTRIES'],
+            max_bytes=config['RESPONSE_CACHE_MAX_BYTES'],
+            ttl=config['RESPONSE_CACHE_TTL'],
+        )
+
+    if config['RESPONSE_CACHE'] == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('`RESPONSE_CACHE` redis needs the redis package, run `pip install redis`') from None
+
+        return SharedCache(redis.Redis.from_url(config['RESPONSE_CACHE_URL']), ttl=config['RESPONSE_CACHE_TTL'])
+
+    return None
+
+
+def get_cache():
+    """Returns the cache shared by every request of the app, or `None` when caching is disabled."""
+    with _cache_lock:
+        if 'funds_cache' not in current_app.extensions:
+            current_app.extensions['funds_cache'] = _create_cache(current_app.config)
+
+        return current_app.extensions['funds_cache']
@@ -0,0 +1,53 @@
+import threading
+from abc import abstractmethod, ABC
+
+
+#  Response cache abstraction such that the blueprint does not rely on where the responses are stored.
+class AbstractCache(ABC):
+    """Stores serialized responses along with the version tag of the data they were serialized from.
+
+    A lookup only hits an entry stored for the same tag, hence an entry is never served once its data changed, even
+    if the change was made by another process. `hits` and `misses` count the lookups.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._counters_lock = threading.Lock()
+
+    def get(self, key, tag):
+        """Returns the bytes stored under the key for the tag, or `None`."""
+        entry = self._get(key)
+        value = None
+        if entry is not None:
+            entry_tag, _, entry_value = entry.partition(b'\n')
+            if entry_tag == tag.encode():
+                value = entry_value
+
+        with self._counters_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def set(self, key, tag, value):
+        """Stores the bytes under the key for the tag, which cannot contain a new line. The entry may be dropped at
+        any time."""
+        self._set(key, tag.encode() + b'\n' + value)
+
+    def stats(self):
+        with self._counters_lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    @abstractmethod
+    def _get(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _set(self, key, entry):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, *keys):
+        raise NotImplementedError
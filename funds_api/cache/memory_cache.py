@@ -0,0 +1,63 @@
+import collections
+import threading
+import time
+
+from .base import AbstractCache
+
+
+class LruCache(AbstractCache):
+    """In process cache which evicts the least recently used entries beyond `max_entries` or `max_bytes`.
+
+    Entries expire `ttl` seconds after they are stored, `None` keeps them until they are evicted.
+    """
+    def __init__(self, max_entries=10_000, max_bytes=64 * 2 ** 20, ttl=None):
+        super().__init__()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        # Key to `(expires_at, value)`, the most recently used entry last.
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        if len(value) > self._max_bytes:
+            return
+
+        expires_at = None if self._ttl is None else time.monotonic() + self._ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = expires_at, value
+            self._bytes += len(value)
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {**super().stats(), 'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
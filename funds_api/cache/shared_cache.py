@@ -0,0 +1,24 @@
+from .base import AbstractCache
+
+
+class SharedCache(AbstractCache):
+    """Cache in a store shared by every worker process, such as Redis.
+
+    `client` needs the `get(key)`, `set(key, value, ex=ttl)` and `delete(*keys)` methods of a Redis client. Keys are
+    prefixed with `prefix` such that the store can be shared with other applications.
+    """
+    def __init__(self, client, ttl=None, prefix='funds_api:'):
+        super().__init__()
+        self._client = client
+        self._ttl = ttl
+        self._prefix = prefix
+
+    def _get(self, key):
+        return self._client.get(self._prefix + key)
+
+    def _set(self, key, value):
+        self._client.set(self._prefix + key, value, ex=self._ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self._prefix + key for key in keys))
@@ -1,31 +1,178 @@
 """Database adaptor module."""
+import asyncio
+import atexit
 import json
 import os
 import pathlib
+import threading
 
 import click
+from flask import current_app
 
-from .json_db import JsonDb
+from funds_api.metrics import get_metrics, instrument_db, timed
+from .async_json_db import AsyncJsonDb
+from .base import AbstractDb
+from .history import HistoryStore, history_path
+from .journal_db import JournaledJsonDb, iter_journaled_funds
+from .json_db import JsonDb, atomic_write
+from .mysql_db import MySqlDb
+from .snapshot import is_snapshot, pack_snapshot
 
 DATA_FILE = pathlib.Path(__file__).parent.parent / 'data.json'
 
+_db_lock = threading.Lock()
+# Methods whose calls are timed when the metrics are enabled, `refresh()` is part of the `get_db` stage instead.
+_TIMED_METHODS = (*sorted(AbstractDb.__abstractmethods__), 'fund_version')
+
+
+def _create_history(config):
+    if config['DATABASE_HISTORY']:
+        return HistoryStore(history_path(config['DATABASE_PATH']))
+
+    return None
+
+
+def _create_db(config):
+    """Creates the database instance selected by the app config."""
+    if config['DATABASE_BACKEND'] == 'mysql':
+        db = MySqlDb.from_config(
+            pool_size=config['MYSQL_POOL_SIZE'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            host=config['MYSQL_HOST'],
+            port=config['MYSQL_PORT'],
+            database=config['MYSQL_DATABASE'],
+        )
+        db.history = _create_history(config)
+        return db
+
+    options = dict(
+        group_commit_window=config['DATABASE_GROUP_COMMIT_WINDOW'],
+        binary=config['DATABASE_FORMAT'] == 'binary',
+        write_behind_interval=config['DATABASE_WRITE_BEHIND_INTERVAL'],
+        write_behind_max_dirty=config['DATABASE_WRITE_BEHIND_MAX_DIRTY'],
+    )
+    if config['DATABASE_JOURNAL']:
+        db = JournaledJsonDb(compact_threshold=config['DATABASE_COMPACT_THRESHOLD'], **options)
+    else:
+        db = JsonDb(**options)
+
+    db.connect(config['DATABASE_PATH'])
+    if options['write_behind_interval'] is not None:
+        # Persists the buffered writes when the worker process exits, e.g. on a graceful shutdown of gunicorn.
+        atexit.register(db.close)
+    db.history = _create_history(config)
+    return db
+
+
+@timed('get_db')
 def get_db():
-    """Returns the database instance such that it is accessible by multiple functions."""
-    db = JsonDb()
-    db.connect(DATA_FILE)
+    """Returns the database instance such that it is accessible by multiple functions.
+
+    The instance is shared by every request of the app, the JSON file is only parsed again when it was changed
+    on disk since it was last loaded.
+    """
+    with _db_lock:
+        db = current_app.extensions.get('funds_db')
+
+        if db is None:
+            db = _create_db(current_app.config)
+            metrics = get_metrics()
+            if metrics is not None:
+                instrument_db(db, metrics.db_methods, _TIMED_METHODS)
+            current_app.extensions['funds_db'] = db
+        else:
+            db.refresh()
 
     return db
 
 
-def init_db():
-    """Creates the database JSON file if not exists."""
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w') as handler:
+def _create_async_db(config):
+    """Creates the async database instance selected by the app config."""
+    if config['DATABASE_BACKEND'] == 'mysql':
+        # Only the ASGI app with the MySQL backend needs `mysql.connector.aio`.
+        from .async_mysql_db import AsyncMySqlDb
+
+        db = AsyncMySqlDb.from_config(
+            pool_size=config['MYSQL_POOL_SIZE'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            host=config['MYSQL_HOST'],
+            port=config['MYSQL_PORT'],
+            database=config['MYSQL_DATABASE'],
+        )
+        db.history = _create_history(config)
+        return db
+
+    return AsyncJsonDb(_create_db(config))
+
+
+async def get_async_db():
+    """Returns the async database instance shared by every request of the ASGI app, see `get_db()`."""
+    # Quart is only installed to serve the ASGI app, the WSGI app and the commands do not need it.
+    import quart
+
+    app = quart.current_app
+    db = app.extensions.get('funds_async_db')
+    if db is None:
+        async with app.extensions.setdefault('funds_async_db_lock', asyncio.Lock()):
+            db = app.extensions.get('funds_async_db')
+            if db is None:
+                # Loading the JSON file blocks, hence it runs in a worker thread.
+                db = app.extensions['funds_async_db'] = await asyncio.to_thread(_create_async_db, app.config)
+                return db
+
+    # Not under the lock such that the requests do not wait for each other.
+    await db.refresh()
+    return db
+
+
+async def close_async_db():
+    """Releases the async database instance of the ASGI app, if created."""
+    import quart
+
+    db = quart.current_app.extensions.pop('funds_async_db', None)
+    if db is not None:
+        await db.close()
+
+
+def init_db(path=DATA_FILE, binary=False):
+    """Creates the database JSON file, or binary snapshot with `binary`, if not exists."""
+    if not os.path.exists(path):
+        if binary:
+            atomic_write(path, pack_snapshot([]))
+            return
+
+        with open(path, 'w') as handler:
             json.dump({}, handler, indent=4)
 
 
+def convert_db(source, target):
+    """Writes the funds of the database file `source` into `target` in the other format and returns that format.
+
+    A JSON file is converted into a binary snapshot and a binary snapshot into a JSON file. The log of a journaled
+    `source` is applied.
+    """
+    funds = iter_journaled_funds(source)
+    if is_snapshot(source):
+        atomic_write(target, json.dumps(dict(funds), indent=4))
+        return 'json'
+
+    atomic_write(target, pack_snapshot(funds))
+    return 'binary'
+
+
 @click.command('init-db')
 def init_db_command():
     """Clear the existing data and create new tables."""
-    init_db()
+    init_db(current_app.config['DATABASE_PATH'], binary=current_app.config['DATABASE_FORMAT'] == 'binary')
     click.echo('Initialized the JSON database.')
+
+
+@click.command('convert-db')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@click.argument('target', type=click.Path(dir_okay=False))
+def convert_db_command(source, target):
+    """Convert a JSON database file into a binary snapshot, or a binary snapshot into a JSON file."""
+    file_format = convert_db(source, target)
+    click.echo(f'Wrote the {file_format} database {target}.')
@@ -0,0 +1,84 @@
+from abc import abstractmethod, ABC
+
+from .base import fund_tag
+
+
+#  Counterpart of `AbstractDb` whose methods are coroutines, served to the ASGI app. Each method has the semantics
+#  of the `AbstractDb` method of the same name.
+class AsyncAbstractDb(ABC):
+    history = None
+
+    async def refresh(self):
+        """Picks up changes made outside of this instance, storages that are always up to date do nothing."""
+
+    async def close(self):
+        """Releases the resources of the instance, e.g. pooled connections."""
+
+    @abstractmethod
+    async def version(self):
+        raise NotImplementedError
+
+    async def fund_version(self, id):
+        fund_data = await self.get_fund(id)
+        if fund_data is None:
+            return None
+
+        # A fund changed at the latest with the collection.
+        return fund_tag(fund_data), (await self.version())[1]
+
+    @abstractmethod
+    async def get_all_ids(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def exists(self, id):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_fund(self, fund):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_funds(self, funds):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_fund(self, id, data):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_fund_if_unchanged(self, id, expected, data):
+        """Replaces the data of the fund by `data` only if it currently equals `expected`, returns whether it did."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_funds(self, data_by_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_fund(self, id):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_all(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_range(self, after_id=None, limit=None, fields=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find(self, equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def stats(self, group_by=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_fund(self, id):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_funds(self, ids):
+        raise NotImplementedError
@@ -0,0 +1,46 @@
+import asyncio
+
+from .async_base import AsyncAbstractDb
+
+
+def _offload(name):
+    """Coroutine method running the method `name` of the wrapped database in a worker thread."""
+    async def method(self, *args, **kwargs):
+        return await asyncio.to_thread(getattr(self.db, name), *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+class AsyncJsonDb(AsyncAbstractDb):
+    """Async interface of a `JsonDb` or `JournaledJsonDb`.
+
+    Every call runs in a worker thread of the event loop. Reads are mostly served from memory but may wait for the
+    lock of the instance while a write of another worker process is loaded, and writes wait for the disk, hence no
+    call runs on the event loop itself.
+    """
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def history(self):
+        return self.db.history
+
+    refresh = _offload('refresh')
+    close = _offload('close')
+    version = _offload('version')
+    fund_version = _offload('fund_version')
+    get_all_ids = _offload('get_all_ids')
+    exists = _offload('exists')
+    add_fund = _offload('add_fund')
+    add_funds = _offload('add_funds')
+    update_fund = _offload('update_fund')
+    update_fund_if_unchanged = _offload('update_fund_if_unchanged')
+    update_funds = _offload('update_funds')
+    get_fund = _offload('get_fund')
+    get_all = _offload('get_all')
+    get_range = _offload('get_range')
+    find = _offload('find')
+    stats = _offload('stats')
+    delete_fund = _offload('delete_fund')
+    delete_funds = _offload('delete_funds')
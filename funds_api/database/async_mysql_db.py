@@ -0,0 +1,173 @@
+import asyncio
+import contextlib
+
+from mysql.connector import aio
+
+from .async_base import AsyncAbstractDb
+from .mysql_db import (
+    COLUMNS,
+    _DELETE_SQL,
+    _EXISTS_SQL,
+    _INSERT_SQL,
+    _SELECT_ALL_SQL,
+    _SELECT_FUND_SQL,
+    _SELECT_IDS_SQL,
+    _UPDATE_IF_UNCHANGED_SQL,
+    _UPDATE_SQL,
+    _VERSION_SQL,
+    _find_query,
+    _insert_params,
+    _range_query,
+    _stats_query,
+    _to_fund,
+    _to_stats,
+    _update_if_unchanged_params,
+    _update_params,
+)
+
+
+class AsyncConnectionPool:
+    """Pool of at most `pool_size` connections of `mysql.connector.aio`, which has no pool of its own.
+
+    Connections are opened on demand, a coroutine waits for a connection to be released once every connection is in
+    use. `config` is passed to each connection.
+    """
+    def __init__(self, pool_size=5, **config):
+        self._config = config
+        self._idle = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def get_connection(self):
+        await self._slots.acquire()
+        try:
+            while not self._idle.empty():
+                conn = self._idle.get_nowait()
+                if await conn.is_connected():
+                    return conn
+
+            return await aio.connect(**self._config)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        self._idle.put_nowait(conn)
+        self._slots.release()
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+
+
+class AsyncMySqlDb(AsyncAbstractDb):
+    """Async interface of the `funds` table in MySQL, running the same statements as `MySqlDb`.
+
+    Every method borrows a connection from the pool, hence one instance can be shared by all the coroutines of a
+    worker and at most the pool size of statements run at once.
+    """
+    def __init__(self, pool):
+        self._pool = pool
+
+    @classmethod
+    def from_config(cls, pool_size=5, **config):
+        """Creates the instance with a pool of `pool_size` connections, `config` is passed to each connection."""
+        return cls(AsyncConnectionPool(pool_size=pool_size, **config))
+
+    async def close(self):
+        await self._pool.close()
+
+    @contextlib.asynccontextmanager
+    async def _cursor(self):
+        """Yields a prepared statement cursor and commits once the block succeeds."""
+        conn = await self._pool.get_connection()
+        try:
+            cursor = await conn.cursor(prepared=True)
+            try:
+                yield cursor
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            finally:
+                await cursor.close()
+        finally:
+            self._pool.release(conn)
+
+    async def _select(self, query):
+        sql, params, columns = query
+        async with self._cursor() as cursor:
+            await cursor.execute(sql, params)
+            return [_to_fund(row, columns) for row in await cursor.fetchall()]
+
+    async def version(self):
+        # Maintained by the triggers created by `create-schema`.
+        async with self._cursor() as cursor:
+            await cursor.execute(_VERSION_SQL)
+            version, modified_at = await cursor.fetchone()
+
+        return str(version), modified_at
+
+    async def get_all_ids(self):
+        async with self._cursor() as cursor:
+            await cursor.execute(_SELECT_IDS_SQL)
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def exists(self, id):
+        async with self._cursor() as cursor:
+            await cursor.execute(_EXISTS_SQL, (id,))
+            return await cursor.fetchone() is not None
+
+    async def get_all(self):
+        return await self._select((_SELECT_ALL_SQL, (), COLUMNS))
+
+    async def get_range(self, after_id=None, limit=None, fields=None):
+        return await self._select(_range_query(after_id, limit, fields))
+
+    async def find(self, equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+        return await self._select(_find_query(equals, ranges, sort, descending, after_id, limit, fields))
+
+    async def stats(self, group_by=None):
+        sql, params, _ = _stats_query(group_by)
+        async with self._cursor() as cursor:
+            await cursor.execute(sql, params)
+            return _to_stats(await cursor.fetchall(), group_by)
+
+    async def add_fund(self, fund_data):
+        await self.add_funds([fund_data])
+
+    async def add_funds(self, funds):
+        async with self._cursor() as cursor:
+            await cursor.executemany(_INSERT_SQL, _insert_params(funds))
+
+    async def update_fund(self, id, data):
+        await self.update_funds({id: data})
+
+    async def update_fund_if_unchanged(self, id, expected, data):
+        if data == expected:
+            # MySQL counts the changed rows only, the row is then left as is and compared.
+            return await self.get_fund(id) == expected
+
+        async with self._cursor() as cursor:
+            await cursor.execute(_UPDATE_IF_UNCHANGED_SQL, _update_if_unchanged_params(id, expected, data))
+            return cursor.rowcount == 1
+
+    async def update_funds(self, data_by_id):
+        async with self._cursor() as cursor:
+            await cursor.executemany(_UPDATE_SQL, _update_params(data_by_id))
+
+    async def get_fund(self, id):
+        async with self._cursor() as cursor:
+            await cursor.execute(_SELECT_FUND_SQL, (id,))
+            row = await cursor.fetchone()
+
+        return _to_fund(row) if row else None
+
+    async def delete_fund(self, id):
+        async with self._cursor() as cursor:
+            await cursor.execute(_DELETE_SQL, (id,))
+            if not cursor.rowcount:
+                print(f'Cannot find {id}, no entry deleted.')
+
+    async def delete_funds(self, ids):
+        async with self._cursor() as cursor:
+            await cursor.executemany(_DELETE_SQL, [(id,) for id in ids])
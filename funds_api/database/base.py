@@ -1,22 +1,79 @@
+import hashlib
+import json
 from abc import abstractmethod, ABC
 
 
+def fund_tag(fund_data):
+    """Tag of the fund content, it changes whenever a field of the fund changes."""
+    return hashlib.blake2b(json.dumps(fund_data, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
 #  Data access abstraction layer such that other components do not rely on the underlying data storage.
 class AbstractDb(ABC):
+    # `HistoryStore` recording the points of the funds written through the services, `None` when disabled.
+    history = None
+
+    def refresh(self):
+        """Picks up changes made outside of this instance, storages that are always up to date do nothing."""
+
+    def close(self):
+        """Persists the buffered changes and releases the resources of the instance."""
+
+    @abstractmethod
+    def version(self):
+        """Returns `(tag, last_modified)` of the whole collection.
+
+        The tag changes with every change of any fund, instances connected to the same unchanged storage return the
+        same tag. `last_modified` is the time of the last change as a UNIX timestamp, or `None` if unknown.
+        """
+        raise NotImplementedError
+
+    def fund_version(self, id):
+        """Returns `(tag, last_modified)` of the fund, or `None` if it does not exist."""
+        fund_data = self.get_fund(id)
+        if fund_data is None:
+            return None
+
+        # A fund changed at the latest with the collection.
+        return fund_tag(fund_data), self.version()[1]
+
     @abstractmethod
     def get_all_ids(self):
         raise NotImplementedError
 
+    @abstractmethod
+    def exists(self, id):
+        """Whether a fund with the id exists, without loading every id."""
+        raise NotImplementedError
+
     @abstractmethod
     def add_fund(self, fund):
         raise NotImplementedError
 
     @abstractmethod
-    def update_fund(self, id):
+    def add_funds(self, funds):
+        """Adds every fund in one commit."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_fund(self, id, data):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_fund_if_unchanged(self, id, expected, data):
+        """Replaces the data of the fund by `data` only if it currently equals `expected`, returns whether it did.
+
+        The comparison and the write are atomic with respect to every other write of the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_funds(self, data_by_id):
+        """Replaces the data of every fund in the mapping in one commit."""
         raise NotImplementedError
 
     @abstractmethod
-    def get_fund(self, id, data):
+    def get_fund(self, id):
         raise NotImplementedError
 
     @abstractmethod
@@ -24,6 +81,33 @@ class AbstractDb(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def delete_fund(self):
+    def get_range(self, after_id=None, limit=None, fields=None):
+        """Funds ordered by id starting after `after_id`, at most `limit` of them and only with the `fields` keys."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find(self, equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+        """Funds whose fields equal the `equals` values and lie within the `ranges` mapping a field to inclusive
+        `(low, high)` bounds, where `None` leaves a side open.
+
+        The funds are ordered by the `sort` field, with the id breaking ties, or by id starting after `after_id`.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self, group_by=None):
+        """Fund count, performance mean and median and nav percentiles of every group of funds ordered by group.
+
+        `group_by` is `manager_name`, `year` or `month`, each group has its value under that key. `None` returns a
+        single group of every fund.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_fund(self, id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_funds(self, ids):
+        """Deletes every fund in one commit, missing ids are ignored."""
         raise NotImplementedError
-        
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Columnar view of the JSON database serving the grouped statistics."""
+import array
+import bisect
+import collections
+
+
+# Percentiles of the nav returned for every group, computed with the nearest rank method.
+NAV_PERCENTILES = (25, 50, 75, 90)
+# Functions returning the group of a fund for each supported `group_by`, `None` puts every fund in one group.
+GROUP_KEYS = {
+    None: lambda fund_data: None,
+    'manager_name': lambda fund_data: fund_data['manager_name'],
+    'year': lambda fund_data: fund_data['date'][:4],
+    'month': lambda fund_data: fund_data['date'][:7],
+}
+
+
+def _nearest_rank(sorted_values, percentile):
+    # The smallest value such that at least `percentile` percent of the values are lower or equal.
+    rank = -(-percentile * len(sorted_values) // 100)
+    return sorted_values[max(rank, 1) - 1]
+
+
+def _sorted_stats(navs, performances):
+    count = len(performances)
+    stats = {
+        'count': count,
+        'performance_mean': sum(performances) / count,
+        'performance_median': (performances[(count - 1) // 2] + performances[count // 2]) / 2,
+    }
+    for percentile in NAV_PERCENTILES:
+        stats[f'nav_p{percentile}'] = _nearest_rank(navs, percentile)
+
+    return stats
+
+
+def group_stats(navs, performances):
+    """Statistics of a group of funds given their nav and performance values."""
+    return _sorted_stats(sorted(navs), sorted(performances))
+
+
+class _Group:
+    __slots__ = ('navs', 'performances')
+
+    def __init__(self, navs=(), performances=()):
+        self.navs = array.array('d', sorted(navs))
+        self.performances = array.array('d', sorted(performances))
+
+
+class ColumnarView:
+    """Keeps the nav and performance of the funds of every group in sorted typed arrays.
+
+    It is maintained like the other indexes, a write inserts or removes one value per array with a binary search.
+    Medians and percentiles are then read at their rank and only the mean is summed.
+    """
+    def __init__(self):
+        self._groups = {group_by: {} for group_by in GROUP_KEYS}
+
+    def add(self, id, fund_data):
+        for group_by, key in GROUP_KEYS.items():
+            group = self._groups[group_by].setdefault(key(fund_data), _Group())
+            bisect.insort(group.navs, fund_data['nav'])
+            bisect.insort(group.performances, fund_data['performance'])
+
+    def remove(self, id, fund_data):
+        for group_by, key in GROUP_KEYS.items():
+            group = self._groups[group_by][key(fund_data)]
+            del group.navs[bisect.bisect_left(group.navs, fund_data['nav'])]
+            del group.performances[bisect.bisect_left(group.performances, fund_data['performance'])]
+            if not group.navs:
+                del self._groups[group_by][key(fund_data)]
+
+    def stats(self, group_by=None):
+        """Statistics of every group ordered by group, each with the group under the `group_by` key."""
+        result = []
+        for key, group in sorted(self._groups[group_by].items(), key=lambda item: item[0]):
+            stats = _sorted_stats(group.navs, group.performances)
+            result.append(stats if group_by is None else {group_by: key, **stats})
+
+        return result
+
+    def rebuild(self, data):
+        for group_by, key in GROUP_KEYS.items():
+            values = collections.defaultdict(lambda: ([], []))
+            for fund_data in data.values():
+                navs, performances = values[key(fund_data)]
+                navs.append(fund_data['nav'])
+                performances.append(fund_data['performance'])
+
+            self._groups[group_by] = {group: _Group(*group_values) for group, group_values in values.items()}
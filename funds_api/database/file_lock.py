@@ -0,0 +1,54 @@
+"""Advisory file locks shared by the worker processes using the same JSON database."""
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # Windows.
+    fcntl = None
+    import msvcrt
+
+
+def lock_path(path):
+    return f'{path}.lock'
+
+
+def _lock(fd, shared):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return
+
+    while True:
+        try:
+            # Gives up with an error after 10 attempts a second apart.
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def file_lock(path, shared=False):
+    """Holds the lock of the file at `path`, which is created if missing.
+
+    Shared locks are held together while an exclusive lock is held alone. The file is opened on every call such that
+    two threads of one process exclude each other as two processes do. Windows only has exclusive locks, hence shared
+    locks are exclusive there.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _lock(fd, shared)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
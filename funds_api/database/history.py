@@ -0,0 +1,156 @@
+"""Time series of the nav and performance of every fund."""
+import array
+import bisect
+import collections
+import datetime
+import os
+import struct
+import threading
+import time
+
+
+# A point of the history: the UNIX time of the write, the nav and the performance.
+POINT = struct.Struct('<ddd')
+# Time of the record clearing the points before it, no write happens at the epoch.
+_CLEARED = 0.0
+
+
+def history_path(path):
+    """Directory of the history files of the database at `path`."""
+    return f'{path}.history'
+
+
+def _day_start(date):
+    """UNIX time of the start of the UTC day of a `yyyy-mm-dd` date."""
+    return datetime.datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _iso_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+class FundHistory:
+    """Points of one fund in typed arrays ordered by the time of the write."""
+    __slots__ = ('times', 'navs', 'performances', 'offset')
+
+    def __init__(self):
+        self.times = array.array('d')
+        self.navs = array.array('d')
+        self.performances = array.array('d')
+        # Bytes of the history file applied to the arrays.
+        self.offset = 0
+
+    def clear(self):
+        del self.times[:], self.navs[:], self.performances[:]
+
+    def add(self, written_at, nav, performance):
+        """Adds the point of a write, after the points of writes at the same time."""
+        # Points mostly come in time order, hence they are mostly appended.
+        if not self.times or written_at >= self.times[-1]:
+            self.times.append(written_at)
+            self.navs.append(nav)
+            self.performances.append(performance)
+            return
+
+        # Writes of several processes may be appended slightly out of order.
+        i = bisect.bisect_right(self.times, written_at)
+        self.times.insert(i, written_at)
+        self.navs.insert(i, nav)
+        self.performances.insert(i, performance)
+
+    def points(self, date_from=None, date_to=None, max_points=None):
+        """Points written within the inclusive range of UTC days, the last point of each of `max_points` buckets of the
+        same number of points if more."""
+        start = 0 if date_from is None else bisect.bisect_left(self.times, _day_start(date_from))
+        stop = len(self.times) if date_to is None else bisect.bisect_left(self.times, _day_start(date_to) + 86400)
+        count = max(stop - start, 0)
+        if max_points is None or count <= max_points:
+            points = zip(self.times[start:stop], self.navs[start:stop], self.performances[start:stop])
+        else:
+            indexes = [start + (bucket + 1) * count // max_points - 1 for bucket in range(max_points)]
+            points = ((self.times[i], self.navs[i], self.performances[i]) for i in indexes)
+
+        return [
+            {'time': _iso_time(written_at), 'nav': nav, 'performance': performance}
+            for written_at, nav, performance in points
+        ]
+
+
+class HistoryStore:
+    """Keeps the points of each fund in an append only file of fixed width records, `<directory>/<id>.bin`.
+
+    Recording a fund appends a single record. The points of a fund are read into a `FundHistory` on first use and
+    the records appended since, including by other processes, are read on the next use, hence a range query only
+    costs a file size check and two binary searches. At most `max_cached` funds are held in memory.
+
+    Records are small enough to be appended atomically, hence processes can share the directory without a lock. The
+    files are not synced to disk such that recording does not double the cost of a write, a crash may lose the last
+    points.
+    """
+    def __init__(self, directory, max_cached=1000):
+        self._directory = directory
+        self._max_cached = max_cached
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, id):
+        return os.path.join(self._directory, f'{id}.bin')
+
+    def record(self, funds, written_at=None):
+        """Appends the nav and performance of every fund to its history, as written at `written_at` or now."""
+        written_at = time.time() if written_at is None else written_at
+        records = collections.defaultdict(bytearray)
+        for fund_data in funds:
+            point = POINT.pack(written_at, fund_data['nav'], fund_data['performance'])
+            records[fund_data['id']] += point
+
+        for id, data in records.items():
+            with open(self._path(id), 'ab') as handler:
+                handler.write(data)
+
+    def remove(self, ids):
+        """Clears the history of the funds.
+
+        A record clearing the points is appended rather than the file being deleted, such that the file is only ever
+        appended to and the offsets read by other processes stay valid.
+        """
+        for id in ids:
+            if os.path.exists(self._path(id)):
+                with open(self._path(id), 'ab') as handler:
+                    handler.write(POINT.pack(_CLEARED, 0, 0))
+
+    def _load(self, id):
+        """Returns the up to date history of the fund."""
+        path = self._path(id)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            size = 0
+
+        history = self._cache.pop(id, None) or FundHistory()
+
+        if size > history.offset:
+            with open(path, 'rb') as handler:
+                handler.seek(history.offset)
+                data = handler.read(size - history.offset)
+
+            # A record being appended by another process is read next time.
+            data = data[:len(data) - len(data) % POINT.size]
+            for point in POINT.iter_unpack(data):
+                if point[0] == _CLEARED:
+                    history.clear()
+                else:
+                    history.add(*point)
+            history.offset += len(data)
+
+        self._cache[id] = history
+        if len(self._cache) > self._max_cached:
+            self._cache.popitem(last=False)
+
+        return history
+
+    def get(self, id, date_from=None, date_to=None, max_points=None):
+        """Points of the fund ordered by time, see `FundHistory.points()`."""
+        with self._lock:
+            return self._load(id).points(date_from, date_to, max_points)
@@ -0,0 +1,61 @@
+"""In memory secondary indexes of the JSON database."""
+import bisect
+import collections
+
+
+class HashIndex:
+    """Maps a field value to the ids of the funds with that value."""
+    def __init__(self, field):
+        self.field = field
+        self._ids = collections.defaultdict(set)
+
+    def add(self, id, fund_data):
+        self._ids[fund_data[self.field]].add(id)
+
+    def remove(self, id, fund_data):
+        ids = self._ids.get(fund_data[self.field])
+        if ids is not None:
+            ids.discard(id)
+            if not ids:
+                del self._ids[fund_data[self.field]]
+
+    def lookup(self, value):
+        return self._ids.get(value, set())
+
+    def rebuild(self, data):
+        self._ids.clear()
+        for id, fund_data in data.items():
+            self.add(id, fund_data)
+
+
+class SortedIndex:
+    """Keeps `(value, id)` pairs of a field sorted, such that ranges and the smallest or largest values are found
+    with a binary search instead of a scan."""
+    def __init__(self, field):
+        self.field = field
+        self._entries = []
+
+    def add(self, id, fund_data):
+        bisect.insort(self._entries, (fund_data[self.field], id))
+
+    def remove(self, id, fund_data):
+        entry = (fund_data[self.field], id)
+        index = bisect.bisect_left(self._entries, entry)
+        if index < len(self._entries) and self._entries[index] == entry:
+            del self._entries[index]
+
+    def bounds(self, low=None, high=None):
+        """Returns the slice of the entries with a value between `low` and `high`, both inclusive."""
+        start = 0 if low is None else bisect.bisect_left(self._entries, (low,))
+        # Any id compares lower than the value of the next entry.
+        stop = len(self._entries) if high is None else bisect.bisect_left(self._entries, (high, float('inf')))
+        return start, max(start, stop)
+
+    def ids(self, start, stop, descending=False):
+        """Yields the ids of the entries in the slice, in value order."""
+        indexes = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+        for index in indexes:
+            yield self._entries[index][1]
+
+    def rebuild(self, data):
+        self._entries = sorted((fund_data[self.field], id) for id, fund_data in data.items())
@@ -0,0 +1,258 @@
+import json
+import os
+import time
+
+from .json_db import JsonDb, _file_signature, atomic_write
+from .json_stream import iter_funds
+from .snapshot import Snapshot, is_snapshot
+
+
+def _log_path(path):
+    return f'{path}.log'
+
+
+def _iter_log_records(log_path, offset=0):
+    """Yields the complete records of the log after the first `offset` bytes with the number of bytes they span,
+    stopping at a torn record."""
+    if not os.path.exists(log_path):
+        return
+
+    with open(log_path, 'rb') as handler:
+        handler.seek(offset)
+        for line in handler:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written record from a crash, every record after it is discarded as well.
+                return
+
+            if not line.endswith(b'\n'):
+                return
+
+            yield record, len(line)
+
+
+def iter_journaled_funds(path):
+    """Yields the id and data of every fund of a journaled database while the snapshot is read.
+
+    Only the log, which compaction keeps short, is held in memory, such that large snapshots can be streamed.
+    """
+    changes = {record['id']: record['fund'] for record, _ in _iter_log_records(_log_path(path))}
+    funds = Snapshot(path).items() if is_snapshot(path) else iter_funds(path)
+    for id, fund_data in funds:
+        if id in changes:
+            fund_data = changes.pop(id)
+            if fund_data is None:
+                continue
+
+        yield id, fund_data
+
+    # Funds added after the snapshot was written.
+    for id, fund_data in changes.items():
+        if fund_data is not None:
+            yield id, fund_data
+
+
+class JournaledJsonDb(JsonDb):
+    """JSON database which appends mutations to a log file instead of rewriting the whole JSON file.
+
+    The JSON file becomes a snapshot that is only rewritten by `compact()`, which happens automatically once the
+    log holds `compact_threshold` records. Connecting replays the log on top of the snapshot, hence a crash
+    between a mutation and the next compaction does not lose data.
+
+    Records are appended while holding the exclusive file lock, which a replay waits for with a shared lock such
+    that it never reads a record being appended.
+
+    In the write behind mode the changes are appended when persisted, a single record per changed fund.
+    """
+    def __init__(self, compact_threshold=1000, group_commit_window=0, binary=False, write_behind_interval=None,
+                 write_behind_max_dirty=1000):
+        super().__init__(
+            group_commit_window=group_commit_window,
+            binary=binary,
+            write_behind_interval=write_behind_interval,
+            write_behind_max_dirty=write_behind_max_dirty,
+        )
+        self._compact_threshold = compact_threshold
+        self._log_records = 0
+        # Bytes of the log applied to the data.
+        self._log_offset = 0
+
+    @property
+    def log_path(self):
+        return _log_path(self._path)
+
+    def compact(self):
+        """Writes the current data into the snapshot and empties the log."""
+        with self._file_lock():
+            with self._lock:
+                # Another process may have appended records since they were replayed.
+                self._catch_up_locked()
+                atomic_write(self._path, self._dumps())
+                # A crash before the log is emptied only replays records already contained in the snapshot.
+                with open(self.log_path, 'w'):
+                    pass
+
+                # The snapshot holds the changes of the write behind mode as well.
+                self._persisted_locked(len(self._pending))
+                self._log_records = 0
+                self._log_offset = 0
+                self._synced_version = self._version
+                self._signature = self._current_signature()
+                self._loaded_modified = self._signature_time()
+                self._modified.clear()
+
+    def _current_signature(self):
+        return super()._current_signature(), _file_signature(self.log_path)
+
+    def _signature_time(self):
+        return max(signature[1] for signature in self._signature if signature is not None) / 1e9
+
+    def _load(self):
+        super()._load()
+        self._log_records = self._replay()
+
+    def _replay(self, offset=0):
+        """Applies the log records after the first `offset` bytes and returns the number of records replayed."""
+        if not os.path.exists(self.log_path):
+            self._log_offset = 0
+            return 0
+
+        records = 0
+        valid_size = offset
+        modified = os.path.getmtime(self.log_path)
+        for record, size in _iter_log_records(self.log_path, offset):
+            self._apply({record['id']: record['fund']}, modified)
+            records += 1
+            valid_size += size
+
+        if valid_size != os.path.getsize(self.log_path):
+            # Drop the torn record such that the next append starts on a new line.
+            with open(self.log_path, 'r+b') as handler:
+                handler.truncate(valid_size)
+
+        self._log_offset = valid_size
+        return records
+
+    def _catch_up_locked(self):
+        if not self.is_stale():
+            return
+
+        snapshot_signature, log_signature = self._current_signature()
+        # Compactions replace the snapshot, as long as it is the same one other processes only appended records.
+        if (
+            snapshot_signature == self._signature[0]
+            and log_signature is not None
+            and (self._signature[1] is None or log_signature[0] == self._signature[1][0])
+            and log_signature[2] >= self._log_offset
+        ):
+            self._log_records += self._replay(self._log_offset)
+            self._signature = self._current_signature()
+            # Changes of this instance which are not appended yet go on top of the records of other processes.
+            for changes in self._pending:
+                self._apply(changes)
+        else:
+            self._reload_locked()
+
+    def _append_locked(self, changes):
+        """Appends one compact record per changed fund to the log, the caller holds the file lock and `_lock`."""
+        lines = ''.join(
+            json.dumps({'id': id, 'fund': fund_data}, separators=(',', ':')) + '\n'
+            for id, fund_data in changes.items()
+        )
+        with open(self.log_path, 'a') as handler:
+            handler.write(lines)
+
+        self._log_offset = os.path.getsize(self.log_path)
+        self._log_records += len(changes)
+        self._signature = self._current_signature()
+        # Dated like the records replayed by other instances.
+        modified = os.path.getmtime(self.log_path)
+        for id in changes:
+            self._modified[id] = modified
+
+    def _append_pending_locked(self):
+        """Appends the changes of the write behind mode, the last data of each changed fund, the caller holds the
+        file lock and `_lock`."""
+        written, batch = self._take_pending_locked()
+        changes = {}
+        for pending_changes in self._pending:
+            changes.update(pending_changes)
+
+        if changes:
+            try:
+                self._append_locked(changes)
+            except BaseException as error:
+                self._discard_locked(written, self._version, batch, error)
+                raise
+
+        self._persisted_locked(written)
+
+    def _commit_locked(self, changes):
+        """Applies and appends the changes and returns the version, the caller holds the file lock and `_lock`."""
+        # Replays the records appended by other processes such that the compaction keeps them.
+        self._catch_up_locked()
+        self._apply(changes)
+        try:
+            self._append_locked(changes)
+        except BaseException:
+            # Loads the snapshot and the records appended, hence the changes are only kept if they reached the log.
+            self._reload_locked()
+            raise
+
+        self._version += 1
+        return self._version
+
+    def _commit(self, changes):
+        """Applies the changes, appends one compact record per changed fund to the log and waits for the fsync."""
+        if self._write_behind is not None:
+            super()._commit(changes)
+            return
+
+        with self._file_lock():
+            with self._lock:
+                version = self._commit_locked(changes)
+
+        self._sync(version)
+
+    def update_fund_if_unchanged(self, id, expected, data):
+        with self._file_lock():
+            with self._lock:
+                self._catch_up_locked()
+                if self.get_fund(id) != expected:
+                    return False
+
+                # The changes buffered by the write behind mode are older, hence they go first in the log.
+                self._append_pending_locked()
+                version = self._commit_locked({id: data})
+
+        self._sync(version)
+        return True
+
+    def _sync(self, version):
+        """Makes the appended records durable, a single fsync covers every record appended before it."""
+        with self._sync_lock:
+            if self._synced_version >= version:
+                return
+
+            if self._group_commit_window:
+                time.sleep(self._group_commit_window)
+
+            with self._lock:
+                version = self._version
+
+            if self._pending:
+                with self._file_lock():
+                    with self._lock:
+                        # Replays the records appended by other processes such that ours come after them.
+                        self._catch_up_locked()
+                        self._append_pending_locked()
+
+            if self._log_records >= self._compact_threshold:
+                self.compact()
+                return
+
+            with open(self.log_path, 'ab') as handler:
+                os.fsync(handler.fileno())
+
+            self._synced_version = version
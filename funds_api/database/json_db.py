@@ -1,48 +1,519 @@
+import bisect
+import hashlib
+import heapq
+import itertools
 import json
+import os
+import tempfile
+import threading
+import time
 
-from .base import AbstractDb
+from .base import AbstractDb, fund_tag
+from .columns import ColumnarView
+from .file_lock import file_lock, lock_path
+from .indexes import HashIndex, SortedIndex
+from .snapshot import Snapshot, pack_snapshot
+from .write_behind import WriteBehind
 
 
-class JsonDb(AbstractDb):
-    """Database abstraction to connect to a JSON file."""
+def _file_signature(path):
+    """Identifies a version of a file, it changes whenever the file is replaced or written."""
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    return stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+
+
+class _Batch:
+    """Changes persisted by the same write, `error` is set if the write failed and discarded them."""
+    __slots__ = ('error',)
+
     def __init__(self):
+        self.error = None
+
+
+def _fsync_directory(path):
+    """Makes a rename inside the directory durable."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on every platform e.g. Windows.
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, content):
+    """Replaces the file content, text or bytes, such that readers and crashes only ever observe the old or the new
+    content."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as handler:
+            handler.write(content)
+            handler.flush()
+            os.fsync(handler.fileno())
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    _fsync_directory(path)
+
+
+def _project(funds, fields):
+    if fields is None:
+        return funds
+
+    return [{field: fund[field] for field in fields} for fund in funds]
+
+
+class JsonDb(AbstractDb):
+    """Database abstraction to connect to a JSON file.
+
+    Commits are group commits: a writer that waits for the file to be written while another write is in progress
+    shares the next write with every other waiting writer. Setting `group_commit_window` delays each write by that
+    many seconds to let more writers join the group.
+
+    Several processes can share the file. Writing holds an exclusive lock of `<path>.lock` and first reloads the file
+    if another process wrote it since, hence no process overwrites the changes of another. Loading holds a shared
+    lock while reads are served from memory without any lock. A thread takes the file lock before `_lock`.
+
+    With `binary` the file is a snapshot of the `snapshot` module instead of JSON. Loading it only maps the file, the
+    reads of single funds and id ranges are served from the mapping and every fund is decoded on the first read or
+    write needing the indexes, hence a worker starts serving without parsing the whole file.
+
+    With `write_behind_interval` writes return once applied in memory and a background thread persists them at most
+    that many seconds later, or as soon as `write_behind_max_dirty` funds changed. Persisting writes the last data of
+    each changed fund once, however often it changed. A crash loses the changes not persisted yet and other processes
+    only see them once persisted. `close()` persists them before the instance is dropped. While persisting fails,
+    writes are persisted before returning again and raise the error, instead of piling up in memory.
+    """
+    def __init__(self, group_commit_window=0, binary=False, write_behind_interval=None, write_behind_max_dirty=1000):
         self._data = {}
+        # Sorted fund ids such that range scans seek with a binary search instead of sorting every fund.
+        self._ids = []
+        self._hash_indexes = {field: HashIndex(field) for field in ('manager_name',)}
+        self._sorted_indexes = {field: SortedIndex(field) for field in ('date', 'nav', 'performance')}
+        self._columns = ColumnarView()
+        # Tags of the funds read since they last changed, and the times of the changes made since loading.
+        self._fund_tags = {}
+        self._modified = {}
+        self._loaded_modified = None
+        # Time of the last change of this instance, only reported until it is persisted.
+        self._last_modified = None
+        self._path = None
+        self._signature = None
+        self._group_commit_window = group_commit_window
+        self._binary = binary
+        # Mapped snapshot serving the reads until its funds are decoded into `_data`, see `_materialize()`.
+        self._snapshot = None
+        # Number of changes applied in memory and how many of those are persisted.
+        self._version = 0
+        self._synced_version = 0
+        # Changes applied in memory which are not persisted yet, they are applied again after a reload.
+        self._pending = []
+        # Ids of the funds changed by `_pending`, counted towards `write_behind_max_dirty`.
+        self._dirty = set()
+        # `id()` of the pending changes whose writer waits for them to be persisted, unlike the changes of the write
+        # behind mode they are discarded if persisting them fails.
+        self._waiting = set()
+        # Batch of the pending changes which the next write persists.
+        self._batch = _Batch()
+        self._write_behind = None
+        if write_behind_interval is not None:
+            self._write_behind = WriteBehind(self.flush, write_behind_interval, write_behind_max_dirty)
+        # Re-entrant such that a reload can happen while a caller already holds the lock.
+        self._lock = threading.RLock()
+        # Serializes writes to the disk without blocking readers of the in memory data.
+        self._sync_lock = threading.Lock()
 
     def connect(self, path):
-        with open(path) as handler:
-            data = json.load(handler)
-            # Convert the IDs back to int because JSON saves the IDs keys as string.
-            self._data = {int(key): value for key, value in data.items()}
-
         self._path = path
+        with self._file_lock(shared=True):
+            with self._lock:
+                self._reload_locked()
+
+    def flush(self):
+        """Persists the changes applied in memory so far, the writes of the write behind mode."""
+        with self._lock:
+            version = self._version
+
+        self._sync(version)
+
+    def close(self):
+        """Persists the changes applied in memory and stops the write behind thread, later writes are persisted
+        synchronously."""
+        if self._write_behind is not None:
+            self._write_behind.close()
+
+    def is_stale(self):
+        """Checks whether the JSON file was modified by someone else since it was loaded."""
+        return self._current_signature() != self._signature
+
+    def reload(self):
+        self.connect(self._path)
+
+    def refresh(self):
+        if self.is_stale():
+            with self._file_lock(shared=True):
+                with self._lock:
+                    self._catch_up_locked()
+
+    def version(self):
+        with self._lock:
+            # Every write replaces the file, hence instances which loaded the same file hold the same data.
+            tag = repr(self._signature)
+            last_modified = self._signature_time()
+            if self._version != self._synced_version:
+                # Changes which are not written yet are only seen by this instance.
+                tag += f' {os.getpid()} {id(self)} {self._version}'
+                last_modified = self._last_modified
+
+            return hashlib.blake2b(tag.encode(), digest_size=8).hexdigest(), last_modified
+
+    def fund_version(self, id):
+        with self._lock:
+            fund_data = self.get_fund(id)
+            if fund_data is None:
+                return None
+
+            tag = self._fund_tags.get(id)
+            if tag is None:
+                tag = self._fund_tags[id] = fund_tag(fund_data)
+
+            return tag, self._modified.get(id, self._loaded_modified)
 
     def get_all_ids(self):
-        return list(self._data.keys())
+        with self._lock:
+            if self._snapshot is not None:
+                return list(self._snapshot.ids)
+
+            return list(self._data.keys())
+
+    def exists(self, id):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return id in snapshot
+
+        return id in self._data
 
     def get_all(self):
-        return list(self._data.values())
+        self._materialize()
+        with self._lock:
+            return list(self._data.values())
+
+    def get_range(self, after_id=None, limit=None, fields=None):
+        with self._lock:
+            ids = self._ids if self._snapshot is None else self._snapshot.ids
+            start = 0 if after_id is None else bisect.bisect_right(ids, after_id)
+            stop = None if limit is None else start + limit
+            if self._snapshot is not None:
+                funds = self._snapshot.range(start, stop)
+            else:
+                funds = [self._data[id] for id in self._ids[start:stop]]
+
+        return _project(funds, fields)
+
+    def find(self, equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+        equals = equals or {}
+        ranges = ranges or {}
+
+        def matches(fund_data):
+            return all(fund_data[field] == value for field, value in equals.items()) and all(
+                (low is None or fund_data[field] >= low) and (high is None or fund_data[field] <= high)
+                for field, (low, high) in ranges.items()
+            )
+
+        self._materialize()
+        with self._lock:
+            # The smallest set of candidates found through an index, the other conditions are checked per fund.
+            size, candidates = len(self._data), None
+            for field, value in equals.items():
+                if field in self._hash_indexes:
+                    ids = self._hash_indexes[field].lookup(value)
+                    if len(ids) < size:
+                        size, candidates = len(ids), ids
+
+            for field, (low, high) in ranges.items():
+                if field in self._sorted_indexes:
+                    start, stop = self._sorted_indexes[field].bounds(low, high)
+                    if stop - start < size:
+                        size, candidates = stop - start, self._sorted_indexes[field].ids(start, stop)
+
+            if sort is not None:
+                index = self._sorted_indexes[sort]
+                start, stop = index.bounds(*ranges.get(sort, (None, None)))
+                if candidates is None or stop - start <= size:
+                    # Walks the sort index and stops after `limit` matches, e.g. the top N needs no scan.
+                    funds = (self._data[id] for id in index.ids(start, stop, descending))
+                    funds = list(itertools.islice(filter(matches, funds), limit))
+                else:
+                    funds = filter(matches, (self._data[id] for id in candidates))
+                    key = lambda fund_data: (fund_data[sort], fund_data['id'])
+                    if limit is None:
+                        funds = sorted(funds, key=key, reverse=descending)
+                    else:
+                        funds = (heapq.nlargest if descending else heapq.nsmallest)(limit, funds, key=key)
+            else:
+                if candidates is None:
+                    start = 0 if after_id is None else bisect.bisect_right(self._ids, after_id)
+                    ids = (self._ids[index] for index in range(start, len(self._ids)))
+                else:
+                    ids = sorted(id for id in candidates if after_id is None or id > after_id)
+
+                funds = list(itertools.islice(filter(matches, (self._data[id] for id in ids)), limit))
+
+        return _project(funds, fields)
+
+    def stats(self, group_by=None):
+        self._materialize()
+        with self._lock:
+            return self._columns.stats(group_by)
 
     def add_fund(self, fund_data):
-        self._data[fund_data['id']] = fund_data
-        self._commit()
+        self._commit({fund_data['id']: fund_data})
+
+    def add_funds(self, funds):
+        self._commit({fund_data['id']: fund_data for fund_data in funds})
 
     def update_fund(self, id, data):
-        self._data[id] = data
-        self._commit()
+        self._commit({id: data})
+
+    def update_funds(self, data_by_id):
+        self._commit(dict(data_by_id))
+
+    def update_fund_if_unchanged(self, id, expected, data):
+        """Written before returning, also in the write behind mode, such that other processes compare with it."""
+        with self._sync_lock:
+            with self._file_lock():
+                with self._lock:
+                    # The comparison holds the file lock, hence it sees the writes of every other process.
+                    self._catch_up_locked()
+                    if self.get_fund(id) != expected:
+                        return False
+
+                    self._stage({id: data}, waiting=True)
+
+                self._write_locked()
+
+        return True
 
     def get_fund(self, id):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot.get(id)
+
         return self._data.get(id)
 
     def delete_fund(self, id):
-        if id not in self._data:
+        if not self.exists(id):
             print(f'Cannot find {id}, no entry deleted.')
             return
 
-        del self._data[id]
-        self._commit()
+        self._commit({id: None})
+
+    def delete_funds(self, ids):
+        with self._lock:
+            changes = {id: None for id in ids if self.exists(id)}
+
+        if changes:
+            self._commit(changes)
+
+    def _file_lock(self, shared=False):
+        return file_lock(lock_path(self._path), shared=shared)
+
+    def _reload_locked(self):
+        """Loads the file on behalf of a caller holding the file lock and `_lock`."""
+        # Taken while the file lock keeps writers out, hence it matches the content read.
+        self._signature = self._current_signature()
+        self._load()
+        self._fund_tags.clear()
+        self._modified.clear()
+        self._loaded_modified = self._signature_time()
+        # Changes of this instance which are not written yet go on top of the changes of other processes.
+        for changes in self._pending:
+            self._apply(changes)
+
+    def _catch_up_locked(self):
+        """Loads the changes other processes wrote since the file was loaded, the caller holds the file lock and
+        `_lock`."""
+        if self.is_stale():
+            self._reload_locked()
+
+    def _current_signature(self):
+        return _file_signature(self._path)
+
+    def _signature_time(self):
+        """Modification time of the file as loaded or written, the same for every instance holding it."""
+        return self._signature[1] / 1e9
+
+    def _indexes(self):
+        return itertools.chain(self._hash_indexes.values(), self._sorted_indexes.values(), [self._columns])
+
+    def _load(self):
+        if self._binary:
+            # Replaced rather than closed, a reader may still hold the previous mapping.
+            self._snapshot = Snapshot(self._path)
+            return
+
+        with open(self._path) as handler:
+            data = json.load(handler)
+            # Convert the IDs back to int because JSON saves the IDs keys as string.
+            self._set_data({int(key): value for key, value in data.items()})
+
+    def _set_data(self, data):
+        self._data = data
+        self._ids = sorted(self._data)
+        for index in self._indexes():
+            index.rebuild(self._data)
+
+    def _materialize(self):
+        """Decodes every fund of the mapped snapshot into `_data` and builds the indexes, once per load."""
+        with self._lock:
+            if self._snapshot is not None:
+                self._set_data(dict(self._snapshot.items()))
+                # Last, such that the lock free readers switch to `_data` once it is complete.
+                self._snapshot = None
+
+    def _dumps(self):
+        """Serializes the data into the content of the database file, the caller holds `_lock`."""
+        if self._binary:
+            self._materialize()
+            return pack_snapshot(self._data.items())
+
+        return json.dumps(self._data, indent=4)
+
+    def _apply(self, changes, modified=None):
+        """Applies changes mapping fund ids to their new data, where `None` deletes the fund.
+
+        `modified` is the time of changes read from a file, changes of this instance are made now.
+        """
+        self._materialize()
+        if modified is None:
+            modified = self._last_modified = time.time()
+        for id, fund_data in changes.items():
+            self._fund_tags.pop(id, None)
+            self._modified[id] = modified
+            previous = self._data.get(id)
+            if previous is not None:
+                for index in self._indexes():
+                    index.remove(id, previous)
+
+            if fund_data is None:
+                if previous is not None:
+                    del self._data[id]
+                    del self._ids[bisect.bisect_left(self._ids, id)]
+                continue
+
+            if previous is None:
+                bisect.insort(self._ids, id)
+
+            self._data[id] = fund_data
+            for index in self._indexes():
+                index.add(id, fund_data)
+
+    def _stage(self, changes, waiting):
+        """Applies the changes as not persisted yet and returns the version, the caller holds `_lock`."""
+        self._apply(changes)
+        self._pending.append(changes)
+        self._dirty.update(changes)
+        if waiting:
+            self._waiting.add(id(changes))
+        self._version += 1
+        return self._version
+
+    def _take_pending_locked(self):
+        """Returns the number of pending changes the next write persists and their batch, the caller holds `_lock`."""
+        batch = self._batch
+        self._batch = _Batch()
+        return len(self._pending), batch
+
+    def _persisted_locked(self, written):
+        """Drops the first `written` pending changes once persisted, the caller holds `_lock`."""
+        self._waiting.difference_update(id(changes) for changes in self._pending[:written])
+        del self._pending[:written]
+        self._dirty = set().union(*self._pending)
+
+    def _discard_locked(self, written, version, batch, error):
+        """Discards the first `written` pending changes whose writer waits after persisting them failed, the caller
+        holds the file lock and `_lock`.
+
+        The data is loaded again and the remaining pending changes, which include the acknowledged changes of the
+        write behind mode kept for the next write, are applied on top of it.
+        """
+        batch.error = error
+        failed = self._pending[:written]
+        kept = [changes for changes in failed if id(changes) not in self._waiting]
+        self._waiting.difference_update(id(changes) for changes in failed)
+        self._pending[:written] = kept
+        self._dirty = set().union(*self._pending)
+        if len(kept) < len(failed):
+            self._reload_locked()
+        if not kept:
+            # The changes up to `version` are either persisted or discarded.
+            self._synced_version = version
+
+    def _commit(self, changes):
+        """Applies the changes and returns once they are written into the JSON file, or right away in the write
+        behind mode.
+
+        If the write fails, the changes are discarded and the error is raised to every writer whose changes it held.
+        """
+        with self._lock:
+            # Notified under the lock, such that a write behind closed meanwhile leaves the writer waiting.
+            buffered = self._write_behind is not None and self._write_behind.notify(len(self._dirty.union(changes)))
+            version = self._stage(changes, waiting=not buffered)
+            batch = self._batch
+
+        if buffered:
+            return
+
+        self._sync(version)
+        if batch.error is not None:
+            raise batch.error
+
+    def _sync(self, version):
+        """Persists the data if the changes up to `version` are not persisted by a concurrent writer yet."""
+        with self._sync_lock:
+            if self._synced_version >= version:
+                return
+
+            if self._group_commit_window:
+                time.sleep(self._group_commit_window)
+
+            with self._file_lock():
+                self._write_locked()
+
+    def _write_locked(self):
+        """Writes the data into the file on behalf of a caller holding `_sync_lock` and the file lock."""
+        with self._lock:
+            self._catch_up_locked()
+            version = self._version
+            written, batch = self._take_pending_locked()
+
+        try:
+            with self._lock:
+                content = self._dumps()
+
+            atomic_write(self._path, content)
+        except BaseException as error:
+            with self._lock:
+                self._discard_locked(written, version, batch, error)
+            raise
 
-    def _commit(self):
-        """Writes data into the JSON file."""
-        with open(self._path, 'w') as handler:
-            json.dump(self._data, handler, indent=4)
-            
\ No newline at end of file
+        with self._lock:
+            self._synced_version = version
+            self._persisted_locked(written)
+            # Remember our own write such that it is not mistaken for an external change.
+            self._signature = self._current_signature()
+            # Dated like the funds of instances loading the file, but for the changes made meanwhile.
+            self._loaded_modified = self._signature_time()
+            self._modified = {id: self._modified[id] for id in self._dirty if id in self._modified}
@@ -0,0 +1,97 @@
+"""Incremental reader of the JSON database file, such that memory does not grow with the size of the file."""
+import json
+import re
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+# Characters which can continue a number, including the empty string at the end of the buffer.
+_NUMBER_TAIL = ('', *'0123456789.eE+-')
+
+
+class _Reader:
+    """Reads the file `chunk_size` characters at a time and keeps only the part which is not decoded yet."""
+    def __init__(self, handler, chunk_size):
+        self._handler = handler
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+
+    def _read(self):
+        chunk = self._handler.read(self._chunk_size)
+        if not chunk:
+            return False
+
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._read():
+                return
+
+    def peek(self):
+        """Returns the next character without consuming it, an empty string at the end of the file."""
+        self._skip_whitespace()
+        return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, *chars):
+        """Consumes the next character, which must be one of `chars`, and returns it.
+
+        The empty string stands for the end of the file.
+        """
+        char = self.peek()
+        if char not in chars:
+            raise json.JSONDecodeError(f'Expecting one of {chars}', self._buffer, self._pos)
+
+        self._pos += 1
+        return char
+
+    def decode(self):
+        """Decodes the next JSON value."""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+
+            # Only numbers are not delimited, a number cut by the end of the buffer e.g. `1.5e` decodes as `1.5`.
+            if isinstance(value, (int, float)) and self._buffer[end:end + 1] in _NUMBER_TAIL and self._read():
+                continue
+
+            self._pos = end
+            return value
+
+
+def iter_json_object(path, chunk_size=2 ** 16):
+    """Yields the key, value pairs of the JSON object in the file while it is read.
+
+    Unlike `json.load()` the file content is never held in memory at once, hence a caller which consumes the pairs
+    one by one e.g. the migration, starts working before the file is read and uses memory bounded by `chunk_size`.
+    """
+    with open(path) as handler:
+        reader = _Reader(handler, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            reader.expect('}')
+        else:
+            while True:
+                key = reader.decode()
+                reader.expect(':')
+                yield key, reader.decode()
+                if reader.expect(',', '}') == '}':
+                    break
+
+        reader.expect('')
+
+
+def iter_funds(path, chunk_size=2 ** 16):
+    """Yields the id and data of every fund in the JSON database file."""
+    for key, fund_data in iter_json_object(path, chunk_size):
+        # Convert the IDs back to int because JSON saves the IDs keys as string.
+        yield int(key), fund_data
@@ -1,5 +1,8 @@
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 
+from funds_api.metrics import timed
 from . import exceptions
 
 
@@ -16,31 +19,95 @@ fund_schema = {
     },
     "required": ["id", "name", "manager_name", "description", "nav", "date", "performance"]
 }
+FUND_FIELDS = tuple(fund_schema['properties'])
+
+# Checked and built once instead of on every `jsonschema.validate()` call.
+_validator_cls = validator_for(fund_schema)
+_validator_cls.check_schema(fund_schema)
+fund_validator = _validator_cls(fund_schema)
+
+_FIELD_TYPES = {
+    'id': int,
+    'name': str,
+    'manager_name': str,
+    'description': str,
+    'nav': (int, float),
+    'date': str,
+    'performance': (int, float),
+}
+# Integers every storage holds exactly, the binary snapshot stores them in 8 bytes.
+_INT64 = range(-2 ** 63, 2 ** 63)
+
+
+def _is_valid_fast(fund_data):
+    """Hand-rolled check of the fund schema.
+
+    It may reject funds the schema accepts e.g. an id of `1.0`, but never accepts a fund the schema rejects.
+    """
+    if type(fund_data) is not dict:
+        return False
+
+    for field, field_type in _FIELD_TYPES.items():
+        value = fund_data.get(field)
+        # JSON schema numbers are not booleans even though `bool` is a subclass of `int`.
+        if not isinstance(value, field_type) or isinstance(value, bool):
+            return False
+
+    return True
+
+
+def _check_storable(fund_data):
+    """Raises `ValidationError` for a value the schema accepts but the storages cannot hold."""
+    for field in FUND_FIELDS:
+        value = fund_data[field]
+        if type(value) is int and value not in _INT64:
+            raise ValidationError(f'{value} is beyond the 8 byte integer range', path=[field])
+        # JSON escapes can hold lone surrogates, which have no UTF-8 encoding.
+        if type(value) is str and not value.isascii():
+            try:
+                value.encode()
+            except UnicodeEncodeError:
+                raise ValidationError(f'{value!r} is not valid UTF-8', path=[field]) from None
+
+
+@timed('validate')
+def validate_fund(fund_data):
+    """Raises `ValidationError` if the fund does not follow the schema or holds a value the storages cannot hold.
+
+    The values are checked before the fund reaches a database, such that a write is rejected rather than failing
+    once staged.
+    """
+    if not _is_valid_fast(fund_data):
+        # Produces the same error as `jsonschema.validate()`.
+        error = best_match(fund_validator.iter_errors(fund_data))
+        if error is not None:
+            raise error
+
+    _check_storable(fund_data)
 
 
 class Fund:
+    """Validated fund, the fields are read only."""
+    __slots__ = tuple(f'_{field}' for field in FUND_FIELDS)
+
     def __init__(self, fund_data: dict):
         try:
-            validate(fund_data, fund_schema)
+            validate_fund(fund_data)
         except ValidationError as error:
             raise exceptions.InvalidFundDataInput('Invalid fund input') from error
         else:
-            self._id = fund_data['id']
-            self._name = fund_data['name']
-            self._manager_name = fund_data['manager_name']
-            self._description = fund_data['description']
-            self._nav = fund_data['nav']
-            self._date = fund_data['date']
-            self._performance = fund_data['performance']
+            for field in FUND_FIELDS:
+                setattr(self, f'_{field}', fund_data[field])
+
+    id = property(lambda self: self._id)
+    name = property(lambda self: self._name)
+    manager_name = property(lambda self: self._manager_name)
+    description = property(lambda self: self._description)
+    nav = property(lambda self: self._nav)
+    date = property(lambda self: self._date)
+    performance = property(lambda self: self._performance)
 
     @property
     def details(self) -> dict:
-        return {
-            'id': self._id,
-            'name': self._name,
-            'manager_name': self._manager_name,
-            'description': self._description,
-            'nav': self._nav,
-            'date': self._date,
-            'performance': self._performance
-        }
\ No newline at end of file
+        """A new dict of the fields, owned by the caller e.g. to store it."""
+        return {field: getattr(self, f'_{field}') for field in FUND_FIELDS}
@@ -0,0 +1,270 @@
+import contextlib
+
+from mysql.connector import pooling
+
+from .base import AbstractDb
+from .columns import NAV_PERCENTILES
+
+
+COLUMNS = ('id', 'name', 'manager_name', 'description', 'nav', 'date', 'performance')
+_SELECT_COLUMNS = ', '.join(COLUMNS)
+_INSERT_SQL = f'INSERT INTO funds ({_SELECT_COLUMNS}) VALUES ({", ".join(["%s"] * len(COLUMNS))})'
+_UPDATE_SQL = f'UPDATE funds SET {", ".join(f"{column} = %s" for column in COLUMNS[1:])} WHERE id = %s'
+# Updates the row only if every column still holds the expected value, `<=>` being the NULL safe equality.
+_UPDATE_IF_UNCHANGED_SQL = _UPDATE_SQL + ''.join(f' AND {column} <=> %s' for column in COLUMNS[1:])
+# SQL expressions of the group of a fund for each supported `group_by`.
+_GROUP_KEYS = {
+    None: "''",
+    'manager_name': 'manager_name',
+    'year': "DATE_FORMAT(date, '%Y')",
+    'month': "DATE_FORMAT(date, '%Y-%m')",
+}
+# The nav grows with its rank, hence the smallest nav ranked past the percentile is the nearest rank percentile.
+_NAV_PERCENTILE_COLUMNS = ''.join(
+    f',\n    MIN(CASE WHEN 100 * nav_rank >= {percentile} * total THEN nav END)' for percentile in NAV_PERCENTILES
+)
+# Ranks the funds of each group by performance and nav such that the median and percentiles are picked by rank
+# within the `GROUP BY`, MySQL has no percentile aggregate.
+_STATS_SQL = '''
+SELECT
+    group_key,
+    COUNT(*),
+    AVG(performance),
+    (MIN(CASE WHEN 2 * performance_rank >= total THEN performance END)
+        + MIN(CASE WHEN 2 * performance_rank > total THEN performance END)) / 2{nav_percentiles}
+FROM (
+    SELECT
+        {key} AS group_key,
+        nav,
+        performance,
+        ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY performance) AS performance_rank,
+        ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY nav) AS nav_rank,
+        COUNT(*) OVER (PARTITION BY {key}) AS total
+    FROM funds
+) AS ranked
+GROUP BY group_key
+ORDER BY group_key
+'''
+_VERSION_SQL = 'SELECT version, modified_at FROM funds_version WHERE id = 1'
+_SELECT_IDS_SQL = 'SELECT id FROM funds'
+_EXISTS_SQL = 'SELECT 1 FROM funds WHERE id = %s'
+_SELECT_ALL_SQL = f'SELECT {_SELECT_COLUMNS} FROM funds ORDER BY id'
+_SELECT_FUND_SQL = f'SELECT {_SELECT_COLUMNS} FROM funds WHERE id = %s'
+_DELETE_SQL = 'DELETE FROM funds WHERE id = %s'
+_STATS_COLUMNS = ('count', 'performance_mean', 'performance_median') + tuple(
+    f'nav_p{percentile}' for percentile in NAV_PERCENTILES
+)
+
+
+def _column(name):
+    if name not in COLUMNS:
+        raise ValueError(f'Unknown column {name}')
+
+    return name
+
+
+def _to_fund(row, columns=COLUMNS):
+    fund = dict(zip(columns, row))
+    # MySQL returns `DATE` columns as `datetime.date`.
+    if hasattr(fund.get('date'), 'isoformat'):
+        fund['date'] = fund['date'].isoformat()
+
+    return fund
+
+
+# The statements are built by the functions below such that `MySqlDb` and `AsyncMySqlDb` run the same SQL, each
+# returns the SQL text, its parameters and the columns of the returned rows.
+def _range_query(after_id=None, limit=None, fields=None):
+    # Only known column names reach the SQL text, the values are bound as parameters.
+    columns = COLUMNS if fields is None else [column for column in COLUMNS if column in fields]
+    sql = f'SELECT {", ".join(columns)} FROM funds'
+    params = ()
+    if after_id is not None:
+        sql += ' WHERE id > %s'
+        params += (after_id,)
+
+    # The primary key index serves both the seek and the order.
+    sql += ' ORDER BY id'
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params += (limit,)
+
+    return sql, params, columns
+
+
+def _find_query(equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+    # Only known column names reach the SQL text, the values are bound as parameters.
+    columns = COLUMNS if fields is None else [column for column in COLUMNS if column in fields]
+    conditions = []
+    params = ()
+    for column, value in (equals or {}).items():
+        conditions.append(f'{_column(column)} = %s')
+        params += (value,)
+
+    for column, (low, high) in (ranges or {}).items():
+        if low is not None:
+            conditions.append(f'{_column(column)} >= %s')
+            params += (low,)
+        if high is not None:
+            conditions.append(f'{_column(column)} <= %s')
+            params += (high,)
+
+    if sort is None and after_id is not None:
+        conditions.append('id > %s')
+        params += (after_id,)
+
+    sql = f'SELECT {", ".join(columns)} FROM funds'
+    if conditions:
+        sql += f' WHERE {" AND ".join(conditions)}'
+
+    # The indexes created by `create-schema` serve the conditions and the order.
+    if sort is None:
+        sql += ' ORDER BY id'
+    else:
+        direction = ' DESC' if descending else ''
+        sql += f' ORDER BY {_column(sort)}{direction}, id{direction}'
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params += (limit,)
+
+    return sql, params, columns
+
+
+def _stats_query(group_by=None):
+    return _STATS_SQL.format(key=_GROUP_KEYS[group_by], nav_percentiles=_NAV_PERCENTILE_COLUMNS), (), None
+
+
+def _to_stats(rows, group_by=None):
+    """Statistics of every group given the rows returned by the `_stats_query()` statement."""
+    stats = []
+    for row in rows:
+        group_stats = dict(zip(_STATS_COLUMNS, row[1:]))
+        stats.append(group_stats if group_by is None else {group_by: row[0], **group_stats})
+
+    return stats
+
+
+def _insert_params(funds):
+    return [tuple(fund_data[column] for column in COLUMNS) for fund_data in funds]
+
+
+def _update_params(data_by_id):
+    return [tuple(data[column] for column in COLUMNS[1:]) + (id,) for id, data in data_by_id.items()]
+
+
+def _update_if_unchanged_params(id, expected, data):
+    return _update_params({id: data})[0] + tuple(expected[column] for column in COLUMNS[1:])
+
+
+class MySqlDb(AbstractDb):
+    """Database abstraction to connect to the `funds` table in MySQL.
+
+    Every method borrows a connection from the pool and runs a prepared statement, hence one instance can be
+    shared by all the threads of a worker.
+    """
+    def __init__(self, pool):
+        self._pool = pool
+
+    @classmethod
+    def from_config(cls, pool_size=5, **config):
+        """Creates the instance with a pool of `pool_size` connections, `config` is passed to each connection."""
+        return cls(pooling.MySQLConnectionPool(pool_name='funds_api', pool_size=pool_size, **config))
+
+    @contextlib.contextmanager
+    def _cursor(self):
+        """Yields a prepared statement cursor and commits once the block succeeds."""
+        conn = self._pool.get_connection()
+        try:
+            cursor = conn.cursor(prepared=True)
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        finally:
+            # Returns the connection to the pool.
+            conn.close()
+
+    def version(self):
+        # Maintained by the triggers created by `create-schema`.
+        with self._cursor() as cursor:
+            cursor.execute(_VERSION_SQL)
+            version, modified_at = cursor.fetchone()
+
+        return str(version), modified_at
+
+    def get_all_ids(self):
+        with self._cursor() as cursor:
+            cursor.execute(_SELECT_IDS_SQL)
+            return [row[0] for row in cursor.fetchall()]
+
+    def exists(self, id):
+        with self._cursor() as cursor:
+            cursor.execute(_EXISTS_SQL, (id,))
+            return cursor.fetchone() is not None
+
+    def get_all(self):
+        with self._cursor() as cursor:
+            cursor.execute(_SELECT_ALL_SQL)
+            return [_to_fund(row) for row in cursor.fetchall()]
+
+    def _select(self, query):
+        sql, params, columns = query
+        with self._cursor() as cursor:
+            cursor.execute(sql, params)
+            return [_to_fund(row, columns) for row in cursor.fetchall()]
+
+    def get_range(self, after_id=None, limit=None, fields=None):
+        return self._select(_range_query(after_id, limit, fields))
+
+    def find(self, equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+        return self._select(_find_query(equals, ranges, sort, descending, after_id, limit, fields))
+
+    def stats(self, group_by=None):
+        sql, params, _ = _stats_query(group_by)
+        with self._cursor() as cursor:
+            cursor.execute(sql, params)
+            return _to_stats(cursor.fetchall(), group_by)
+
+    def add_fund(self, fund_data):
+        self.add_funds([fund_data])
+
+    def add_funds(self, funds):
+        with self._cursor() as cursor:
+            cursor.executemany(_INSERT_SQL, _insert_params(funds))
+
+    def update_fund(self, id, data):
+        self.update_funds({id: data})
+
+    def update_fund_if_unchanged(self, id, expected, data):
+        if data == expected:
+            # MySQL counts the changed rows only, the row is then left as is and compared.
+            return self.get_fund(id) == expected
+
+        with self._cursor() as cursor:
+            cursor.execute(_UPDATE_IF_UNCHANGED_SQL, _update_if_unchanged_params(id, expected, data))
+            return cursor.rowcount == 1
+
+    def update_funds(self, data_by_id):
+        with self._cursor() as cursor:
+            cursor.executemany(_UPDATE_SQL, _update_params(data_by_id))
+
+    def get_fund(self, id):
+        with self._cursor() as cursor:
+            cursor.execute(_SELECT_FUND_SQL, (id,))
+            row = cursor.fetchone()
+
+        return _to_fund(row) if row else None
+
+    def delete_fund(self, id):
+        with self._cursor() as cursor:
+            cursor.execute(_DELETE_SQL, (id,))
+            if not cursor.rowcount:
+                print(f'Cannot find {id}, no entry deleted.')
+
+    def delete_funds(self, ids):
+        with self._cursor() as cursor:
+            cursor.executemany(_DELETE_SQL, [(id,) for id in ids])
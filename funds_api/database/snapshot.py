@@ -0,0 +1,158 @@
+"""Binary snapshot of the funds which is memory mapped, such that a fund is read without decoding the others.
+
+A snapshot is laid out as:
+
+- a header, the magic bytes and the number of funds,
+- the ids of the funds in ascending order, 8 byte integers,
+- a fixed width record per fund in the order of the ids, the offset and length of the name, manager name, description
+  and date in the string heap followed by the nav and the performance, each a double or an 8 byte integer, and a
+  byte whose bits 0 and 1 are set when the nav, respectively the performance, is an integer,
+- the string heap, the UTF-8 encoded strings of the funds where equal strings, e.g. manager names, are stored once.
+
+Every number is little endian. Looking a fund up is a binary search of the ids and a decode of a single record.
+"""
+import bisect
+import mmap
+import struct
+import sys
+
+
+MAGIC = b'FUNDSNP1'
+HEADER = struct.Struct('<8sQ')
+# Record layouts by the integer bits of the last byte, which every layout holds at the same offset.
+_RECORDS = [struct.Struct(f'<8I{nav}{performance}B') for performance in 'dq' for nav in 'dq']
+RECORD = _RECORDS[0]
+_INT64 = range(-2 ** 63, 2 ** 63)
+_STRING_FIELDS = ('name', 'manager_name', 'description', 'date')
+FIELDS = {'id', *_STRING_FIELDS, 'nav', 'performance'}
+
+
+def pack_snapshot(funds):
+    """Encodes the `(id, fund_data)` pairs into a snapshot.
+
+    Raises a `ValueError` for a fund whose fields do not match `FIELDS`, or whose nav or performance is an integer
+    beyond 8 bytes. Integers are read back as integers and floats as floats.
+    """
+    funds = sorted(funds, key=lambda item: item[0])
+    records = bytearray()
+    heap = bytearray()
+    # Offset and length of every string in the heap.
+    spans = {}
+    for id, fund_data in funds:
+        if fund_data.keys() != FIELDS or not all(isinstance(fund_data[field], str) for field in _STRING_FIELDS):
+            raise ValueError(f'Fund {id} does not match the fields of a snapshot')
+
+        values = []
+        for field in _STRING_FIELDS:
+            span = spans.get(fund_data[field])
+            if span is None:
+                encoded = fund_data[field].encode()
+                span = spans[fund_data[field]] = (len(heap), len(encoded))
+                heap += encoded
+            values += span
+
+        kind = 0
+        for bit, field in enumerate(['nav', 'performance']):
+            if isinstance(fund_data[field], int):
+                if fund_data[field] not in _INT64:
+                    raise ValueError(f'Fund {id} has a {field} beyond 8 bytes')
+                kind |= 1 << bit
+
+        records += _RECORDS[kind].pack(*values, fund_data['nav'], fund_data['performance'], kind)
+
+    ids = struct.pack(f'<{len(funds)}q', *(id for id, _ in funds))
+    return b''.join([HEADER.pack(MAGIC, len(funds)), ids, records, heap])
+
+
+def is_snapshot(path):
+    """Checks whether the file at `path` is a snapshot rather than a JSON file."""
+    with open(path, 'rb') as handler:
+        return handler.read(len(MAGIC)) == MAGIC
+
+
+class Snapshot:
+    """Read only view of a snapshot file mapped into memory.
+
+    Only the pages which are read are loaded from the disk. The file is replaced rather than written in place, hence
+    a mapping keeps serving the content it was created with. It is unmapped once no reference to it is left.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as handler:
+            try:
+                self._map = mmap.mmap(handler.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file cannot be mapped.
+                raise ValueError(f'{path} is not a fund snapshot') from None
+
+        if len(self._map) < HEADER.size or self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a fund snapshot')
+
+        _, self._count = HEADER.unpack_from(self._map)
+        self._records = HEADER.size + 8 * self._count
+        self._heap = self._records + RECORD.size * self._count
+        view = memoryview(self._map)
+        if sys.byteorder == 'little':
+            # Sorted ids binary searched in place.
+            self.ids = view[HEADER.size:self._records].cast('q')
+        else:
+            self.ids = list(struct.unpack_from(f'<{self._count}q', self._map, HEADER.size))
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, id):
+        return self._position(id) is not None
+
+    def _position(self, id):
+        i = bisect.bisect_left(self.ids, id)
+        if i < self._count and self.ids[i] == id:
+            return i
+
+        return None
+
+    def _fund(self, i, string):
+        offset = self._records + i * RECORD.size
+        name, name_size, manager_name, manager_name_size, description, description_size, date, date_size, nav, \
+            performance, _ = _RECORDS[self._map[offset + RECORD.size - 1]].unpack_from(self._map, offset)
+        return {
+            'id': self.ids[i],
+            'name': string(name, name_size),
+            'manager_name': string(manager_name, manager_name_size),
+            'description': string(description, description_size),
+            'nav': nav,
+            'date': string(date, date_size),
+            'performance': performance,
+        }
+
+    def _string(self, offset, size):
+        start = self._heap + offset
+        return str(self._map[start:start + size], 'utf-8')
+
+    def get(self, id):
+        """Decodes the fund of the id, `None` if there is no such fund."""
+        i = self._position(id)
+        if i is None:
+            return None
+
+        return self._fund(i, self._string)
+
+    def range(self, start=0, stop=None):
+        """Decodes the funds from the `start`th to before the `stop`th in id order."""
+        start, stop, _ = slice(start, stop).indices(self._count)
+        return [self._fund(i, self._string) for i in range(start, stop)]
+
+    def items(self):
+        """Yields the id and data of every fund in id order."""
+        # Repeated strings are decoded once and shared by the funds.
+        strings = {}
+        heap = self._map[self._heap:]
+
+        def string(offset, size):
+            value = strings.get(offset)
+            if value is None:
+                value = strings[offset] = str(heap[offset:offset + size], 'utf-8')
+            return value
+
+        for i in range(self._count):
+            fund_data = self._fund(i, string)
+            yield fund_data['id'], fund_data
@@ -0,0 +1,72 @@
+"""Background flushing of the changes a database applied in memory only."""
+import threading
+import traceback
+
+
+class WriteBehind:
+    """Thread calling `flush` at most `interval` seconds after a change, or as soon as `max_dirty` funds changed.
+
+    The database reports its number of changed funds not flushed yet through `notify()` after every change. The thread
+    starts with the first change and waits while nothing changed. A failed flush is retried after `interval` seconds,
+    the changes stay in memory until then. Meanwhile `notify()` refuses further changes, their callers persist them by
+    themselves and get the error if that fails too, until a flush succeeds again.
+    """
+    def __init__(self, flush, interval=1.0, max_dirty=1000):
+        self._flush = flush
+        self._interval = interval
+        self._max_dirty = max_dirty
+        self._dirty = 0
+        self._closed = False
+        # Error of the last flush, `None` once a flush succeeded.
+        self.error = None
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def notify(self, dirty):
+        """Reports `dirty` changed funds, returns `False` once closed or while flushing fails, where the caller has to
+        flush by itself."""
+        with self._condition:
+            if self._closed or self.error is not None:
+                return False
+
+            self._dirty = dirty
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='funds-write-behind', daemon=True)
+                self._thread.start()
+            elif dirty >= self._max_dirty:
+                self._condition.notify()
+
+            return True
+
+    def close(self):
+        """Flushes the changes and stops the thread, later changes are flushed by their caller."""
+        with self._condition:
+            self._closed = True
+            thread = self._thread
+            self._condition.notify()
+
+        if thread is not None:
+            thread.join()
+        self._flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._dirty or self._closed)
+                self._condition.wait_for(lambda: self._dirty >= self._max_dirty or self._closed, self._interval)
+                if self._closed:
+                    # `close()` flushes once the thread is done.
+                    return
+
+                self._dirty = 0
+
+            try:
+                self._flush()
+            except Exception as error:
+                traceback.print_exc()
+                with self._condition:
+                    self.error = error
+                    self._dirty = max(self._dirty, 1)
+            else:
+                with self._condition:
+                    self.error = None
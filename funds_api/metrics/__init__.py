@@ -0,0 +1,41 @@
+"""Instrumentation module."""
+import threading
+
+from flask import current_app
+
+from .histogram import Histogram, HistogramFamily
+from .profiler import SamplingProfiler, write_profile
+from .registry import CONTENT_TYPE, Metrics
+from .timing import TimedJSONProvider, instrument_db, start_timings, stop_timings, timed
+
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Returns the metrics of the app, or `None` when the instrumentation is disabled."""
+    extensions = current_app.extensions
+    # Read on every request, hence the lock is only taken until they are created.
+    if 'funds_metrics' in extensions:
+        return extensions['funds_metrics']
+
+    with _metrics_lock:
+        if 'funds_metrics' not in current_app.extensions:
+            current_app.extensions['funds_metrics'] = Metrics() if current_app.config['METRICS'] else None
+
+        return current_app.extensions['funds_metrics']
+
+
+def get_profiler():
+    """Returns the profiler of the app, or `None` unless `PROFILER_THRESHOLD` is set."""
+    extensions = current_app.extensions
+    if 'funds_profiler' in extensions:
+        return extensions['funds_profiler']
+
+    with _metrics_lock:
+        if 'funds_profiler' not in current_app.extensions:
+            profiler = None
+            if current_app.config['PROFILER_THRESHOLD'] is not None:
+                profiler = SamplingProfiler(current_app.config['PROFILER_INTERVAL'])
+            current_app.extensions['funds_profiler'] = profiler
+
+        return current_app.extensions['funds_profiler']
@@ -0,0 +1,85 @@
+import bisect
+import threading
+
+
+# Upper bounds in seconds, from the microseconds of a lookup in memory to the seconds of a rewrite of a large file.
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Counts of the observed values per bucket, an observation is a binary search and two additions."""
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        # One count per bucket plus the count of the values above the last bound, not cumulative.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self):
+        """Returns the cumulative count of every bucket including `+Inf`, and the sum."""
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per combination of label values."""
+    def __init__(self, name, help, label_names, bounds=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._bounds = bounds
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Returns the histogram of the label values, created on first use."""
+        histogram = self._histograms.get(values)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(values, Histogram(self._bounds))
+
+        return histogram
+
+    def render(self):
+        """Lines of the family in the Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        # Copied under the lock since `labels()` may add a histogram meanwhile.
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+
+        for values, histogram in histograms:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, values))
+            cumulative, total = histogram.snapshot()
+            for bound, count in zip((*self._bounds, float('inf')), cumulative):
+                separator = ',' if labels else ''
+                lines.append(f'{self.name}_bucket{{{labels}{separator}le="{_format_value(bound)}"}} {count}')
+
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {_format_value(total)}')
+            lines.append(f'{self.name}_count{suffix} {cumulative[-1]}')
+
+        return lines
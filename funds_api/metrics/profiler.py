@@ -0,0 +1,68 @@
+"""Statistical profiler of the threads serving requests."""
+import collections
+import os
+import sys
+import threading
+import time
+
+
+def _stack(frame):
+    """The functions of the frame and its callers, outermost first, in the collapsed stack format."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+
+    return ';'.join(reversed(names))
+
+
+def write_profile(path, profile):
+    """Writes the stack counts of the profile in the collapsed stack format, one `<stack> <count>` line per stack,
+    read by flamegraph.pl and speedscope."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as handler:
+        for stack, count in profile.most_common():
+            handler.write(f'{stack} {count}\n')
+
+
+class SamplingProfiler:
+    """Samples the stack of the threads being profiled every `interval` seconds.
+
+    The sampling thread reads the stacks of the other threads instead of tracing every call, hence a profiled request
+    is not slowed down beyond the sampling thread taking the GIL once an interval. The thread only runs while at least
+    one thread is profiled.
+    """
+    def __init__(self, interval=0.005):
+        self._interval = interval
+        # Thread id to the number of samples of each stack of the thread.
+        self._profiles = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts profiling the calling thread."""
+        with self._lock:
+            self._profiles[threading.get_ident()] = collections.Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='funds-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stops profiling the calling thread and returns its profile, `None` if it was not profiled."""
+        with self._lock:
+            return self._profiles.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self._interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+
+                for ident, profile in self._profiles.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        profile[_stack(frame)] += 1
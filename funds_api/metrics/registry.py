@@ -0,0 +1,35 @@
+from .histogram import HistogramFamily
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """Metric families rendered together in the Prometheus text format."""
+    def __init__(self):
+        self._families = []
+
+    def histogram(self, name, help, label_names):
+        family = HistogramFamily(name, help, label_names)
+        self._families.append(family)
+        return family
+
+    def render(self):
+        return ''.join(f'{line}\n' for family in self._families for line in family.render())
+
+
+class Metrics(Registry):
+    """Histograms of the requests of the app and of the database calls made while serving them."""
+    def __init__(self):
+        super().__init__()
+        self.requests = self.histogram(
+            'funds_request_duration_seconds', 'Duration of the requests.', ('endpoint', 'method')
+        )
+        self.stages = self.histogram(
+            'funds_request_stage_seconds',
+            'Time spent in each stage of a request: get_db, parse, validate, db and serialize.',
+            ('endpoint', 'stage'),
+        )
+        self.db_methods = self.histogram(
+            'funds_db_method_seconds', 'Duration of the calls of the database methods.', ('backend', 'method')
+        )
@@ -0,0 +1,97 @@
+"""Attribution of the time of a request to the stages serving it."""
+import contextvars
+import functools
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+
+_timings = contextvars.ContextVar('funds_stage_timings', default=None)
+
+
+class StageTimings:
+    """Seconds spent in each stage of the request being served.
+
+    A call of a stage made while another stage runs, e.g. `get_fund()` called by `fund_version()`, is part of the
+    outer stage, hence the stages never overlap and their sum never exceeds the duration of the request.
+    """
+    __slots__ = ('seconds', 'running')
+
+    def __init__(self):
+        self.seconds = {}
+        self.running = False
+
+
+def start_timings():
+    """Starts attributing the time of the stages run by the current context, returns the timings."""
+    timings = StageTimings()
+    _timings.set(timings)
+    return timings
+
+
+def stop_timings():
+    """Stops attributing time, returns the timings of the current context if they were started."""
+    timings = _timings.get()
+    _timings.set(None)
+    return timings
+
+
+def _call(stage, histogram, function, args, kwargs):
+    timings = _timings.get()
+    if (timings is None or timings.running) and histogram is None:
+        return function(*args, **kwargs)
+
+    outermost = timings is not None and not timings.running
+    if outermost:
+        timings.running = True
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        if histogram is not None:
+            histogram.observe(elapsed)
+        if outermost:
+            timings.running = False
+            timings.seconds[stage] = timings.seconds.get(stage, 0) + elapsed
+
+
+def timed(stage):
+    """Decorator attributing the duration of the calls of the function to `stage`, when timings are started."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return _call(stage, None, function, args, kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _timed_method(method, histogram):
+    def wrapper(*args, **kwargs):
+        return _call('db', histogram, method, args, kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+def instrument_db(db, family, methods):
+    """Records the duration of every call of the `methods` of the database instance in its histogram of `family`.
+
+    The instance keeps its class, its bound methods are shadowed by timed ones. The calls are attributed to the
+    `db` stage.
+    """
+    backend = type(db).__name__
+    for name in methods:
+        setattr(db, name, _timed_method(getattr(db, name), family.labels(backend, name)))
+
+    return db
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider of the app attributing the decoding of the request bodies and the encoding of the responses to
+    the `parse` and `serialize` stages."""
+    loads = timed('parse')(DefaultJSONProvider.loads)
+    dumps = timed('serialize')(DefaultJSONProvider.dumps)
@@ -3,6 +3,47 @@ import mysql
 from mysql.connector import errorcode
 
 
+# SQL command to create the table.
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS funds (
+    id INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    manager_name VARCHAR(255) NOT NULL,
+    description TEXT,
+    nav DOUBLE NOT NULL,
+    date DATE NOT NULL,
+    performance DOUBLE NOT NULL
+);
+"""
+# Indexes serving the filters and the sort orders of GET /funds.
+CREATE_INDEXES_SQL = [
+    "CREATE INDEX idx_funds_manager_name ON funds (manager_name)",
+    "CREATE INDEX idx_funds_date ON funds (date)",
+    "CREATE INDEX idx_funds_nav ON funds (nav)",
+    "CREATE INDEX idx_funds_performance ON funds (performance)",
+]
+# Single row version of the `funds` table bumped by triggers on every change, whoever makes it, such that clients
+# can check whether the funds changed without reading them.
+CREATE_VERSION_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS funds_version (
+        id INT PRIMARY KEY,
+        version BIGINT NOT NULL,
+        modified_at BIGINT NOT NULL
+    )
+    """,
+    "INSERT INTO funds_version (id, version, modified_at) VALUES (1, 0, UNIX_TIMESTAMP())",
+] + [
+    f"""
+    CREATE TRIGGER funds_after_{event.lower()} AFTER {event} ON funds FOR EACH ROW
+    BEGIN
+        UPDATE funds_version SET version = version + 1, modified_at = UNIX_TIMESTAMP() WHERE id = 1;
+    END
+    """
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+
 @click.command('create-schema')
 @click.option('--user', required=True, help='MySQL username.')
 @click.option('--password', required=True, help='MySQL password.')
@@ -30,21 +71,12 @@ def main(user, password, host, port):
         cursor.execute("CREATE DATABASE fund_db")
         cursor.execute("USE fund_db")
 
-        # SQL command to create the table.
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS funds (
-            id INT PRIMARY KEY,
-            name VARCHAR(255) NOT NULL,
-            manager_name VARCHAR(255) NOT NULL,
-            description TEXT,
-            nav DOUBLE NOT NULL,
-            date DATE NOT NULL,
-            performance DOUBLE NOT NULL
-        );
-        """
-
         # Execute the SQL command to create the table
-        cursor.execute(create_table_sql)
+        cursor.execute(CREATE_TABLE_SQL)
+        for create_index_sql in CREATE_INDEXES_SQL:
+            cursor.execute(create_index_sql)
+        for create_version_sql in CREATE_VERSION_SQL:
+            cursor.execute(create_version_sql)
         print("Table 'funds' created successfully")
 
         # Commit the changes
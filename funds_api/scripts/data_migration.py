@@ -1,11 +1,21 @@
 """Script to migrate data from JSON to MySQL."""
+import calendar
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
 from datetime import datetime
 
 import click
 import mysql
 from mysql.connector import errorcode
 
-from funds_api.database import DATA_FILE, JsonDb
+from funds_api.database import DATA_FILE, iter_journaled_funds
+from funds_api.database.json_db import atomic_write
 
 
 def _check_date_format(date_str, date_format='%Y-%m-%d'):
@@ -46,17 +56,286 @@ def _validate_data(fund: dict):
         raise ValueError(f'{fund} `performance` must be a number')
 
 
+COLUMNS = ('id', 'name', 'manager_name', 'description', 'nav', 'date', 'performance')
+# Upserts such that running the migration again, e.g. after a failure, updates the rows instead of failing.
+# The row alias needs MySQL 8.0.19, `VALUES(column)` is deprecated and warns which `raise_on_warnings` turns into errors.
+UPSERT_SQL = f"""
+INSERT INTO funds ({', '.join(COLUMNS)})
+VALUES ({', '.join(['%s'] * len(COLUMNS))}) AS new
+ON DUPLICATE KEY UPDATE {', '.join(f'{column} = new.{column}' for column in COLUMNS[1:])}
+"""
+DELETE_SQL = 'DELETE FROM funds WHERE id = %s'
+
+
+class MigrationResult(collections.namedtuple(
+    'MigrationResult', ['inserted', 'skipped', 'seconds', 'unchanged', 'deleted'], defaults=[0, 0]
+)):
+    @property
+    def rows_per_second(self):
+        return self.inserted / self.seconds if self.seconds else 0.0
+
+
+def _digest(fund):
+    """Fingerprint of the fund columns, used to detect funds changed since they were migrated."""
+    row = json.dumps([fund.get(column) for column in COLUMNS])
+    return hashlib.blake2b(row.encode(), digest_size=8).hexdigest()
+
+
+class Checkpoint:
+    """Progress of the migration, stored next to the data file.
+
+    It holds the digest of every migrated fund. Every committed chunk appends one line with its digests to the file
+    such that a failed run does not send the committed chunks again, and a completed run rewrites the file as a
+    single line. A run only sends the funds whose digest changed, hence the funds may come in any order.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.digests = {}
+
+    def load(self):
+        self.digests = {}
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'rb') as handler:
+            for line in handler:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn line from a crash, the chunk is committed but sent again by the upsert.
+                    break
+
+                self.digests.update({int(id): digest for id, digest in record['digests'].items()})
+
+    def record(self, digests):
+        """Appends the digests of a committed chunk."""
+        with open(self.path, 'a') as handler:
+            handler.write(json.dumps({'digests': digests}) + '\n')
+            handler.flush()
+            os.fsync(handler.fileno())
+
+        self.digests.update(digests)
+
+    def complete(self, deleted_ids=()):
+        """Forgets the deleted funds and compacts the file."""
+        for id in deleted_ids:
+            self.digests.pop(id, None)
+
+        atomic_write(self.path, json.dumps({'digests': self.digests}) + '\n')
+
+    def reset(self):
+        self.digests = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _chunks(funds, chunk_size):
+    iterator = iter(funds)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+_COLUMN_SET = frozenset(COLUMNS)
+_DATE = re.compile(r'([0-9]{4})-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])')
+# Matches a column of dates joined by new lines at once, the dates past the 28th are checked against the calendar.
+_DATE_COLUMN = re.compile(rf'(?:{_DATE.pattern}\n)*{_DATE.pattern}')
+_LATE_DATE = re.compile(r'^([0-9]{4})-([0-9]{2})-(29|30|31)$', re.MULTILINE)
+_YEAR_ZERO = re.compile(r'^0000-', re.MULTILINE)
+
+
+def _is_date(value):
+    if type(value) is not str:
+        return False
+
+    match = _DATE.fullmatch(value)
+    if match is None:
+        return False
+
+    year, month, day = map(int, match.groups())
+    return year > 0 and (day <= 28 or day <= calendar.monthrange(year, month)[1])
+
+
+def _valid_dates(values):
+    """Checks a column of dates, with a single regex match over the column when every date is well formed."""
+    if values and all(type(value) is str for value in values):
+        text = '\n'.join(values)
+        # A value holding a new line would match as several dates.
+        well_formed = text.count('\n') == len(values) - 1 and _DATE_COLUMN.fullmatch(text)
+        if well_formed and not _YEAR_ZERO.search(text) and all(
+            int(day) <= calendar.monthrange(int(year), int(month))[1]
+            for year, month, day in _LATE_DATE.findall(text)
+        ):
+            return [True] * len(values)
+
+    return [_is_date(value) for value in values]
+
+
+def _batch_errors(funds):
+    """Returns for every fund `None` if `_validate_data` accepts it, or the error it raises.
+
+    The funds are checked one column at a time, which avoids the per-fund `set()` and `strptime()` of
+    `_validate_data`, and the dates of a chunk are matched by a single regex. The checks are stricter, e.g. they
+    reject `True` as an id or a date without zero padding, hence the funds they reject are checked again by
+    `_validate_data`.
+    """
+    mask = [type(fund) is dict and fund.keys() == _COLUMN_SET for fund in funds]
+    candidates = [fund for fund, valid in zip(funds, mask) if valid]
+    columns = {column: [fund[column] for fund in candidates] for column in COLUMNS}
+    column_masks = [
+        [type(value) is int for value in columns['id']],
+        [type(value) is str and len(value) <= 255 for value in columns['name']],
+        [type(value) is str and len(value) <= 255 for value in columns['manager_name']],
+        [type(value) is str for value in columns['description']],
+        [type(value) is float or type(value) is int for value in columns['nav']],
+        _valid_dates(columns['date']),
+        [type(value) is float or type(value) is int for value in columns['performance']],
+    ]
+    candidate_mask = iter(map(all, zip(*column_masks)))
+    mask = [valid and next(candidate_mask) for valid in mask]
+
+    errors = [None] * len(funds)
+    for index, valid in enumerate(mask):
+        if not valid:
+            try:
+                _validate_data(funds[index])
+            except ValueError as exc:
+                errors[index] = exc
+
+    return errors
+
+
+def validate_batch(funds):
+    """Returns a mask which is `True` for the funds that `_validate_data` accepts, see `_batch_errors()`."""
+    return [error is None for error in _batch_errors(funds)]
+
+
+def _validate_chunk(chunk):
+    """Returns the insert rows of the valid funds and the errors of the invalid ones."""
+    rows = []
+    errors = []
+    for fund, error in zip(chunk, _batch_errors(chunk)):
+        if error is None:
+            rows.append(tuple(fund[column] for column in COLUMNS))
+        else:
+            errors.append(f'{error}, entry not inserted')
+
+    return rows, errors
+
+
+def _validated_chunks(funds, chunk_size, workers):
+    """Yields the validated chunks in order, validating up to `workers` chunks ahead in other processes."""
+    chunks = _chunks(funds, chunk_size)
+    if workers <= 1:
+        yield from map(_validate_chunk, chunks)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Bounds the number of chunks held in memory while the inserts catch up.
+        pending = collections.deque(
+            executor.submit(_validate_chunk, chunk) for chunk in itertools.islice(chunks, workers * 2)
+        )
+        while pending:
+            yield pending.popleft().result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(executor.submit(_validate_chunk, chunk))
+
+
+def _changed_funds(funds, checkpoint, seen_ids):
+    """Yields the funds which are new or changed since they were migrated."""
+    for fund in funds:
+        id = fund.get('id')
+        seen_ids.add(id)
+        if checkpoint.digests.get(id) != _digest(fund):
+            yield fund
+
+
+def migrate(conn, funds, chunk_size=1000, workers=1, dry_run=False, checkpoint=None):
+    """Upserts the funds through `conn`, committing every `chunk_size` funds.
+
+    With a `checkpoint` the funds unchanged since they were migrated are skipped and migrated funds which are no
+    longer in `funds` are deleted.
+    With `dry_run` the funds are validated and counted but nothing is sent to the server.
+    """
+    start = time.perf_counter()
+    inserted = 0
+    skipped = 0
+    total = 0
+    seen_ids = set()
+    deleted_ids = []
+    cursor = None if dry_run else conn.cursor()
+
+    def counted(funds):
+        nonlocal total
+        for fund in funds:
+            total += 1
+            yield fund
+
+    if checkpoint is not None:
+        funds = _changed_funds(funds, checkpoint, seen_ids)
+
+    try:
+        for rows, errors in _validated_chunks(counted(funds), chunk_size, workers):
+            for error in errors:
+                print(error)
+
+            skipped += len(errors)
+            if dry_run:
+                inserted += len(rows)
+                continue
+
+            cursor.executemany(UPSERT_SQL, rows)
+            conn.commit()
+            inserted += len(rows)
+            if checkpoint is not None:
+                checkpoint.record({row[0]: _digest(dict(zip(COLUMNS, row))) for row in rows})
+
+        if checkpoint is not None and not dry_run:
+            deleted_ids = [id for id in checkpoint.digests if id not in seen_ids]
+            if deleted_ids:
+                cursor.executemany(DELETE_SQL, [(id,) for id in deleted_ids])
+                conn.commit()
+
+            checkpoint.complete(deleted_ids)
+    finally:
+        if cursor is not None:
+            cursor.close()
+
+    unchanged = len(seen_ids) - total if checkpoint is not None else 0
+    return MigrationResult(inserted, skipped, time.perf_counter() - start, unchanged, len(deleted_ids))
+
+
 @click.command('migrate-database')
-@click.option('--user', required=True, help='MySQL username.')
-@click.option('--password', required=True, help='MySQL password.')
+@click.option('--user', help='MySQL username, required unless --dry-run.')
+@click.option('--password', help='MySQL password, required unless --dry-run.')
 @click.option('--host', default='127.0.0.1', help='MySQL host.')
 @click.option('--port', default=3306, help='MySQL port.')
-def main(user, password, host, port):
-    """Insert data from local database to MySQL server."""
-    # Read local database data.
-    local_database = JsonDb()
-    local_database.connect(DATA_FILE)
-    data = local_database.get_all()
+@click.option('--chunk-size', default=1000, help='Funds inserted and committed at a time.')
+@click.option('--workers', default=1, help='Processes validating the funds.')
+@click.option('--dry-run', is_flag=True, help='Validate the funds without connecting to MySQL.')
+@click.option('--checkpoint', 'checkpoint_path', default=f'{DATA_FILE}.migration', help='Migration progress file.')
+@click.option('--full', is_flag=True, help='Ignore the checkpoint and send every fund.')
+def main(user, password, host, port, chunk_size, workers, dry_run, checkpoint_path, full):
+    """Insert or update data from local database to MySQL server.
+
+    Only funds changed since the last run are sent and a failed run resumes after its last committed chunk.
+    """
+    # Stream the local database such that inserts start while the file is read, the journaled reader also applies
+    # mutations that are not compacted yet.
+    data = (fund_data for _, fund_data in iter_journaled_funds(DATA_FILE))
+
+    if dry_run:
+        result = migrate(None, data, chunk_size, workers, dry_run=True)
+        print(f"Validated {result.inserted} records at {result.rows_per_second:.0f} rows/s.")
+        return
+
+    if user is None or password is None:
+        raise click.UsageError('--user and --password are required unless --dry-run is set')
+
+    checkpoint = Checkpoint(checkpoint_path)
+    if full:
+        checkpoint.reset()
+    else:
+        checkpoint.load()
 
     conn = None
     config = {
@@ -67,41 +346,15 @@ def main(user, password, host, port):
         'database': 'fund_db',
         'raise_on_warnings': True
     }
-    insert_count = 0
 
     try:
         # Connects to MySQL server.
         conn = mysql.connector.connect(**config)
-        cursor = conn.cursor()
-        
-        insert_sql = """
-        INSERT INTO funds (id, name, manager_name, description, nav, date, performance)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        for fund in data:
-            try:
-                _validate_data(fund)
-            except ValueError as exc:
-                print(f'{exc}, entry not inserted')
-                continue
-            try:
-                cursor.execute(insert_sql, (
-                    fund['id'],
-                    fund['name'],
-                    fund['manager_name'],
-                    fund['description'],
-                    fund['nav'],
-                    fund['date'],
-                    fund['performance']
-                ))
-            except mysql.connector.errors.IntegrityError as exc:
-                print(str(exc))
-            else:
-                insert_count += 1
-        
-        conn.commit()
-        print(f"Inserted {insert_count} records.")
+        result = migrate(conn, data, chunk_size, workers, checkpoint=checkpoint)
+        print(
+            f"Inserted or updated {result.inserted} records at {result.rows_per_second:.0f} rows/s, "
+            f"{result.unchanged} unchanged and {result.deleted} deleted."
+        )
     
     except mysql.connector.Error as err:
         if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
@@ -113,7 +366,6 @@ def main(user, password, host, port):
     
     finally:
         if conn:
-            cursor.close()
             conn.close()
             print("Database connection closed")
 
@@ -0,0 +1,198 @@
+"""Counterpart of the services module for the async databases served by the ASGI app.
+
+Every function has the behaviour of the function of the same name in `services`, which holds the parsing and the
+validation, only the database calls are awaited here.
+"""
+import asyncio
+
+from . import exceptions, services
+from funds_api.database.async_base import AsyncAbstractDb
+from funds_api.database.base import fund_tag
+
+
+async def _record_history(db: AsyncAbstractDb, funds):
+    # Appending to the history files blocks.
+    if db.history is not None:
+        await asyncio.to_thread(db.history.record, funds)
+
+
+async def _remove_history(db: AsyncAbstractDb, ids):
+    if db.history is not None:
+        await asyncio.to_thread(db.history.remove, ids)
+
+
+async def _new_fund(db: AsyncAbstractDb, data: dict):
+    fund = services.validated_fund(data)
+    if await db.exists(data['id']):
+        raise exceptions.InvalidInputError(f'Fund {data["id"]} already exists')
+
+    return fund
+
+
+async def _updated_fund(db: AsyncAbstractDb, id: int, data: dict):
+    fund_data = await db.get_fund(id)
+    if fund_data is None:
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    return services.with_performance(fund_data, data)
+
+
+async def _validate_batch(items, validate_item):
+    """Validates the items concurrently, see `services._validate_batch()`."""
+    services.check_batch(items)
+
+    async def outcome(item):
+        try:
+            return await validate_item(item)
+        except services.ITEM_ERRORS as exc:
+            return exc
+
+    return services.batch_results(items, await asyncio.gather(*(outcome(item) for item in items)))
+
+
+async def _find(db: AsyncAbstractDb, query: dict):
+    if query['equals'] or query['ranges'] or query['sort']:
+        return await db.find(**query)
+
+    return await db.get_range(after_id=query['after_id'], limit=query['limit'], fields=query['fields'])
+
+
+async def get_funds(db: AsyncAbstractDb, args: dict):
+    return await _find(db, services.parse_listing_args(args))
+
+
+def iter_funds(db: AsyncAbstractDb, args: dict, batch_size: int = services.STREAM_BATCH_SIZE):
+    """Same listing as `get_funds()` as an async iterator which holds at most `batch_size` funds at a time.
+
+    The arguments are validated before the iterator is returned such that errors are raised before streaming starts.
+    Sorted listings are not paged, they hold at most `limit` funds.
+    """
+    query = services.parse_listing_args(args)
+
+    async def generate(after_id, remaining):
+        if query['sort']:
+            for fund in await db.find(**query):
+                yield fund
+            return
+
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            funds = await _find(db, {**query, 'after_id': after_id, 'limit': size})
+            for fund in funds:
+                yield fund
+
+            if len(funds) < size:
+                return
+
+            after_id = funds[-1]['id']
+            if remaining is not None:
+                remaining -= len(funds)
+
+    return generate(query['after_id'], query['limit'])
+
+
+async def get_stats(db: AsyncAbstractDb, args: dict):
+    return await db.stats(services.parse_group_by(args))
+
+
+async def add_fund(db: AsyncAbstractDb, data: dict):
+    fund_data = (await _new_fund(db, data)).details
+    await db.add_fund(fund_data)
+    await _record_history(db, [fund_data])
+    return data['id']
+
+
+async def add_funds(db: AsyncAbstractDb, items: list):
+    async def validate_item(data):
+        fund = await _new_fund(db, data)
+        return fund.id, fund
+
+    funds = await _validate_batch(items, validate_item)
+    funds_data = [fund.details for fund in funds.values()]
+    await db.add_funds(funds_data)
+    await _record_history(db, funds_data)
+    return list(funds)
+
+
+async def get_version(db: AsyncAbstractDb):
+    return await db.version()
+
+
+async def get_fund_version(db: AsyncAbstractDb, id: int):
+    version = await db.fund_version(id)
+    if version is None:
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    return version
+
+
+async def get_history(db: AsyncAbstractDb, id: int, args: dict):
+    if db.history is None:
+        raise exceptions.NotFoundError('The fund history is disabled')
+
+    query = services.parse_history_args(args)
+    if not await db.exists(id):
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    # Reading the points appended since the last query blocks.
+    return await asyncio.to_thread(db.history.get, id, *query)
+
+
+async def get_fund(db: AsyncAbstractDb, id: int):
+    fund = await db.get_fund(id)
+    if fund is None:
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    return fund
+
+
+async def update_performance(db: AsyncAbstractDb, id: int, data: dict, if_match=None):
+    fund_data = await db.get_fund(id)
+    if fund_data is None:
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    updated_data = services.with_performance(fund_data, data).details
+    if if_match is None:
+        await db.update_fund(id, updated_data)
+    elif fund_tag(fund_data) not in if_match or not await db.update_fund_if_unchanged(id, fund_data, updated_data):
+        raise exceptions.PreconditionFailedError(f'Fund {id} was changed since it was read')
+
+    await _record_history(db, [updated_data])
+    return updated_data
+
+
+async def update_performances(db: AsyncAbstractDb, items: list):
+    async def validate_item(item):
+        id, data = services.split_update_item(item)
+        return id, await _updated_fund(db, id, data)
+
+    funds = await _validate_batch(items, validate_item)
+    data_by_id = {id: fund.details for id, fund in funds.items()}
+    await db.update_funds(data_by_id)
+    await _record_history(db, list(data_by_id.values()))
+    return list(data_by_id.values())
+
+
+async def delete_fund(db: AsyncAbstractDb, id: int):
+    if not await db.exists(id):
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    await db.delete_fund(id)
+    await _remove_history(db, [id])
+
+    return ''
+
+
+async def delete_funds(db: AsyncAbstractDb, ids: list):
+    async def validate_item(id):
+        services.check_id(id)
+        if not await db.exists(id):
+            raise exceptions.NotFoundError(f'Fund {id} not found')
+
+        return id, id
+
+    ids = list(await _validate_batch(ids, validate_item))
+    await db.delete_funds(ids)
+    await _remove_history(db, ids)
+
+    return ''
@@ -4,3 +4,14 @@ class NotFoundError(RuntimeError):
 
 class InvalidInputError(RuntimeError):
     pass
+
+
+class PreconditionFailedError(RuntimeError):
+    pass
+
+
+class BatchError(InvalidInputError):
+    """Raised when items of a batch are invalid, `errors` lists the index and the error of each one."""
+    def __init__(self, message, errors):
+        super().__init__(message)
+        self.errors = errors
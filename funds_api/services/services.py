@@ -1,30 +1,352 @@
 """Services modules for orchestration logic and handling use case scenarios."""
+import math
+from datetime import datetime
+
 from . import exceptions
 from funds_api.database import exceptions as db_exceptions
-from funds_api.database.base import AbstractDb
-from funds_api.database.model import Fund
+from funds_api.database.base import AbstractDb, fund_tag
+from funds_api.database.model import Fund, FUND_FIELDS
+
+
+# Number of funds a streamed listing reads from the database at a time.
+STREAM_BATCH_SIZE = 500
+# Fields a listing can be sorted by, each one is indexed by the databases.
+SORT_FIELDS = ('date', 'nav', 'performance')
+# Groups the statistics can be computed for.
+STATS_GROUPS = ('manager_name', 'year', 'month')
+# Errors of an invalid batch item, reported per item instead of failing the request.
+ITEM_ERRORS = (exceptions.InvalidInputError, exceptions.NotFoundError)
 
 
 def _is_fund_exists(db: AbstractDb, id: int):
-    return id in db.get_all_ids()
+    return db.exists(id)
 
 
-def add_fund(db: AbstractDb, data: dict):
+def _parse_int(args: dict, name: str, minimum: int = None):
+    if args.get(name) is None:
+        return None
+
+    try:
+        value = int(args[name])
+    except ValueError:
+        raise exceptions.InvalidInputError(f'`{name}` must be an integer') from None
+
+    if minimum is not None and value < minimum:
+        raise exceptions.InvalidInputError(f'`{name}` must be at least {minimum}')
+
+    return value
+
+
+def _parse_float(args: dict, name: str):
+    if args.get(name) is None:
+        return None
+
+    try:
+        value = float(args[name])
+    except ValueError:
+        value = math.nan
+
+    # `float()` also parses `nan` and `inf`, which no fund field holds.
+    if not math.isfinite(value):
+        raise exceptions.InvalidInputError(f'`{name}` must be a number')
+
+    return value
+
+
+def _parse_date(args: dict, name: str):
+    if args.get(name) is None:
+        return None
+
+    try:
+        datetime.strptime(args[name], '%Y-%m-%d')
+    except ValueError:
+        raise exceptions.InvalidInputError(f'`{name}` must follow the format yyyy-mm-dd') from None
+
+    return args[name]
+
+
+def parse_listing_args(args: dict):
+    """Returns the keyword arguments of `AbstractDb.find()` for a fund listing."""
+    query = {
+        'limit': _parse_int(args, 'limit', 1),
+        'after_id': _parse_int(args, 'after_id'),
+        'fields': None,
+        'equals': {},
+        'ranges': {},
+        'sort': None,
+        'descending': False,
+    }
+
+    if args.get('fields'):
+        fields = [field for field in args['fields'].split(',') if field]
+        unknown = set(fields) - set(FUND_FIELDS)
+        if unknown:
+            raise exceptions.InvalidInputError(f'Unknown fields {", ".join(sorted(unknown))}')
+
+        query['fields'] = list(dict.fromkeys(['id'] + fields))
+
+    if args.get('manager_name') is not None:
+        query['equals']['manager_name'] = args['manager_name']
+
+    for field, low, high in [
+        ('date', _parse_date(args, 'date_from'), _parse_date(args, 'date_to')),
+        ('nav', _parse_float(args, 'nav_min'), _parse_float(args, 'nav_max')),
+        ('performance', _parse_float(args, 'performance_min'), _parse_float(args, 'performance_max')),
+    ]:
+        if low is not None or high is not None:
+            query['ranges'][field] = (low, high)
+
+    if args.get('sort'):
+        query['descending'] = args['sort'].startswith('-')
+        query['sort'] = args['sort'][1:] if query['descending'] else args['sort']
+        if query['sort'] not in SORT_FIELDS:
+            raise exceptions.InvalidInputError(
+                f'`sort` must be one of {", ".join(SORT_FIELDS)}, with a `-` prefix for descending order'
+            )
+
+        if query['after_id'] is not None:
+            raise exceptions.InvalidInputError('`after_id` only pages funds ordered by id, use `limit` with `sort`')
+
+    return query
+
+
+def _find(db: AbstractDb, query: dict):
+    if query['equals'] or query['ranges'] or query['sort']:
+        return db.find(**query)
+
+    return db.get_range(after_id=query['after_id'], limit=query['limit'], fields=query['fields'])
+
+
+def get_funds(db: AbstractDb, args: dict):
+    """Lists the funds ordered by id.
+
+    `limit` caps the number of funds, `after_id` continues after the last id of the previous page and `fields` is a
+    comma separated list of the keys to return. The id is always returned as it is the cursor of the next page.
+    `manager_name`, `date_from`/`date_to`, `nav_min`/`nav_max` and `performance_min`/`performance_max` filter the funds
+    and `sort` orders them by date, nav or performance instead, e.g. `sort=-performance&limit=10` for the top 10.
+    """
+    return _find(db, parse_listing_args(args))
+
+
+def iter_funds(db: AbstractDb, args: dict, batch_size: int = STREAM_BATCH_SIZE):
+    """Same listing as `get_funds()` as an iterator which holds at most `batch_size` funds at a time.
+
+    The arguments are validated before the iterator is returned such that errors are raised before streaming starts.
+    Sorted listings are not paged, they hold at most `limit` funds.
+    """
+    query = parse_listing_args(args)
+    if query['sort']:
+        return iter(db.find(**query))
+
+    def generate(after_id, remaining):
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            funds = _find(db, {**query, 'after_id': after_id, 'limit': size})
+            yield from funds
+
+            if len(funds) < size:
+                return
+
+            after_id = funds[-1]['id']
+            if remaining is not None:
+                remaining -= len(funds)
+
+    return generate(query['after_id'], query['limit'])
+
+
+def parse_group_by(args: dict):
+    """Returns the `group_by` argument of `AbstractDb.stats()`."""
+    group_by = args.get('group_by') or None
+    if group_by is not None and group_by not in STATS_GROUPS:
+        raise exceptions.InvalidInputError(f'`group_by` must be one of {", ".join(STATS_GROUPS)}')
+
+    return group_by
+
+
+def get_stats(db: AbstractDb, args: dict):
+    """Fund count, mean and median performance and nav percentiles of every group of funds.
+
+    `group_by` is `manager_name`, `year` or `month` of the fund date, without it a single group holds every fund.
+    """
+    return db.stats(parse_group_by(args))
+
+
+def validated_fund(data: dict):
+    """Returns the fund of the input data once it follows the schema, the checks needing no database."""
     if not data:
         raise exceptions.InvalidInputError('No data provided')
 
     try:
-        fund = Fund(data) # Checks whether the input data follows the schema.
+        return Fund(data) # Checks whether the input data follows the schema.
     except db_exceptions.InvalidFundDataInput as exc:
         raise exceptions.InvalidInputError(exc) from exc
 
+
+def with_performance(fund_data: dict, data: dict):
+    """Returns the validated stored `fund_data` with the performance of the input data."""
+    if not data or 'performance' not in data or len(data) > 1:
+        raise exceptions.InvalidInputError(
+            'Input data must be sent in JSON and only with the performance value'
+        )
+
+    # Copy the stored fund such that a rejected update does not leak into the database instance.
+    target_fund = dict(fund_data)
+    target_fund['performance'] = data['performance']
+
+    try:
+        # Validate the updated data against the model.
+        return Fund(target_fund)
+    except db_exceptions.InvalidFundDataInput as exc:
+        raise exceptions.InvalidInputError(exc) from exc
+
+
+def _record_history(db: AbstractDb, funds):
+    if db.history is not None:
+        db.history.record(funds)
+
+
+def _remove_history(db: AbstractDb, ids):
+    if db.history is not None:
+        db.history.remove(ids)
+
+
+def parse_history_args(args: dict):
+    """Returns the arguments of `HistoryStore.get()` after the id."""
+    return _parse_date(args, 'from'), _parse_date(args, 'to'), _parse_int(args, 'points', 1)
+
+
+def _new_fund(db: AbstractDb, data: dict):
+    """Returns the validated fund to add."""
+    fund = validated_fund(data)
     if _is_fund_exists(db, data['id']):
         raise exceptions.InvalidInputError(f'Fund {data["id"]} already exists')
 
-    db.add_fund(fund.details)
+    return fund
+
+
+def _updated_fund(db: AbstractDb, id: int, data: dict):
+    """Returns the validated fund with the new performance."""
+    if not _is_fund_exists(db, id):
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    return with_performance(db.get_fund(id), data)
+
+
+def check_id(id):
+    """Raises an `InvalidInputError` unless the fund id of a batch item is an integer."""
+    if not isinstance(id, int) or isinstance(id, bool):
+        raise exceptions.InvalidInputError(f'Fund id {id!r} must be an integer')
+
+
+def split_update_item(item):
+    """Returns the id and the update data of a batch update item."""
+    if not isinstance(item, dict) or 'id' not in item:
+        raise exceptions.InvalidInputError('Each item must be a JSON object with an id')
+
+    data = dict(item)
+    id = data.pop('id')
+    check_id(id)
+    return id, data
+
+
+def check_batch(items):
+    """Raises an `InvalidInputError` unless the batch is a non-empty list."""
+    if not isinstance(items, list) or not items:
+        raise exceptions.InvalidInputError('Input data must be a non-empty JSON list')
+
+
+def batch_results(items, outcomes):
+    """Returns the validated values of the batch or raises a single `BatchError` listing each invalid item.
+
+    `outcomes` holds for every item either the id of the fund it changes and the validated value, or the input error
+    raised by its validation. An id may only be changed once per batch.
+    """
+    results = {}
+    errors = []
+    for index, outcome in enumerate(outcomes):
+        if not isinstance(outcome, Exception):
+            id, result = outcome
+            if id in results:
+                outcome = exceptions.InvalidInputError(f'Fund {id} appears more than once')
+            else:
+                results[id] = result
+                continue
+
+        errors.append({'index': index, 'error': str(outcome)})
+
+    if errors:
+        raise exceptions.BatchError(f'{len(errors)} of {len(items)} items are invalid, none applied', errors)
+
+    return results
+
+
+def _validate_batch(items, validate_item):
+    """Validates every item and raises a single `BatchError` listing each invalid item.
+
+    `validate_item` returns the id of the fund the item changes and the validated value.
+    """
+    check_batch(items)
+
+    outcomes = []
+    for item in items:
+        try:
+            outcomes.append(validate_item(item))
+        except ITEM_ERRORS as exc:
+            outcomes.append(exc)
+
+    return batch_results(items, outcomes)
+
+
+def add_fund(db: AbstractDb, data: dict):
+    fund_data = _new_fund(db, data).details
+    db.add_fund(fund_data)
+    _record_history(db, [fund_data])
     return data['id']
 
 
+def add_funds(db: AbstractDb, items: list):
+    """Adds every fund in one commit, or none of them if any item is invalid."""
+    def validate_item(data):
+        fund = _new_fund(db, data)
+        return fund.id, fund
+
+    funds = _validate_batch(items, validate_item)
+    funds_data = [fund.details for fund in funds.values()]
+    db.add_funds(funds_data)
+    _record_history(db, funds_data)
+    return list(funds)
+
+
+def get_version(db: AbstractDb):
+    """Returns `(tag, last_modified)` of the funds, the tag changes whenever any fund changes."""
+    return db.version()
+
+
+def get_fund_version(db: AbstractDb, id: int):
+    """Returns `(tag, last_modified)` of the fund, the tag changes whenever the fund changes."""
+    version = db.fund_version(id)
+    if version is None:
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    return version
+
+
+def get_history(db: AbstractDb, id: int, args: dict):
+    """Time, nav and performance of the fund at every write, ordered by time.
+
+    `from` and `to` bound the UTC days of the writes, inclusive, and `points` downsamples the range to that many points,
+    the last one of each group of the same number of points.
+    """
+    if db.history is None:
+        raise exceptions.NotFoundError('The fund history is disabled')
+
+    query = parse_history_args(args)
+    if not _is_fund_exists(db, id):
+        raise exceptions.NotFoundError(f'Fund {id} not found')
+
+    return db.history.get(id, *query)
+
+
 def get_fund(db: AbstractDb, id: int):
     if not _is_fund_exists(db, id):
         raise exceptions.NotFoundError(f'Fund {id} not found')
@@ -33,26 +355,40 @@ def get_fund(db: AbstractDb, id: int):
     return fund
 
 
-def update_performance(db: AbstractDb, id: int, data: dict):
-    if not _is_fund_exists(db, id):
-        raise exceptions.NotFoundError(f'Fund {id} not found')
+def update_performance(db: AbstractDb, id: int, data: dict, if_match=None):
+    """Updates the performance of the fund.
 
-    if not data or 'performance' not in data or len(data) > 1:
-        raise exceptions.InvalidInputError(
-            'Input data must be sent in JSON and only with the performance value'
-        )
+    With `if_match`, a container of tags, the fund is only updated if its current tag is in it such that a client
+    does not overwrite a change it has not seen. The tag is compared with the fund read here, which the database
+    then replaces only if no other write changed it meanwhile.
+    """
+    if if_match is None:
+        updated_data = _updated_fund(db, id, data).details
+        db.update_fund(id, updated_data)
+    else:
+        fund_data = db.get_fund(id)
+        if fund_data is None:
+            raise exceptions.NotFoundError(f'Fund {id} not found')
 
-    target_fund = db.get_fund(id)
-    target_fund['performance'] = data['performance']
+        updated_data = with_performance(fund_data, data).details
+        if fund_tag(fund_data) not in if_match or not db.update_fund_if_unchanged(id, fund_data, updated_data):
+            raise exceptions.PreconditionFailedError(f'Fund {id} was changed since it was read')
 
-    try:
-        # Validate the updated data against the model.
-        fund = Fund(target_fund)
-    except db_exceptions.InvalidFundDataInput as exc:
-        raise exceptions.InvalidInputError(exc) from exc
+    _record_history(db, [updated_data])
+    return updated_data
 
-    db.update_fund(id, fund.details)
-    return target_fund
+
+def update_performances(db: AbstractDb, items: list):
+    """Updates the performance of every `{"id": ..., "performance": ...}` item in one commit, or of none of them."""
+    def validate_item(item):
+        id, data = split_update_item(item)
+        return id, _updated_fund(db, id, data)
+
+    funds = _validate_batch(items, validate_item)
+    data_by_id = {id: fund.details for id, fund in funds.items()}
+    db.update_funds(data_by_id)
+    _record_history(db, list(data_by_id.values()))
+    return list(data_by_id.values())
 
 
 def delete_fund(db: AbstractDb, id: int):
@@ -60,6 +396,22 @@ def delete_fund(db: AbstractDb, id: int):
         raise exceptions.NotFoundError(f'Fund {id} not found')
 
     db.delete_fund(id)
+    _remove_history(db, [id])
+
+    return ''
+
+
+def delete_funds(db: AbstractDb, ids: list):
+    """Deletes every fund in one commit, or none of them if any id does not exist."""
+    def validate_item(id):
+        check_id(id)
+        if not _is_fund_exists(db, id):
+            raise exceptions.NotFoundError(f'Fund {id} not found')
+
+        return id, id
+
+    ids = list(_validate_batch(ids, validate_item))
+    db.delete_funds(ids)
+    _remove_history(db, ids)
 
     return ''
-    
\ No newline at end of file
@@ -3,9 +3,14 @@ import pytest
 
 from funds_api import create_app
 from funds_api.bp import funds
+from funds_api.database.base import fund_tag
+from funds_api.database.columns import GROUP_KEYS, group_stats
+from funds_api.database.history import HistoryStore
 
 
 class FakeDb:
+    history = None
+
     def __init__(self):
         self._data = {
             1001: {
@@ -28,18 +33,86 @@ class FakeDb:
             },
         }
 
+    def version(self):
+        return fund_tag(self._data), None
+
+    def fund_version(self, id):
+        fund = self._data.get(id)
+        return None if fund is None else (fund_tag(fund), None)
+
     def get_all_ids(self):
         return list(self._data.keys())
 
+    def exists(self, id):
+        return id in self._data
+
     def get_all(self):
         return list(self._data.values())
 
+    def get_range(self, after_id=None, limit=None, fields=None):
+        funds = [self._data[id] for id in sorted(self._data) if after_id is None or id > after_id][:limit]
+        if fields is None:
+            return funds
+
+        return [{field: fund[field] for field in fields} for fund in funds]
+
+    def find(self, equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+        funds = [
+            fund for fund in self._data.values()
+            if all(fund[field] == value for field, value in (equals or {}).items())
+            and all(
+                (low is None or fund[field] >= low) and (high is None or fund[field] <= high)
+                for field, (low, high) in (ranges or {}).items()
+            )
+        ]
+        if sort is None:
+            funds = sorted(
+                (fund for fund in funds if after_id is None or fund['id'] > after_id), key=lambda fund: fund['id']
+            )
+        else:
+            funds.sort(key=lambda fund: (fund[sort], fund['id']), reverse=descending)
+
+        funds = funds[:limit]
+        if fields is None:
+            return funds
+
+        return [{field: fund[field] for field in fields} for fund in funds]
+
+    def stats(self, group_by=None):
+        groups = {}
+        for fund in self._data.values():
+            groups.setdefault(GROUP_KEYS[group_by](fund), []).append(fund)
+
+        return [
+            {**({} if group_by is None else {group_by: group}),
+             **group_stats([fund['nav'] for fund in funds], [fund['performance'] for fund in funds])}
+            for group, funds in sorted(groups.items())
+        ]
+
     def add_fund(self, fund_data):
         self._data[fund_data['id']] = fund_data
 
     def update_fund(self, id, data):
         self._data[id] = data
 
+    def update_fund_if_unchanged(self, id, expected, data):
+        if self._data.get(id) != expected:
+            return False
+
+        self._data[id] = data
+        return True
+
+    def add_funds(self, funds):
+        for fund_data in funds:
+            self.add_fund(fund_data)
+
+    def update_funds(self, data_by_id):
+        self._data.update(data_by_id)
+
+    def delete_funds(self, ids):
+        for id in ids:
+            self._data.pop(id, None)
+
     def get_fund(self, id):
         return self._data.get(id)
 
@@ -76,6 +149,66 @@ def test_get_all(client, mock_db):
     assert len(response.json) == 2
 
 
+def test_get_all_page(client, mock_db):
+    """Test the get all endpoint with pagination and projection."""
+    response = client.get('/funds?limit=1&after_id=1001&fields=performance')
+    assert response.status_code == 200
+    assert response.json == [{'id': 3210, 'performance': 7.8}]
+
+
+def test_get_all_stream(client, mock_db):
+    """Test the get all endpoint streams the same JSON array."""
+    response = client.get('/funds?stream=true&fields=nav')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.json == [{'id': 1001, 'nav': 150.25}, {'id': 3210, 'nav': 95.75}]
+
+
+def test_get_all_ndjson(client, mock_db):
+    """Test the get all endpoint streams one fund per line when NDJSON is accepted."""
+    response = client.get('/funds?fields=nav', headers={'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.get_data(as_text=True) == '{"id": 1001, "nav": 150.25}\n{"id": 3210, "nav": 95.75}\n'
+
+
+def test_get_all_top_performance(client, mock_db):
+    """Test the get all endpoint with a filter and a sort order."""
+    response = client.get('/funds?performance_min=5&sort=-performance&limit=1&fields=performance')
+    assert response.status_code == 200
+    assert response.json == [{'id': 1001, 'performance': 12.5}]
+
+
+def test_get_all_not_modified(client, mock_db):
+    """Test the get all endpoint answers with 304 while no fund changed, for the same query only."""
+    etag = client.get('/funds?limit=1').headers['ETag']
+    assert client.get('/funds?limit=1', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/funds?limit=2', headers={'If-None-Match': etag}).status_code == 200
+
+    client.delete('/funds/3210')
+    assert client.get('/funds?limit=1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_get_all_invalid_limit(client, mock_db):
+    """Test the get all endpoint with an invalid limit."""
+    response = client.get('/funds?limit=-1')
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+def test_get_stats(client, mock_db):
+    """Test the statistics endpoint grouped by year."""
+    response = client.get('/funds/stats?group_by=year')
+    assert response.status_code == 200
+    assert [(group['year'], group['count'], group['performance_mean']) for group in response.json] == [
+        ('2019', 1, 7.8), ('2021', 1, 12.5)
+    ]
+
+    response = client.get('/funds/stats?group_by=name')
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
 def test_get_single_fund(client, mock_db):
     """Test get single fund endpoint."""
     response = client.get('/funds/1001')
@@ -91,6 +224,55 @@ def test_get_single_fund(client, mock_db):
     }.items())
 
 
+def test_get_single_fund_not_modified(client, mock_db):
+    """Test get single fund endpoint answers with 304 while the client holds the current fund."""
+    response = client.get('/funds/1001')
+    etag = response.headers['ETag']
+
+    response = client.get('/funds/1001', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    client.patch('/funds/1001', json={'performance': 1.0})
+    response = client.get('/funds/1001', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['performance'] == 1.0
+
+
+def test_get_funds_cached(client, mock_db):
+    """Test the listings and stats are served from the cache until a fund changes, unlike single funds."""
+    response = client.get('/funds/1001')
+    assert response.json['performance'] == 12.5
+    assert 'X-Cache' not in response.headers
+
+    assert client.get('/funds').headers['X-Cache'] == 'MISS'
+    assert client.get('/funds').headers['X-Cache'] == 'HIT'
+    assert client.get('/funds/stats').headers['X-Cache'] == 'MISS'
+    assert client.get('/funds/stats').headers['X-Cache'] == 'HIT'
+
+    client.patch('/funds/1001', json={'performance': 1.0})
+    response = client.get('/funds')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json[0]['performance'] == 1.0
+    client.delete('/funds/3210')
+    response = client.get('/funds')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(response.json) == 1
+
+    stats = client.get('/cache/stats').json
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 4, 2)
+
+
+def test_get_single_fund_cache_disabled(mock_db):
+    """Test the endpoints work without the response cache."""
+    client = create_app({'RESPONSE_CACHE': 'none'}).test_client()
+    response = client.get('/funds/1001')
+    assert response.status_code == 200
+    assert 'X-Cache' not in response.headers
+    assert client.get('/cache/stats').status_code == 404
+
+
 def test_get_single_fund_not_found(client, mock_db):
     """Test get fund endpoint with non-existent id."""
     response = client.get('/funds/1')
@@ -99,6 +281,20 @@ def test_get_single_fund_not_found(client, mock_db):
     assert 'error' in response.json
 
 
+def test_get_history(client, mock_db, tmp_path):
+    """Test the history endpoint returns the points recorded by the updates."""
+    mock_db.history = HistoryStore(tmp_path / 'history')
+    client.patch('/funds/1001', json={'performance': 1.0})
+    client.patch('/funds/1001', json={'performance': 2.0})
+
+    response = client.get('/funds/1001/history?from=2021-01-01&points=10')
+    assert response.status_code == 200
+    assert [(point['nav'], point['performance']) for point in response.json] == [(150.25, 1.0), (150.25, 2.0)]
+
+    assert client.get('/funds/1001/history?to=2021').status_code == 400
+    assert client.get('/funds/1/history').status_code == 404
+
+
 def test_update_performance(client, mock_db):
     """Test update performance endpoint."""
     response = client.patch('/funds/1001', json={'performance': 22.5})
@@ -133,6 +329,20 @@ def test_update_performance_invalid_input(client, mock_db):
     assert 'error' in response.json
 
 
+def test_update_performance_if_match(client, mock_db):
+    """Test the update endpoint rejects an update of a fund changed since the client read it."""
+    etag = client.get('/funds/1001').headers['ETag']
+
+    response = client.patch('/funds/1001', json={'performance': 1.0}, headers={'If-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    response = client.patch('/funds/1001', json={'performance': 2.0}, headers={'If-Match': etag})
+    assert response.status_code == 412
+    assert 'error' in response.json
+    assert mock_db.get_fund(1001)['performance'] == 1.0
+
+
 def test_update_performance_fund_not_found(client, mock_db):
     """Test update performance endpoint with non existent fund."""
     response = client.patch('/funds/1', json={'performance': 22.5})
@@ -216,4 +426,28 @@ def test_delete_non_existent_fund(client, mock_db):
     response = client.delete('/funds/413')
     assert response.status_code == 404
     assert 'error' in response.json
-    
\ No newline at end of file
+    
+
+def test_batch_endpoints(client, mock_db):
+    """Test the batch endpoints."""
+    new_fund = {**mock_db.get_fund(1001), 'id': 1}
+
+    response = client.post('/funds:batch', json=[new_fund])
+    assert response.status_code == 201
+    assert response.json == [1]
+
+    response = client.patch('/funds:batch', json=[{'id': 1, 'performance': 3.5}])
+    assert response.status_code == 200
+    assert response.json == [{**new_fund, 'performance': 3.5}]
+
+    response = client.delete('/funds:batch', json=[1, 1001])
+    assert response.status_code == 204
+    assert mock_db.get_all_ids() == [3210]
+
+
+def test_batch_endpoint_invalid_items(client, mock_db):
+    """Test the batch endpoints report the invalid items."""
+    response = client.patch('/funds:batch', json=[{'id': 3210, 'performance': 3.5}, {'id': 1, 'performance': 3.5}])
+    assert response.status_code == 400
+    assert response.json['errors'] == [{'index': 1, 'error': 'Fund 1 not found'}]
+    assert mock_db.get_fund(3210)['performance'] == 7.8
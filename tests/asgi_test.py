@@ -0,0 +1,145 @@
+"""Test the ASGI app."""
+import asyncio
+import json
+
+import pytest
+
+from funds_api.asgi import create_asgi_app
+
+
+FUNDS = {
+    1001: {
+        "id": 1001,
+        "name": "Growth Fund",
+        "manager_name": "Alice Johnson",
+        "description": "A fund focusing on long-term growth investments.",
+        "nav": 150.25,
+        "date": "2021-05-01",
+        "performance": 12.5
+    },
+    3210: {
+        "id": 3210,
+        "name": "Income Fund",
+        "manager_name": "Bob Smith",
+        "description": "A fund aiming to provide steady income through dividends.",
+        "nav": 95.75,
+        "date": "2019-08-15",
+        "performance": 7.8
+    },
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    path = tmp_path / 'data.json'
+    with open(path, 'w') as handler:
+        json.dump(FUNDS, handler, indent=4)
+
+    return create_asgi_app({'DATABASE_PATH': path, 'DATABASE_HISTORY': True})
+
+
+def test_get_all(app):
+    """Test listing the funds, as a JSON array and streamed."""
+    async def check():
+        client = app.test_client()
+        response = await client.get('/funds?fields=nav')
+        assert response.status_code == 200
+        assert await response.get_json() == [{'id': 1001, 'nav': 150.25}, {'id': 3210, 'nav': 95.75}]
+
+        response = await client.get('/funds', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 200
+
+        response = await client.get('/funds?stream=true&limit=1')
+        assert json.loads(await response.get_data()) == [FUNDS[1001]]
+
+        response = await client.get('/funds?sort=-performance', headers={'Accept': 'application/x-ndjson'})
+        assert response.mimetype == 'application/x-ndjson'
+        assert [json.loads(line) for line in (await response.get_data()).splitlines()] == list(FUNDS.values())
+
+        response = await client.get('/funds?limit=x')
+        assert response.status_code == 400
+
+    asyncio.run(check())
+
+
+def test_get_all_not_modified(app):
+    """Test a listing the client holds is answered without a body."""
+    async def check():
+        client = app.test_client()
+        response = await client.get('/funds')
+        response = await client.get('/funds', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+
+        await client.patch('/funds/1001', json={'performance': 1.0})
+        response = await client.get('/funds', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 200
+
+    asyncio.run(check())
+
+
+def test_get_stats(app):
+    """Test the grouped statistics."""
+    async def check():
+        client = app.test_client()
+        response = await client.get('/funds/stats?group_by=manager_name')
+        assert [group['manager_name'] for group in await response.get_json()] == ['Alice Johnson', 'Bob Smith']
+
+        response = await client.get('/funds/stats?group_by=name')
+        assert response.status_code == 400
+
+    asyncio.run(check())
+
+
+def test_fund_endpoints(app):
+    """Test reading, updating and deleting a fund."""
+    async def check():
+        client = app.test_client()
+        response = await client.get('/funds/1001')
+        assert await response.get_json() == FUNDS[1001]
+        tag = response.headers['ETag']
+
+        response = await client.patch('/funds/1001', json={'performance': 30.5}, headers={'If-Match': tag})
+        assert (await response.get_json())['performance'] == 30.5
+        response = await client.patch('/funds/1001', json={'performance': 31.5}, headers={'If-Match': tag})
+        assert response.status_code == 412
+        response = await client.patch('/funds/1001', json={'nav': 1.0})
+        assert response.status_code == 400
+
+        response = await client.get('/funds/1001/history?points=1')
+        assert [point['performance'] for point in await response.get_json()] == [30.5]
+
+        response = await client.delete('/funds/1001')
+        assert response.status_code == 204
+        for response in [await client.get('/funds/1001'), await client.delete('/funds/1001')]:
+            assert response.status_code == 404
+            assert await response.get_json() == {'error': 'Fund 1001 not found'}
+
+    asyncio.run(check())
+
+
+def test_create_fund(app):
+    """Test adding funds, one at a time and in batches."""
+    async def check():
+        client = app.test_client()
+        response = await client.post('/funds', json={**FUNDS[1001], 'id': 1})
+        assert response.status_code == 201
+        assert await response.get_json() == 1
+
+        response = await client.post('/funds', json=FUNDS[1001])
+        assert await response.get_json() == {'error': 'Fund 1001 already exists'}
+
+        response = await client.post('/funds:batch', json=[{**FUNDS[1001], 'id': 2}, {'id': 3}, FUNDS[3210]])
+        assert response.status_code == 400
+        assert [error['index'] for error in (await response.get_json())['errors']] == [1, 2]
+
+        response = await client.post('/funds:batch', json=[{**FUNDS[1001], 'id': 2}, {**FUNDS[1001], 'id': 3}])
+        assert await response.get_json() == [2, 3]
+        response = await client.patch('/funds:batch', json=[{'id': 2, 'performance': 1.0}])
+        assert response.status_code == 200
+        response = await client.delete('/funds:batch', json=[1, 2, 3])
+        assert response.status_code == 204
+
+        response = await client.get('/funds?fields=id')
+        assert await response.get_json() == [{'id': 1001}, {'id': 3210}]
+
+    asyncio.run(check())
@@ -0,0 +1,65 @@
+"""Test the response cache."""
+import pytest
+
+from funds_api.cache import LruCache, SharedCache, memory_cache
+
+
+def test_lru_cache_tags():
+    """Test an entry is only returned for the tag it was stored with and the lookups are counted."""
+    cache = LruCache()
+    assert cache.get('fund:1', 'a') is None
+    cache.set('fund:1', 'a', b'{"id": 1}')
+    assert cache.get('fund:1', 'a') == b'{"id": 1}'
+    assert cache.get('fund:1', 'b') is None
+
+    cache.delete('fund:1', 'fund:2')
+    assert cache.get('fund:1', 'a') is None
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'entries': 0, 'bytes': 0}
+
+
+def test_lru_cache_eviction():
+    """Test the least recently used entries are evicted beyond the entry and byte limits."""
+    cache = LruCache(max_entries=2, max_bytes=30)
+    cache.set('a', 't', b'1')
+    cache.set('b', 't', b'2')
+    cache.get('a', 't')
+    cache.set('c', 't', b'3')
+    assert cache.get('b', 't') is None
+    assert cache.get('a', 't') == b'1'
+
+    # An entry takes the tag and a separator besides the value.
+    cache.set('d', 't', b'x' * 25)
+    assert cache.get('c', 't') is None
+    assert cache.stats()['bytes'] == 30
+    cache.set('e', 't', b'x')
+    assert cache.get('a', 't') is None
+
+    cache.set('f', 't', b'x' * 29)
+    assert cache.get('f', 't') is None
+
+
+def test_lru_cache_ttl(monkeypatch):
+    """Test entries expire after the TTL."""
+    now = [100.0]
+    monkeypatch.setattr(memory_cache.time, 'monotonic', lambda: now[0])
+    cache = LruCache(ttl=10)
+    cache.set('a', 't', b'1')
+    now[0] += 9
+    assert cache.get('a', 't') == b'1'
+    now[0] += 1
+    assert cache.get('a', 't') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_shared_cache(fake_redis):
+    """Test the shared cache stores prefixed entries with the TTL in the store."""
+    cache = SharedCache(fake_redis, ttl=60)
+    other_cache = SharedCache(fake_redis, ttl=60)
+    cache.set('fund:1', 'a', b'{"id": 1}')
+    assert other_cache.get('fund:1', 'a') == b'{"id": 1}'
+    assert list(fake_redis.values) == ['funds_api:fund:1']
+
+    other_cache.delete('fund:1')
+    assert cache.get('fund:1', 'a') is None
+    assert cache.stats() == {'hits': 0, 'misses': 1}
+    assert other_cache.stats() == {'hits': 1, 'misses': 0}
@@ -0,0 +1,178 @@
+"""Fixtures shared by the tests."""
+import contextlib
+import datetime
+import re
+import sqlite3
+import time
+
+import mysql.connector
+import pytest
+
+from funds_api.scripts.create_schema import CREATE_INDEXES_SQL, CREATE_TABLE_SQL, CREATE_VERSION_SQL
+
+
+@contextlib.contextmanager
+def _mysql_errors():
+    """Raises the errors of the MySQL connector such that the code under test handles them as in production."""
+    try:
+        yield
+    except sqlite3.IntegrityError as exc:
+        raise mysql.connector.errors.IntegrityError(str(exc)) from exc
+
+
+def _to_sqlite(sql):
+    """Translates the MySQL specific syntax used by the code under test."""
+    # SQLite uses `?` placeholders where MySQL uses `%s`.
+    sql = sql.replace('%s', '?').replace('<=>', 'IS')
+    sql = sql.replace(' AS new', '').replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT (id) DO UPDATE SET')
+    return re.sub(r'\bnew\.(\w+)', r'excluded.\1', sql)
+
+
+def _date_format(date, format):
+    return datetime.date.fromisoformat(date).strftime(format)
+
+
+class SqlitePool:
+    """Stand-in for `mysql.connector.pooling.MySQLConnectionPool` handing out SQLite connections."""
+    def __init__(self, path):
+        self._path = path
+
+    def get_connection(self):
+        conn = sqlite3.connect(self._path)
+        conn.create_function('DATE_FORMAT', 2, _date_format, deterministic=True)
+        conn.create_function('UNIX_TIMESTAMP', 0, lambda: int(time.time()))
+        return SqliteConnection(conn)
+
+
+class SqliteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, prepared=False):
+        return SqliteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        with _mysql_errors():
+            self._cursor.execute(_to_sqlite(sql), params)
+
+    def executemany(self, sql, seq_params):
+        with _mysql_errors():
+            self._cursor.executemany(_to_sqlite(sql), seq_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@pytest.fixture
+def sqlite_pool(tmp_path):
+    """Pool of SQLite connections to a database with the `funds` table, standing in for MySQL."""
+    pool = SqlitePool(tmp_path / 'funds.sqlite')
+    conn = pool.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(CREATE_TABLE_SQL)
+    for create_index_sql in CREATE_INDEXES_SQL:
+        cursor.execute(create_index_sql)
+    for create_version_sql in CREATE_VERSION_SQL:
+        cursor.execute(create_version_sql)
+    conn.commit()
+    conn.close()
+    return pool
+
+
+class AsyncSqlitePool:
+    """Stand-in for `funds_api.database.async_mysql_db.AsyncConnectionPool` handing out SQLite connections."""
+    def __init__(self, pool):
+        self._pool = pool
+
+    async def get_connection(self):
+        return AsyncSqliteConnection(self._pool.get_connection())
+
+    def release(self, conn):
+        conn.connection.close()
+
+    async def close(self):
+        pass
+
+
+class AsyncSqliteConnection:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def cursor(self, prepared=False):
+        return AsyncSqliteCursor(self.connection.cursor(prepared))
+
+    async def commit(self):
+        self.connection.commit()
+
+    async def rollback(self):
+        self.connection.rollback()
+
+
+class AsyncSqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, sql, params=()):
+        self._cursor.execute(sql, params)
+
+    async def executemany(self, sql, seq_params):
+        self._cursor.executemany(sql, seq_params)
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    async def close(self):
+        self._cursor.close()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+@pytest.fixture
+def async_sqlite_pool(sqlite_pool):
+    """Async pool of SQLite connections to the database of `sqlite_pool`, standing in for `mysql.connector.aio`."""
+    return AsyncSqlitePool(sqlite_pool)
+
+
+class FakeRedis:
+    """Stand-in for a Redis client keeping the values in a dict, expiring them after `ex` seconds."""
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.values[key]
+            return None
+
+        return value
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value, None if ex is None else time.monotonic() + ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
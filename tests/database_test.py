@@ -0,0 +1,1145 @@
+"""Test the database layer."""
+import asyncio
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import jsonschema
+import mysql.connector
+import pytest
+
+from funds_api import create_app
+from funds_api.asgi import create_asgi_app
+from funds_api.database import (
+    AsyncJsonDb,
+    JournaledJsonDb,
+    JsonDb,
+    MySqlDb,
+    async_mysql_db,
+    convert_db,
+    get_async_db,
+    get_db,
+    iter_journaled_funds,
+    json_db,
+    model,
+)
+from funds_api.database.async_mysql_db import AsyncMySqlDb
+from funds_api.database.history import POINT, HistoryStore
+from funds_api.database.json_stream import iter_json_object
+from funds_api.database.snapshot import Snapshot, is_snapshot, pack_snapshot
+from funds_api.services import services
+
+
+FUNDS = {
+    1001: {
+        "id": 1001,
+        "name": "Growth Fund",
+        "manager_name": "Alice Johnson",
+        "description": "A fund focusing on long-term growth investments.",
+        "nav": 150.25,
+        "date": "2021-05-01",
+        "performance": 12.5
+    },
+    3210: {
+        "id": 3210,
+        "name": "Income Fund",
+        "manager_name": "Bob Smith",
+        "description": "A fund aiming to provide steady income through dividends.",
+        "nav": 95.75,
+        "date": "2019-08-15",
+        "performance": 7.8
+    },
+}
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'data.json'
+    with open(path, 'w') as handler:
+        json.dump(FUNDS, handler, indent=4)
+
+    return path
+
+
+@pytest.fixture
+def app(data_file):
+    return create_app({'DATABASE_PATH': data_file})
+
+
+def test_connect(data_file):
+    """Test loading the JSON file converts the ids back to int."""
+    db = JsonDb()
+    db.connect(data_file)
+    assert sorted(db.get_all_ids()) == [1001, 3210]
+    assert db.get_fund(1001) == FUNDS[1001]
+
+
+def test_commit_is_not_stale(data_file):
+    """Test the instance own writes are not detected as an external change."""
+    db = JsonDb()
+    db.connect(data_file)
+    db.delete_fund(1001)
+    assert not db.is_stale()
+
+    other_db = JsonDb()
+    other_db.connect(data_file)
+    assert other_db.get_all_ids() == [3210]
+
+
+def test_get_db_is_shared(app):
+    """Test the database instance is loaded once and reused across requests."""
+    with app.app_context():
+        db = get_db()
+
+    with app.app_context():
+        assert get_db() is db
+
+
+def test_get_db_reloads_changed_file(app, data_file):
+    """Test the database instance is reloaded when the JSON file changes on disk."""
+    with app.app_context():
+        db = get_db()
+        assert len(db.get_all()) == 2
+
+    # Simulate another process writing the file.
+    with open(data_file, 'w') as handler:
+        json.dump({1001: FUNDS[1001]}, handler, indent=4, sort_keys=True)
+
+    with app.app_context():
+        assert get_db() is db
+        assert db.get_all_ids() == [1001]
+
+
+def test_get_range(data_file):
+    """Test range scans follow the id order through adds and deletes."""
+    db = JsonDb()
+    db.connect(data_file)
+    db.add_fund({**FUNDS[1001], 'id': 2000})
+    db.delete_fund(1001)
+
+    assert [fund['id'] for fund in db.get_range()] == [2000, 3210]
+    assert [fund['id'] for fund in db.get_range(after_id=2000)] == [3210]
+    assert db.get_range(after_id=1500, limit=1, fields=['id', 'nav']) == [{'id': 2000, 'nav': 150.25}]
+
+
+@pytest.mark.parametrize('fund_data', [
+    FUNDS[1001],
+    {**FUNDS[1001], 'id': 1001.0},
+    {**FUNDS[1001], 'id': True},
+    {**FUNDS[1001], 'nav': '150.25'},
+    {**FUNDS[1001], 'nav': 150},
+    {**FUNDS[1001], 'extra': 1},
+    {key: value for key, value in FUNDS[1001].items() if key != 'date'},
+    [FUNDS[1001]],
+])
+def test_validate_fund_matches_jsonschema(fund_data):
+    """Test the cached validator accepts and rejects the same funds with the same error as `jsonschema.validate`."""
+    try:
+        jsonschema.validate(fund_data, model.fund_schema)
+    except jsonschema.ValidationError as error:
+        with pytest.raises(jsonschema.ValidationError) as exc_info:
+            model.validate_fund(fund_data)
+        assert exc_info.value.message == error.message
+    else:
+        model.validate_fund(fund_data)
+
+
+def test_fund_is_read_only():
+    """Test a fund hands out its details as a new dict and its fields cannot be modified."""
+    fund = model.Fund(FUNDS[1001])
+    assert fund.details == FUNDS[1001]
+    assert fund.details is not fund.details
+    assert fund.performance == 12.5
+
+    with pytest.raises(AttributeError):
+        fund.performance = 1
+    with pytest.raises(AttributeError):
+        fund.other = 1
+
+
+def test_bulk_methods_share_one_write(data_file, monkeypatch):
+    """Test the bulk methods write the JSON file once."""
+    writes = []
+    atomic_write = json_db.atomic_write
+
+    def counting_atomic_write(path, text):
+        writes.append(path)
+        atomic_write(path, text)
+
+    monkeypatch.setattr(json_db, 'atomic_write', counting_atomic_write)
+    db = JsonDb()
+    db.connect(data_file)
+    db.add_funds([{**FUNDS[1001], 'id': id} for id in range(10)])
+    db.update_funds({id: {**FUNDS[1001], 'id': id, 'nav': 1} for id in range(10)})
+    db.delete_funds([1001, 3210, 42])
+
+    assert len(writes) == 3
+    assert db.get_all_ids() == list(range(10))
+    assert db.get_fund(9)['nav'] == 1
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 2 ** 16])
+def test_iter_json_object(tmp_path, chunk_size):
+    """Test the incremental reader decodes the same object as `json.load` whatever the chunk boundaries."""
+    data = {'1001': FUNDS[1001], 'numbers': [1.5e10, -0.25, 12345678901234567890], 'text': 'é "quoted" \\', 'empty': {}}
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(data, indent=4))
+    assert dict(iter_json_object(path, chunk_size)) == data
+
+
+@pytest.mark.parametrize('text', ['', '{', '{"a": 1', '{"a" 1}', '[1]', '{"a": 1,}', '{"a": 1}}', '{"a": 1.5e}'])
+def test_iter_json_object_invalid(tmp_path, text):
+    """Test the incremental reader rejects what `json.load` rejects."""
+    path = tmp_path / 'data.json'
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(iter_json_object(path, 2))
+
+
+def test_iter_journaled_funds(data_file):
+    """Test streaming a journaled database applies the log records."""
+    db = JournaledJsonDb()
+    db.connect(data_file)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    db.delete_fund(3210)
+    db.add_fund({**FUNDS[1001], 'id': 1})
+
+    assert dict(iter_journaled_funds(data_file)) == {1001: {**FUNDS[1001], 'performance': 22.5}, 1: {**FUNDS[1001], 'id': 1}}
+
+
+def test_snapshot(tmp_path):
+    """Test funds are read back from a snapshot one at a time, by range and all at once."""
+    funds = {**FUNDS, 5: {**FUNDS[1001], 'id': 5, 'name': 'Fonds Épargne', 'nav': 10, 'performance': -2 ** 63}}
+    path = tmp_path / 'data.bin'
+    path.write_bytes(pack_snapshot(funds.items()))
+
+    snapshot = Snapshot(path)
+    assert is_snapshot(path)
+    assert len(snapshot) == 3
+    assert list(snapshot.ids) == [5, 1001, 3210]
+    assert snapshot.get(5) == funds[5]
+    # Integers and floats are told apart.
+    assert [type(snapshot.get(5)[field]) for field in ['nav', 'performance']] == [int, int]
+    assert [type(snapshot.get(1001)[field]) for field in ['nav', 'performance']] == [float, float]
+    assert snapshot.get(4) is None
+    assert 3210 in snapshot and 3211 not in snapshot
+    assert snapshot.range(1, 2) == [FUNDS[1001]]
+    assert dict(snapshot.items()) == funds
+    # Equal strings are stored once.
+    assert len(pack_snapshot(funds.items())) < len(pack_snapshot([(5, funds[5])])) * 3
+
+    with pytest.raises(ValueError):
+        pack_snapshot([(1, {'id': 1, 'name': 'Fund'})])
+    with pytest.raises(ValueError):
+        pack_snapshot([(1, {**FUNDS[1001], 'id': 1, 'nav': 2 ** 63})])
+
+
+def test_snapshot_invalid_file(data_file, tmp_path):
+    """Test a file which is not a snapshot is rejected."""
+    (tmp_path / 'empty.bin').write_bytes(b'')
+    for path in [data_file, tmp_path / 'empty.bin']:
+        assert not is_snapshot(path)
+        with pytest.raises(ValueError):
+            Snapshot(path)
+
+
+def test_binary_db(data_file, tmp_path):
+    """Test a binary database serves single funds from the mapping and decodes every fund on demand."""
+    path = tmp_path / 'data.bin'
+    assert convert_db(data_file, path) == 'binary'
+    assert is_snapshot(path)
+
+    db = JsonDb(binary=True)
+    db.connect(path)
+    assert db.get_fund(1001) == FUNDS[1001]
+    assert db.exists(3210) and not db.exists(1)
+    assert db.get_range(after_id=1001) == [FUNDS[3210]]
+    assert db.get_all_ids() == [1001, 3210]
+    assert db.fund_version(3210) is not None
+    assert db._snapshot is not None
+
+    assert db.find(equals={'manager_name': 'Bob Smith'}) == [FUNDS[3210]]
+    assert db._snapshot is None
+
+    db.add_fund({**FUNDS[1001], 'id': 1})
+    db.delete_fund(3210)
+    assert is_snapshot(path)
+    other_db = JsonDb(binary=True)
+    other_db.connect(path)
+    assert other_db.get_all_ids() == [1, 1001]
+
+    assert convert_db(path, tmp_path / 'data.json') == 'json'
+    with open(tmp_path / 'data.json') as handler:
+        assert json.load(handler) == {'1': {**FUNDS[1001], 'id': 1}, '1001': FUNDS[1001]}
+
+
+def test_binary_journal(data_file, tmp_path):
+    """Test a journaled binary database replays its log and compacts into a snapshot."""
+    path = tmp_path / 'data.bin'
+    convert_db(data_file, path)
+    db = JournaledJsonDb(compact_threshold=2, binary=True)
+    db.connect(path)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    assert dict(iter_journaled_funds(path)) == {1001: {**FUNDS[1001], 'performance': 22.5}, 3210: FUNDS[3210]}
+
+    db.delete_fund(3210)
+    assert os.path.getsize(db.log_path) == 0
+    assert dict(Snapshot(path).items()) == {1001: {**FUNDS[1001], 'performance': 22.5}}
+
+
+def test_get_db_binary_format(tmp_path):
+    """Test the app creates and serves a binary database."""
+    path = tmp_path / 'data.bin'
+    app = create_app({'DATABASE_PATH': path, 'DATABASE_FORMAT': 'binary'})
+    assert is_snapshot(path)
+
+    client = app.test_client()
+    assert client.post('/funds', json=FUNDS[1001]).status_code == 201
+    assert client.get('/funds/1001').get_json() == FUNDS[1001]
+    assert dict(Snapshot(path).items()) == {1001: FUNDS[1001]}
+
+
+def test_binary_format_keeps_integers(tmp_path):
+    """Test an integer nav reads back as an integer after a restart, such that the fund keeps its tag."""
+    path = tmp_path / 'data.bin'
+    config = {'DATABASE_PATH': path, 'DATABASE_FORMAT': 'binary', 'RESPONSE_CACHE': 'none'}
+    client = create_app(config).test_client()
+    fund = {**FUNDS[1001], 'nav': 100, 'performance': 12}
+    assert client.post('/funds', json=fund).status_code == 201
+    response = client.get('/funds/1001')
+
+    restarted_response = create_app(config).test_client().get('/funds/1001')
+    assert restarted_response.get_data() == response.get_data()
+    assert restarted_response.headers['ETag'] == response.headers['ETag']
+    assert restarted_response.get_json() == fund
+
+
+def test_binary_format_rejects_unstorable_values(tmp_path):
+    """Test values a snapshot cannot hold are rejected before they are staged, such that later writes succeed."""
+    client = create_app({'DATABASE_PATH': tmp_path / 'data.bin', 'DATABASE_FORMAT': 'binary'}).test_client()
+    for fund in [{**FUNDS[1001], 'nav': 2 ** 70}, {**FUNDS[1001], 'performance': -2 ** 63 - 1},
+                 {**FUNDS[1001], 'description': '\ud800'}]:
+        assert client.post('/funds', json=fund).status_code == 400
+        assert client.get('/funds/1001').status_code == 404
+
+    assert client.post('/funds', json=FUNDS[1001]).status_code == 201
+    assert client.patch('/funds/1001', json={'performance': 2 ** 64}).status_code == 400
+    assert client.patch('/funds/1001', json={'performance': 2 ** 62}).status_code == 200
+    assert client.post('/funds', json=FUNDS[3210]).status_code == 201
+    assert dict(Snapshot(tmp_path / 'data.bin').items()) == {
+        1001: {**FUNDS[1001], 'performance': 2 ** 62}, 3210: FUNDS[3210]
+    }
+
+
+def _find_by_scan(funds, equals, ranges, sort, descending, after_id, limit):
+    funds = [
+        fund for fund in funds
+        if all(fund[field] == value for field, value in equals.items())
+        and all(
+            (low is None or fund[field] >= low) and (high is None or fund[field] <= high)
+            for field, (low, high) in ranges.items()
+        )
+    ]
+    if sort is None:
+        funds = sorted((fund for fund in funds if after_id is None or fund['id'] > after_id), key=lambda f: f['id'])
+    else:
+        funds.sort(key=lambda fund: (fund[sort], fund['id']), reverse=descending)
+
+    return [fund['id'] for fund in funds[:limit]]
+
+
+def _random_db(tmp_path):
+    """JSON database of random funds with repeated values, changed by a few writes after loading."""
+    rng = random.Random(0)
+    path = tmp_path / 'data.json'
+    with open(path, 'w') as handler:
+        json.dump({id: {
+            **FUNDS[1001],
+            'id': id,
+            'manager_name': rng.choice(['Alice Johnson', 'Bob Smith']),
+            'nav': rng.choice([100, 150.0, 200.5, rng.uniform(10, 500)]),
+            'date': f'{rng.randint(2010, 2024)}-{rng.randint(1, 12):02d}-01',
+            'performance': round(rng.uniform(-20, 40), 1),
+        } for id in range(200)}, handler)
+
+    db = JsonDb()
+    db.connect(path)
+    db.update_fund(5, {**db.get_fund(5), 'manager_name': 'Bob Smith', 'performance': 99.0})
+    db.delete_funds([7, 8])
+    db.add_fund({**db.get_fund(9), 'id': 500, 'nav': 150.0})
+    return db
+
+
+@pytest.mark.parametrize('equals, ranges, sort, descending, after_id, limit', [
+    ({}, {}, 'performance', True, None, 5),
+    ({}, {}, 'nav', False, None, None),
+    ({'manager_name': 'Bob Smith'}, {}, None, False, 10, 7),
+    ({'manager_name': 'Bob Smith'}, {'date': ('2015-01-01', '2018-12-31')}, 'performance', True, None, 3),
+    ({}, {'nav': (100, 200)}, None, False, None, None),
+    ({}, {'nav': (100, 200), 'performance': (0, None)}, 'date', False, None, 4),
+    ({'manager_name': 'Nobody'}, {}, 'nav', False, None, None),
+])
+def test_find_matches_scan(tmp_path, equals, ranges, sort, descending, after_id, limit):
+    """Test the indexed queries return what a scan of every fund returns, also after writes."""
+    db = _random_db(tmp_path)
+    expected = _find_by_scan(db.get_all(), equals, ranges, sort, descending, after_id, limit)
+    funds = db.find(equals, ranges, sort, descending, after_id, limit)
+    assert [fund['id'] for fund in funds] == expected
+
+
+def _stats_by_scan(funds, group_by):
+    groups = {}
+    for fund in funds:
+        group = {None: None, 'manager_name': fund['manager_name'], 'year': fund['date'][:4],
+                 'month': fund['date'][:7]}[group_by]
+        groups.setdefault(group, []).append(fund)
+
+    stats = []
+    for group, group_funds in sorted(groups.items()):
+        navs = sorted(fund['nav'] for fund in group_funds)
+        performances = [fund['performance'] for fund in group_funds]
+        group_stats = {
+            'count': len(group_funds),
+            'performance_mean': statistics.mean(performances),
+            'performance_median': statistics.median(performances),
+            **{f'nav_p{p}': navs[math.ceil(p * len(navs) / 100) - 1] for p in (25, 50, 75, 90)},
+        }
+        stats.append(group_stats if group_by is None else {group_by: group, **group_stats})
+
+    return stats
+
+
+@pytest.mark.parametrize('group_by', [None, 'manager_name', 'year', 'month'])
+def test_stats_matches_scan(tmp_path, sqlite_pool, group_by):
+    """Test the statistics of the columnar view and of MySQL are those computed over every fund."""
+    db = _random_db(tmp_path)
+    assert db.stats(group_by) == [pytest.approx(group) for group in _stats_by_scan(db.get_all(), group_by)]
+
+    # An update moving a fund to another group and a deletion keep the incrementally updated view exact.
+    db.update_fund(10, {**db.get_fund(10), 'manager_name': 'Carol White', 'nav': 1000.0, 'performance': -50.0})
+    db.delete_fund(11)
+    expected = [pytest.approx(group) for group in _stats_by_scan(db.get_all(), group_by)]
+    assert db.stats(group_by) == expected
+
+    mysql_db = MySqlDb(sqlite_pool)
+    mysql_db.add_funds(db.get_all())
+    assert mysql_db.stats(group_by) == expected
+
+
+@pytest.mark.parametrize('db_class', [JsonDb, JournaledJsonDb])
+def test_version(data_file, db_class):
+    """Test the collection and fund tags change on writes and are shared by instances of the same file."""
+    db, other_db = db_class(), db_class()
+    db.connect(data_file)
+    other_db.connect(data_file)
+    tag, last_modified = db.version()
+    fund_tag, _ = db.fund_version(3210)
+    assert other_db.version() == (tag, last_modified)
+    assert db.fund_version(1) is None
+
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 1.0})
+    assert db.version()[0] != tag
+    assert db.version()[1] >= last_modified
+    assert db.fund_version(3210)[0] == fund_tag
+
+    other_db.refresh()
+    assert other_db.version() == db.version()
+    assert other_db.fund_version(1001) == db.fund_version(1001)
+
+
+@pytest.mark.parametrize('db_class', [JsonDb, JournaledJsonDb])
+def test_version_last_modified_from_file(data_file, db_class):
+    """Test instances holding the same data report the same times, those of the files rather than of loading."""
+    db, other_db = db_class(), db_class()
+    db.connect(data_file)
+    other_db.connect(data_file)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 1.0})
+    time.sleep(0.01)
+    other_db.refresh()
+    late_db = db_class()
+    late_db.connect(data_file)
+
+    for instance in (other_db, late_db):
+        assert instance.version() == db.version()
+        assert instance.fund_version(1001) == db.fund_version(1001)
+    assert db.version()[1] >= os.path.getmtime(data_file)
+
+
+@pytest.mark.parametrize('db_class', [JsonDb, JournaledJsonDb])
+@pytest.mark.parametrize('write_behind_interval', [None, 60])
+def test_update_fund_if_unchanged(data_file, db_class, write_behind_interval):
+    """Test the fund is only replaced while it holds the expected data, also once another instance changed it."""
+    db, other_db = db_class(write_behind_interval=write_behind_interval), db_class()
+    db.connect(data_file)
+    other_db.connect(data_file)
+    other_db.update_fund(1001, {**FUNDS[1001], 'performance': 1.0})
+
+    assert not db.update_fund_if_unchanged(1001, FUNDS[1001], {**FUNDS[1001], 'performance': 2.0})
+    assert db.get_fund(1001) == {**FUNDS[1001], 'performance': 1.0}
+
+    db.update_fund(3210, {**FUNDS[3210], 'performance': 3.0})
+    assert db.update_fund_if_unchanged(
+        1001, {**FUNDS[1001], 'performance': 1.0}, {**FUNDS[1001], 'performance': 2.0}
+    )
+    # Persisted right away, together with the earlier writes, such that other processes compare with it.
+    other_db.refresh()
+    assert other_db.get_all() == [{**FUNDS[1001], 'performance': 2.0}, {**FUNDS[3210], 'performance': 3.0}]
+    db.close()
+
+
+def test_update_performance_if_match_concurrently(app, monkeypatch):
+    """Test only one of the concurrent updates sent with the same tag succeeds."""
+    etag = app.test_client().get('/funds/1001').headers['ETag']
+    statuses = []
+    # Every update reads the fund before any of them writes.
+    barrier = threading.Barrier(8, timeout=5)
+    with_performance = services.with_performance
+
+    def with_performance_together(fund_data, data):
+        barrier.wait()
+        return with_performance(fund_data, data)
+
+    monkeypatch.setattr(services, 'with_performance', with_performance_together)
+
+    def patch(performance):
+        response = app.test_client().patch(
+            '/funds/1001', json={'performance': performance}, headers={'If-Match': etag}
+        )
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=patch, args=(float(i),)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [200] + [412] * 7
+
+
+def test_journal_appends_instead_of_rewriting(data_file):
+    """Test mutations are written to the log and the snapshot is left untouched."""
+    db = JournaledJsonDb()
+    db.connect(data_file)
+    snapshot = data_file.read_text()
+
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    db.delete_fund(3210)
+
+    assert data_file.read_text() == snapshot
+    with open(db.log_path) as handler:
+        assert len(handler.readlines()) == 2
+
+
+def test_journal_replay_on_connect(data_file):
+    """Test connecting replays the log on top of the snapshot."""
+    db = JournaledJsonDb()
+    db.connect(data_file)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    db.delete_fund(3210)
+
+    other_db = JournaledJsonDb()
+    other_db.connect(data_file)
+    assert other_db.get_all() == [{**FUNDS[1001], 'performance': 22.5}]
+
+
+def test_journal_discards_torn_record(data_file):
+    """Test a partially written record from a crash is ignored and removed from the log."""
+    db = JournaledJsonDb()
+    db.connect(data_file)
+    db.delete_fund(3210)
+
+    with open(db.log_path, 'a') as handler:
+        handler.write('{"id":1001,"fund":{"id":10')
+
+    other_db = JournaledJsonDb()
+    other_db.connect(data_file)
+    assert other_db.get_all() == [FUNDS[1001]]
+
+    other_db.delete_fund(1001)
+    db.reload()
+    assert db.get_all() == []
+
+
+def test_journal_compaction(data_file):
+    """Test the snapshot is rewritten and the log emptied once the threshold is reached."""
+    db = JournaledJsonDb(compact_threshold=2)
+    db.connect(data_file)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    db.delete_fund(3210)
+
+    with open(db.log_path) as handler:
+        assert handler.read() == ''
+
+    other_db = JsonDb()
+    other_db.connect(data_file)
+    assert other_db.get_all() == [{**FUNDS[1001], 'performance': 22.5}]
+
+
+def test_get_db_journal_mode(data_file):
+    """Test the journaled database is selected through the app config."""
+    app = create_app({'DATABASE_PATH': data_file, 'DATABASE_JOURNAL': True})
+    with app.app_context():
+        assert isinstance(get_db(), JournaledJsonDb)
+
+
+def test_commit_failure_keeps_file(data_file, monkeypatch):
+    """Test a crash before the rename leaves the previous file content and no temporary file."""
+    db = JsonDb()
+    db.connect(data_file)
+    snapshot = data_file.read_text()
+
+    def crash(*args, **kwargs):
+        raise OSError('crash')
+
+    monkeypatch.setattr(json_db.os, 'replace', crash)
+    with pytest.raises(OSError):
+        db.delete_fund(1001)
+
+    assert data_file.read_text() == snapshot
+    assert sorted(path.name for path in data_file.parent.iterdir()) == ['data.json', 'data.json.lock']
+
+
+def test_commit_failure_discards_changes(data_file, monkeypatch):
+    """Test the changes of a failed write are rolled back in memory and not written by the next write."""
+    db = JsonDb()
+    db.connect(data_file)
+
+    def crash(*args, **kwargs):
+        raise OSError('crash')
+
+    monkeypatch.setattr(json_db.os, 'replace', crash)
+    with pytest.raises(OSError):
+        db.delete_fund(1001)
+
+    assert db.get_fund(1001) == FUNDS[1001]
+    assert db.get_all_ids() == [1001, 3210]
+    assert db.find(equals={'manager_name': 'Alice Johnson'}, fields=['id']) == [{'id': 1001}]
+    assert db.stats()[0]['count'] == 2
+
+    monkeypatch.undo()
+    db.update_fund(3210, {**FUNDS[3210], 'performance': 1.0})
+    assert json.loads(data_file.read_text()) == {'1001': FUNDS[1001], '3210': {**FUNDS[3210], 'performance': 1.0}}
+
+
+def test_group_commit_failure_raises_to_every_writer(data_file, monkeypatch):
+    """Test every writer whose changes shared a failed write gets its error."""
+    db = JsonDb(group_commit_window=0.05)
+    db.connect(data_file)
+    errors = []
+
+    def crash(*args, **kwargs):
+        raise OSError('crash')
+
+    def add_fund(id):
+        try:
+            db.add_fund({**FUNDS[1001], 'id': id})
+        except OSError as error:
+            errors.append(error)
+
+    monkeypatch.setattr(json_db.os, 'replace', crash)
+    threads = [threading.Thread(target=add_fund, args=(id,)) for id in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 4
+    assert db.get_all_ids() == [1001, 3210]
+
+
+def test_journal_append_failure_discards_changes(data_file, monkeypatch):
+    """Test the changes whose records cannot be appended are rolled back in memory."""
+    db = JournaledJsonDb()
+    db.connect(data_file)
+
+    def crash(changes):
+        raise OSError('crash')
+
+    monkeypatch.setattr(db, '_append_locked', crash)
+    with pytest.raises(OSError):
+        db.update_fund(1001, {**FUNDS[1001], 'performance': 1.0})
+
+    assert db.get_fund(1001) == FUNDS[1001]
+    monkeypatch.undo()
+    db.delete_fund(3210)
+    assert dict(iter_journaled_funds(data_file)) == {1001: FUNDS[1001]}
+
+
+def test_write_behind_failure_keeps_acknowledged_changes(data_file, monkeypatch):
+    """Test a failed write only discards the changes of the waiting writer, the buffered ones are written later."""
+    db = JsonDb(write_behind_interval=60)
+    db.connect(data_file)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+
+    def crash(*args, **kwargs):
+        raise OSError('crash')
+
+    monkeypatch.setattr(json_db.os, 'replace', crash)
+    with pytest.raises(OSError):
+        db.update_fund_if_unchanged(3210, FUNDS[3210], {**FUNDS[3210], 'performance': 1.0})
+
+    assert db.get_fund(3210) == FUNDS[3210]
+    assert db.get_fund(1001) == {**FUNDS[1001], 'performance': 22.5}
+    monkeypatch.undo()
+    db.close()
+    assert json.loads(data_file.read_text()) == {'1001': {**FUNDS[1001], 'performance': 22.5}, '3210': FUNDS[3210]}
+
+
+def _write_funds(path, journal, worker, count):
+    """Adds and then updates `count` funds through the API of an app of its own, as a worker process does."""
+    client = create_app({
+        'DATABASE_PATH': path,
+        'DATABASE_JOURNAL': journal,
+        'DATABASE_COMPACT_THRESHOLD': 7,
+        'RESPONSE_CACHE': 'none',
+    }).test_client()
+    for i in range(count):
+        id = worker * 10000 + i
+        assert client.post('/funds', json={**FUNDS[1001], 'id': id}).status_code == 201
+        assert client.patch(f'/funds/{id}', json={'performance': float(i)}).status_code == 200
+        # Reads between the writes of other processes.
+        assert client.get(f'/funds/{id}').json['performance'] == float(i)
+
+    assert client.delete(f'/funds/{worker * 10000}').status_code == 204
+
+
+@pytest.mark.parametrize('journal', [False, True])
+def test_concurrent_processes(data_file, journal):
+    """Test no write is lost when several processes write the same database at the same time."""
+    workers, count = 4, 25
+    processes = [
+        multiprocessing.Process(target=_write_funds, args=(data_file, journal, worker, count))
+        for worker in range(1, workers + 1)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * workers
+
+    db = JournaledJsonDb() if journal else JsonDb()
+    db.connect(data_file)
+    expected = {id: FUNDS[id] for id in FUNDS}
+    for worker in range(1, workers + 1):
+        for i in range(1, count):
+            expected[worker * 10000 + i] = {**FUNDS[1001], 'id': worker * 10000 + i, 'performance': float(i)}
+    assert {fund['id']: fund for fund in db.get_all()} == expected
+
+
+def test_group_commit(data_file, monkeypatch):
+    """Test concurrent writers share the file writes."""
+    writes = []
+    atomic_write = json_db.atomic_write
+
+    def counting_atomic_write(path, text):
+        writes.append(path)
+        atomic_write(path, text)
+
+    monkeypatch.setattr(json_db, 'atomic_write', counting_atomic_write)
+    db = JsonDb(group_commit_window=0.05)
+    db.connect(data_file)
+
+    threads = [
+        threading.Thread(target=db.add_fund, args=({**FUNDS[1001], 'id': id},))
+        for id in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(writes) < len(threads)
+    other_db = JsonDb()
+    other_db.connect(data_file)
+    assert len(other_db.get_all()) == 12
+
+
+@pytest.mark.parametrize('db_class', [JsonDb, JournaledJsonDb])
+def test_write_behind(data_file, db_class):
+    """Test writes are served from memory right away and persisted on close."""
+    db = db_class(write_behind_interval=60)
+    db.connect(data_file)
+    snapshot = data_file.read_text()
+
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    db.delete_fund(3210)
+
+    assert db.get_all() == [{**FUNDS[1001], 'performance': 22.5}]
+    assert data_file.read_text() == snapshot
+    assert not os.path.exists(f'{data_file}.log') or os.path.getsize(f'{data_file}.log') == 0
+
+    db.close()
+    other_db = db_class()
+    other_db.connect(data_file)
+    assert other_db.get_all() == [{**FUNDS[1001], 'performance': 22.5}]
+
+    # Writes after closing are persisted right away.
+    db.delete_fund(1001)
+    other_db.refresh()
+    assert other_db.get_all() == []
+
+
+def test_write_behind_flush_threshold(data_file):
+    """Test the background thread persists the writes once enough funds changed."""
+    db = JsonDb(write_behind_interval=60, write_behind_max_dirty=2)
+    db.connect(data_file)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 23.5})
+
+    db.update_fund(3210, {**FUNDS[3210], 'performance': 8.5})
+    deadline = time.monotonic() + 5
+    while json.loads(data_file.read_text())['3210']['performance'] != 8.5:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    assert json.loads(data_file.read_text())['1001']['performance'] == 23.5
+    db.close()
+
+
+def test_write_behind_failure_refuses_buffered_writes(data_file, monkeypatch):
+    """Test writes are persisted synchronously and fail while the background flush fails, instead of piling up."""
+    db = JsonDb(write_behind_interval=0.01)
+    db.connect(data_file)
+
+    def crash(*args, **kwargs):
+        raise OSError('crash')
+
+    monkeypatch.setattr(json_db.os, 'replace', crash)
+    monkeypatch.setattr(traceback, 'print_exc', lambda: None)
+    db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    deadline = time.monotonic() + 5
+    while db._write_behind.error is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    with pytest.raises(OSError):
+        db.update_fund(3210, {**FUNDS[3210], 'performance': 1.0})
+    assert db.get_fund(3210) == FUNDS[3210]
+    assert db.get_fund(1001) == {**FUNDS[1001], 'performance': 22.5}
+
+    monkeypatch.undo()
+    db.update_fund(3210, {**FUNDS[3210], 'performance': 1.0})
+    db.close()
+    assert json.loads(data_file.read_text()) == {
+        '1001': {**FUNDS[1001], 'performance': 22.5}, '3210': {**FUNDS[3210], 'performance': 1.0}
+    }
+
+
+def test_write_behind_journal_coalesces(data_file):
+    """Test repeated writes of a fund are appended to the log as a single record."""
+    db = JournaledJsonDb(write_behind_interval=60)
+    db.connect(data_file)
+    for performance in range(10):
+        db.update_fund(1001, {**FUNDS[1001], 'performance': performance})
+
+    db.flush()
+    with open(db.log_path) as handler:
+        assert [json.loads(line) for line in handler] == [{'id': 1001, 'fund': {**FUNDS[1001], 'performance': 9}}]
+
+    db.close()
+
+
+def test_get_db_write_behind(data_file):
+    """Test the write behind mode is enabled through the app config."""
+    app = create_app({'DATABASE_PATH': data_file, 'DATABASE_WRITE_BEHIND_INTERVAL': 60})
+    with app.app_context():
+        db = get_db()
+        db.delete_fund(3210)
+        assert '3210' in json.loads(data_file.read_text())
+        db.close()
+
+    assert '3210' not in json.loads(data_file.read_text())
+
+
+@pytest.fixture
+def mysql_db(sqlite_pool):
+    db = MySqlDb(sqlite_pool)
+    for fund in FUNDS.values():
+        db.add_fund(fund)
+
+    return db
+
+
+def test_mysql_crud(mysql_db):
+    """Test the MySQL database reads and writes through the pooled connections."""
+    assert mysql_db.get_all() == list(FUNDS.values())
+    assert sorted(mysql_db.get_all_ids()) == [1001, 3210]
+    assert mysql_db.exists(1001)
+    assert not mysql_db.exists(1)
+
+    mysql_db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    assert mysql_db.get_fund(1001) == {**FUNDS[1001], 'performance': 22.5}
+
+    assert mysql_db.get_range(after_id=1001, limit=1, fields=['id', 'nav']) == [{'id': 3210, 'nav': 95.75}]
+
+    assert mysql_db.find(equals={'manager_name': 'Bob Smith'}, fields=['id']) == [{'id': 3210}]
+    assert [fund['id'] for fund in mysql_db.find(sort='nav', descending=True, limit=1)] == [1001]
+    assert [fund['id'] for fund in mysql_db.find(ranges={'date': (None, '2020-01-01')})] == [3210]
+
+    mysql_db.add_funds([{**FUNDS[1001], 'id': 1}, {**FUNDS[1001], 'id': 2}])
+    mysql_db.update_funds({1: {**FUNDS[1001], 'id': 1, 'nav': 1.0}})
+    assert mysql_db.get_fund(1)['nav'] == 1.0
+    mysql_db.delete_funds([1, 2])
+
+    mysql_db.delete_fund(3210)
+    assert mysql_db.get_fund(3210) is None
+    assert mysql_db.get_all_ids() == [1001]
+
+
+def test_mysql_version(mysql_db):
+    """Test the MySQL version is bumped by every change of the table."""
+    tag, last_modified = mysql_db.version()
+    fund_tag, _ = mysql_db.fund_version(1001)
+    assert last_modified is not None
+
+    mysql_db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+    assert mysql_db.version()[0] != tag
+    assert mysql_db.fund_version(1001)[0] != fund_tag
+
+    tag = mysql_db.version()[0]
+    mysql_db.delete_fund(3210)
+    assert mysql_db.version()[0] != tag
+    assert mysql_db.fund_version(3210) is None
+
+
+def test_mysql_update_fund_if_unchanged(mysql_db):
+    """Test the MySQL row is only updated while every column holds the expected value."""
+    fund = {**FUNDS[1001], 'description': None}
+    mysql_db.update_fund(1001, fund)
+
+    assert not mysql_db.update_fund_if_unchanged(1001, FUNDS[1001], {**fund, 'performance': 2.0})
+    assert mysql_db.get_fund(1001) == fund
+    assert mysql_db.update_fund_if_unchanged(1001, fund, {**fund, 'performance': 2.0})
+    assert mysql_db.get_fund(1001) == {**fund, 'performance': 2.0}
+
+    assert mysql_db.update_fund_if_unchanged(3210, FUNDS[3210], FUNDS[3210])
+    assert not mysql_db.update_fund_if_unchanged(3210, fund, fund)
+    assert not mysql_db.update_fund_if_unchanged(1, fund, fund)
+
+
+def test_mysql_rollback_on_error(mysql_db):
+    """Test a failing statement does not leave a partial change behind."""
+    with pytest.raises(mysql.connector.IntegrityError):
+        mysql_db.add_fund(FUNDS[1001])
+
+    assert len(mysql_db.get_all()) == 2
+
+
+def test_get_db_mysql_backend(data_file, monkeypatch):
+    """Test the MySQL database is selected through the app config."""
+    configs = []
+
+    def from_config(**config):
+        configs.append(config)
+        return MySqlDb(None)
+
+    monkeypatch.setattr(MySqlDb, 'from_config', from_config)
+    app = create_app({'DATABASE_PATH': data_file, 'DATABASE_BACKEND': 'mysql', 'MYSQL_POOL_SIZE': 8})
+    with app.app_context():
+        assert isinstance(get_db(), MySqlDb)
+
+    assert configs[0]['pool_size'] == 8
+
+
+def test_async_json_db(data_file):
+    """Test the async JSON database serves the wrapped instance from worker threads."""
+    db = JsonDb()
+    db.connect(data_file)
+    async_db = AsyncJsonDb(db)
+
+    async def check():
+        assert await async_db.get_all() == list(FUNDS.values())
+        assert await async_db.exists(1001)
+        assert await async_db.find(equals={'manager_name': 'Bob Smith'}, fields=['id']) == [{'id': 3210}]
+        assert await async_db.stats('year') == db.stats('year')
+
+        await async_db.update_fund(1001, {**FUNDS[1001], 'performance': 22.5})
+        await async_db.delete_funds([3210])
+        assert await async_db.fund_version(1001) == db.fund_version(1001)
+
+    asyncio.run(check())
+
+    other_db = JsonDb()
+    other_db.connect(data_file)
+    assert other_db.get_all() == [{**FUNDS[1001], 'performance': 22.5}]
+
+
+def test_async_mysql_crud(async_sqlite_pool, mysql_db):
+    """Test the async MySQL database runs the same statements as the synchronous one."""
+    db = AsyncMySqlDb(async_sqlite_pool)
+
+    async def check():
+        assert await db.get_all() == list(FUNDS.values())
+        assert sorted(await db.get_all_ids()) == [1001, 3210]
+        assert await db.exists(1001)
+        assert not await db.exists(1)
+        assert await db.get_range(after_id=1001, limit=1, fields=['id', 'nav']) == [{'id': 3210, 'nav': 95.75}]
+        assert await db.find(ranges={'date': (None, '2020-01-01')}, fields=['id']) == [{'id': 3210}]
+        assert await db.stats('manager_name') == mysql_db.stats('manager_name')
+
+        tag, _ = await db.version()
+        await db.add_funds([{**FUNDS[1001], 'id': 1}])
+        await db.update_fund(1, {**FUNDS[1001], 'id': 1, 'nav': 1.0})
+        assert (await db.get_fund(1))['nav'] == 1.0
+        assert (await db.version())[0] != tag
+        assert (await db.fund_version(1))[0] == mysql_db.fund_version(1)[0]
+        assert not await db.update_fund_if_unchanged(1, FUNDS[1001], {**FUNDS[1001], 'id': 1})
+        assert await db.update_fund_if_unchanged(1, await db.get_fund(1), {**FUNDS[1001], 'id': 1, 'nav': 2.0})
+
+        await db.delete_fund(3210)
+        with pytest.raises(mysql.connector.IntegrityError):
+            await db.add_fund(FUNDS[1001])
+
+    asyncio.run(check())
+    assert mysql_db.get_all_ids() == [1, 1001]
+    assert mysql_db.get_fund(1)['nav'] == 2.0
+
+
+def test_async_connection_pool(monkeypatch):
+    """Test the async pool reuses released connections and never opens more than its size."""
+    class Connection:
+        async def is_connected(self):
+            return True
+
+    opened = []
+
+    async def connect(**config):
+        opened.append(config)
+        return Connection()
+
+    monkeypatch.setattr(async_mysql_db.aio, 'connect', connect)
+    pool = async_mysql_db.AsyncConnectionPool(pool_size=2, user='funds')
+
+    async def borrow():
+        conn = await pool.get_connection()
+        await asyncio.sleep(0.01)
+        pool.release(conn)
+
+    async def check():
+        await asyncio.gather(*(borrow() for _ in range(6)))
+        await borrow()
+
+    asyncio.run(check())
+    assert opened == [{'user': 'funds'}] * 2
+
+
+def test_get_async_db(data_file):
+    """Test the ASGI app shares one async database instance across requests."""
+    app = create_asgi_app({'DATABASE_PATH': data_file})
+
+    async def check():
+        async with app.app_context():
+            db = await get_async_db()
+            assert isinstance(db, AsyncJsonDb)
+            assert await get_async_db() is db
+
+    asyncio.run(check())
+
+
+def test_wsgi_app_without_async_dependencies(data_file):
+    """Test the WSGI app and its commands import neither Quart nor the async MySQL connector."""
+    code = (
+        'import sys; from funds_api import create_app; '
+        f'create_app({{"DATABASE_PATH": {str(data_file)!r}}}).test_client().get("/funds/1001"); '
+        'print(sorted(name for name in sys.modules if name.startswith(("quart", "mysql.connector.aio"))))'
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout == '[]\n'
+
+
+# 2021-01-01T00:00:00+00:00
+JAN_1 = 1609459200.0
+DAY = 86400
+
+
+def _record(store, id, written_at, nav, performance=1.0):
+    store.record([{'id': id, 'nav': nav, 'performance': performance}], written_at)
+
+
+def _point(written_at, nav, performance=1.0):
+    time = datetime.datetime.fromtimestamp(written_at, datetime.timezone.utc).isoformat()
+    return {'time': time, 'nav': nav, 'performance': performance}
+
+
+def test_history_store(tmp_path):
+    """Test the history keeps every write in time order and serves ranges of days."""
+    store = HistoryStore(tmp_path / 'history')
+    _record(store, 1, JAN_1 + DAY, 2.0)
+    _record(store, 2, JAN_1, 5.0)
+    _record(store, 1, JAN_1, 1.0)
+    _record(store, 1, JAN_1 + 3 * DAY, 4.0)
+    assert store.get(1) == [_point(JAN_1, 1.0), _point(JAN_1 + DAY, 2.0), _point(JAN_1 + 3 * DAY, 4.0)]
+
+    # Writes of the same day are all kept, the cached history catches up with the appended records.
+    _record(store, 1, JAN_1 + DAY + 60, 3.0, 9.0)
+    assert store.get(1, date_from='2021-01-02', date_to='2021-01-03') == [
+        _point(JAN_1 + DAY, 2.0), _point(JAN_1 + DAY + 60, 3.0, 9.0)
+    ]
+    assert store.get(1, date_from='2021-01-05') == []
+    assert store.get(2) == [_point(JAN_1, 5.0)]
+    assert store.get(3) == []
+
+    store.remove([1])
+    assert store.get(1) == []
+    _record(store, 1, JAN_1 + 365 * DAY, 7.0)
+    assert store.get(1) == [_point(JAN_1 + 365 * DAY, 7.0)]
+
+
+def test_history_downsampling(tmp_path):
+    """Test a range of more points than requested returns the last point of each period."""
+    store = HistoryStore(tmp_path / 'history')
+    for day in range(10):
+        _record(store, 1, JAN_1 + day * DAY, float(day + 1))
+
+    assert [point['nav'] for point in store.get(1, max_points=3)] == [3.0, 6.0, 10.0]
+    assert [point['nav'] for point in store.get(1, date_from='2021-01-05', max_points=2)] == [7.0, 10.0]
+    assert len(store.get(1, max_points=20)) == 10
+
+
+def test_history_shared_by_processes(tmp_path):
+    """Test a store sees the points recorded by another one and ignores a partially appended record."""
+    store = HistoryStore(tmp_path / 'history')
+    other_store = HistoryStore(tmp_path / 'history')
+    _record(store, 1, JAN_1, 1.0)
+    assert other_store.get(1) == [_point(JAN_1, 1.0)]
+
+    record = POINT.pack(JAN_1 + DAY, 2.0, 1.0)
+    with open(tmp_path / 'history' / '1.bin', 'ab') as handler:
+        handler.write(record[:5])
+    assert len(other_store.get(1)) == 1
+
+    with open(tmp_path / 'history' / '1.bin', 'ab') as handler:
+        handler.write(record[5:])
+    assert len(other_store.get(1)) == 2
+
+
+def test_get_db_history(data_file):
+    """Test the database of the app records its history next to the JSON file once enabled."""
+    app = create_app({'DATABASE_PATH': data_file})
+    with app.app_context():
+        assert get_db().history is None
+
+    app = create_app({'DATABASE_PATH': data_file, 'DATABASE_HISTORY': True})
+    with app.app_context():
+        assert isinstance(get_db().history, HistoryStore)
+    assert (data_file.parent / 'data.json.history').is_dir()
+
+
+def test_history_of_fund_with_any_date(data_file):
+    """Test a fund whose date is not formatted yyyy-mm-dd is added, updated and recorded by the app."""
+    client = create_app({'DATABASE_PATH': data_file, 'DATABASE_HISTORY': True}).test_client()
+    response = client.post('/funds', json={**FUNDS[1001], 'id': 1, 'date': '2021/05/01'})
+    assert response.status_code == 201
+    assert client.patch('/funds/1', json={'performance': 2.0}).status_code == 200
+
+    points = client.get('/funds/1/history').json
+    assert [point['performance'] for point in points] == [12.5, 2.0]
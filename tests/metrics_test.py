@@ -0,0 +1,127 @@
+"""Test the instrumentation."""
+import json
+import os
+
+import pytest
+
+from funds_api import create_app
+from funds_api.database import JsonDb, json_db
+from funds_api.metrics import HistogramFamily, Metrics, instrument_db, start_timings, stop_timings, timed
+
+
+FUND = {
+    "id": 1001,
+    "name": "Growth Fund",
+    "manager_name": "Alice Johnson",
+    "description": "A fund focusing on long-term growth investments.",
+    "nav": 150.25,
+    "date": "2021-05-01",
+    "performance": 12.5
+}
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'data.json'
+    with open(path, 'w') as handler:
+        json.dump({FUND['id']: FUND}, handler, indent=4)
+
+    return path
+
+
+def test_histogram_render():
+    """Test histograms are rendered with cumulative buckets in the Prometheus text format."""
+    family = HistogramFamily('request_seconds', 'Duration.', ('endpoint',), bounds=(0.1, 1))
+    for value in [0.05, 0.1, 0.5, 2]:
+        family.labels('a"b').observe(value)
+
+    assert family.render() == [
+        '# HELP request_seconds Duration.',
+        '# TYPE request_seconds histogram',
+        'request_seconds_bucket{endpoint="a\\"b",le="0.1"} 2',
+        'request_seconds_bucket{endpoint="a\\"b",le="1.0"} 3',
+        'request_seconds_bucket{endpoint="a\\"b",le="+Inf"} 4',
+        'request_seconds_sum{endpoint="a\\"b"} 2.65',
+        'request_seconds_count{endpoint="a\\"b"} 4',
+    ]
+
+
+def test_timed_stages():
+    """Test a stage called by another stage is part of the outer one, and nothing is timed outside a request."""
+    inner = timed('inner')(lambda: 1)
+    outer = timed('outer')(lambda: inner() + 1)
+    assert outer() == 2
+    assert stop_timings() is None
+
+    timings = start_timings()
+    outer()
+    inner()
+    assert stop_timings() is timings
+    assert set(timings.seconds) == {'outer', 'inner'}
+    assert not timings.running
+
+
+def test_instrument_db(data_file):
+    """Test every call of an instrumented database is recorded while the instance keeps its class."""
+    metrics = Metrics()
+    db = instrument_db(JsonDb(), metrics.db_methods, ['get_fund', 'fund_version'])
+    db.connect(data_file)
+    assert isinstance(db, JsonDb)
+
+    timings = start_timings()
+    assert db.get_fund(1001) == FUND
+    db.fund_version(1001)
+    stop_timings()
+
+    assert metrics.db_methods.labels('JsonDb', 'get_fund').snapshot()[0][-1] == 2
+    assert metrics.db_methods.labels('JsonDb', 'fund_version').snapshot()[0][-1] == 1
+    assert list(timings.seconds) == ['db']
+
+
+def test_metrics_endpoint(data_file):
+    """Test the requests, their stages and the database calls are exposed."""
+    client = create_app({'DATABASE_PATH': data_file}).test_client()
+    client.patch('/funds/1001', json={'performance': 1.5})
+    client.get('/funds/1001')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    lines = response.get_data(as_text=True).splitlines()
+    assert 'funds_request_duration_seconds_count{endpoint="funds.get_fund",method="GET"} 1' in lines
+    for stage in ['get_db', 'parse', 'validate', 'db', 'serialize']:
+        assert f'funds_request_stage_seconds_count{{endpoint="funds.update_performance",stage="{stage}"}} 1' in lines
+    assert 'funds_db_method_seconds_count{backend="JsonDb",method="update_fund"} 1' in lines
+
+
+def test_metrics_disabled(data_file):
+    """Test the endpoint is not found and the database is not instrumented when the metrics are disabled."""
+    app = create_app({'DATABASE_PATH': data_file, 'METRICS': False})
+    client = app.test_client()
+    assert client.get('/funds/1001').status_code == 200
+    assert client.get('/metrics').status_code == 404
+    assert 'get_fund' not in vars(app.extensions['funds_db'])
+
+
+def test_slow_request_profile(data_file, tmp_path):
+    """Test the sampled profile of a request slower than the threshold is written in the collapsed stack format."""
+    directory = tmp_path / 'profiles'
+    client = create_app({
+        'DATABASE_PATH': data_file,
+        # Makes the write wait long enough to be sampled.
+        'DATABASE_GROUP_COMMIT_WINDOW': 0.05,
+        'PROFILER_THRESHOLD': 0.01,
+        'PROFILER_INTERVAL': 0.001,
+        'PROFILER_DIRECTORY': directory,
+    }).test_client()
+    client.get('/funds/1001')
+    client.patch('/funds/1001', json={'performance': 1.5})
+
+    [name] = os.listdir(directory)
+    assert '-PATCH-funds.update_performance-' in name
+    with open(directory / name) as handler:
+        stack, count = handler.readline().rsplit(' ', 1)
+    assert int(count) > 0
+    assert 'update_performance' in stack
+    # The write sleeping through the group commit window.
+    assert stack.endswith(f'_sync ({json_db.__file__}:{JsonDb._sync.__code__.co_firstlineno})')
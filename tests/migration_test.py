@@ -0,0 +1,150 @@
+"""Test the JSON to MySQL data migration."""
+import importlib
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from funds_api.database import MySqlDb
+from funds_api.scripts.data_migration import Checkpoint, _validate_data, main, migrate, validate_batch
+
+
+FUND = {
+    "id": 1001,
+    "name": "Growth Fund",
+    "manager_name": "Alice Johnson",
+    "description": "A fund focusing on long-term growth investments.",
+    "nav": 150.25,
+    "date": "2021-05-01",
+    "performance": 12.5
+}
+
+
+def _funds(count):
+    return [{**FUND, 'id': id} for id in range(count)]
+
+
+def test_migrate_in_chunks(sqlite_pool):
+    """Test every valid fund is inserted and invalid funds are skipped."""
+    funds = _funds(10)
+    funds[3]['date'] = '01/05/2021'
+
+    result = migrate(sqlite_pool.get_connection(), funds, chunk_size=4)
+    assert (result.inserted, result.skipped) == (9, 1)
+    assert MySqlDb(sqlite_pool).get_all_ids() == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+
+
+def test_migrate_upserts_existing_ids(sqlite_pool):
+    """Test migrating again updates the existing rows."""
+    migrate(sqlite_pool.get_connection(), _funds(3))
+
+    funds = _funds(5)
+    funds[0]['nav'] = 1.0
+    result = migrate(sqlite_pool.get_connection(), funds, chunk_size=10)
+    assert (result.inserted, result.skipped) == (5, 0)
+    assert MySqlDb(sqlite_pool).get_fund(0)['nav'] == 1.0
+
+
+def test_migrate_incremental(sqlite_pool, tmp_path):
+    """Test a run with a checkpoint only sends the changed funds and deletes the removed ones."""
+    checkpoint = Checkpoint(tmp_path / 'data.json.migration')
+    migrate(sqlite_pool.get_connection(), _funds(10), chunk_size=3, checkpoint=checkpoint)
+
+    funds = _funds(10)[1:]
+    funds[4]['performance'] = 1.0
+    checkpoint = Checkpoint(tmp_path / 'data.json.migration')
+    checkpoint.load()
+    result = migrate(sqlite_pool.get_connection(), funds, chunk_size=3, checkpoint=checkpoint)
+
+    assert (result.inserted, result.unchanged, result.deleted) == (1, 8, 1)
+    db = MySqlDb(sqlite_pool)
+    assert db.get_all_ids() == list(range(1, 10))
+    assert db.get_fund(5)['performance'] == 1.0
+
+
+def test_migrate_resumes_after_failure(sqlite_pool, tmp_path):
+    """Test a failed run does not send the committed chunks again."""
+    funds = _funds(10)
+    conn = sqlite_pool.get_connection()
+    checkpoint = Checkpoint(tmp_path / 'data.json.migration')
+
+    def failing_funds():
+        yield from funds[:6]
+        raise OSError('crash')
+
+    with pytest.raises(OSError):
+        migrate(conn, failing_funds(), chunk_size=3, checkpoint=checkpoint)
+
+    checkpoint = Checkpoint(tmp_path / 'data.json.migration')
+    checkpoint.load()
+    assert sorted(checkpoint.digests) == list(range(6))
+
+    result = migrate(sqlite_pool.get_connection(), funds, chunk_size=3, checkpoint=checkpoint)
+    assert (result.inserted, result.unchanged) == (4, 6)
+    assert MySqlDb(sqlite_pool).get_all_ids() == list(range(10))
+
+    checkpoint.load()
+    assert len(checkpoint.digests) == 10
+
+
+def test_migrate_with_workers(sqlite_pool):
+    """Test validating in worker processes keeps the order of the funds."""
+    result = migrate(sqlite_pool.get_connection(), _funds(50), chunk_size=7, workers=2)
+    assert result.inserted == 50
+    assert MySqlDb(sqlite_pool).get_all_ids() == list(range(50))
+
+
+def test_migrate_dry_run():
+    """Test a dry run validates the funds without a connection."""
+    result = migrate(None, _funds(5) + [{'id': 'x'}], dry_run=True)
+    assert (result.inserted, result.skipped) == (5, 1)
+
+
+def test_dry_run_command_without_credentials(tmp_path, monkeypatch):
+    """Test the credentials are only required to connect."""
+    data_file = tmp_path / 'data.json'
+    data_file.write_text(json.dumps({str(fund['id']): fund for fund in _funds(3)}))
+    # The package exports the command under the name of the module.
+    monkeypatch.setattr(importlib.import_module('funds_api.scripts.data_migration'), 'DATA_FILE', data_file)
+
+    result = CliRunner().invoke(main, ['--dry-run'])
+    assert result.exit_code == 0
+    assert result.output.startswith('Validated 3 records')
+
+    result = CliRunner().invoke(main, ['--user', 'funds'])
+    assert result.exit_code == 2
+    assert '--user and --password are required' in result.output
+
+
+def test_validate_batch_matches_per_fund_validation():
+    """Test the columnar validation accepts exactly the funds the per fund validation accepts."""
+    funds = [
+        FUND,
+        {**FUND, 'id': True},
+        {**FUND, 'id': 1.0},
+        {**FUND, 'name': 'x' * 256},
+        {**FUND, 'nav': '1'},
+        {**FUND, 'date': '2021-5-1'},
+        {**FUND, 'date': '2020-02-29'},
+        {**FUND, 'date': '2021-02-29'},
+        {**FUND, 'date': '0000-01-01'},
+        {**FUND, 'date': '2021/05/01'},
+        {**FUND, 'date': '2021-01-01\n2021-01-02'},
+        {**FUND, 'extra': 1},
+    ]
+
+    def accepted(fund):
+        try:
+            _validate_data(fund)
+        except ValueError:
+            return False
+        return True
+
+    expected = [accepted(fund) for fund in funds]
+    assert validate_batch(funds) == expected
+    assert expected == [True, True, False, False, False, True, True, False, False, False, False, False]
+    # Every date of the chunk is well formed, hence they are matched at once.
+    assert validate_batch([FUND, {**FUND, 'date': '2020-02-29'}]) == [True, True]
+    assert validate_batch([FUND, {**FUND, 'date': '2021-02-29'}]) == [True, False]
+    assert validate_batch([{**FUND, 'date': '2021-01-01\n2021-01-02'}]) == [False]
+    assert migrate(None, [{**FUND, 'date': '2021-01-01\n2021-01-02'}], dry_run=True).skipped == 1
@@ -1,10 +1,17 @@
 """Test the service layer."""
+import asyncio
+
 import pytest
 
-from funds_api.services import exceptions, services
+from funds_api.services import async_services, exceptions, services
+from funds_api.database.base import fund_tag
+from funds_api.database.columns import GROUP_KEYS, group_stats
+from funds_api.database.history import HistoryStore
 
 
 class FakeDb:
+    history = None
+
     def __init__(self):
         self._data = {
             1001: {
@@ -27,18 +34,86 @@ class FakeDb:
             },
         }
 
+    def version(self):
+        return fund_tag(self._data), None
+
+    def fund_version(self, id):
+        fund = self._data.get(id)
+        return None if fund is None else (fund_tag(fund), None)
+
     def get_all_ids(self):
         return list(self._data.keys())
 
+    def exists(self, id):
+        return id in self._data
+
     def get_all(self):
         return list(self._data.values())
 
+    def get_range(self, after_id=None, limit=None, fields=None):
+        funds = [self._data[id] for id in sorted(self._data) if after_id is None or id > after_id][:limit]
+        if fields is None:
+            return funds
+
+        return [{field: fund[field] for field in fields} for fund in funds]
+
+    def find(self, equals=None, ranges=None, sort=None, descending=False, after_id=None, limit=None, fields=None):
+        funds = [
+            fund for fund in self._data.values()
+            if all(fund[field] == value for field, value in (equals or {}).items())
+            and all(
+                (low is None or fund[field] >= low) and (high is None or fund[field] <= high)
+                for field, (low, high) in (ranges or {}).items()
+            )
+        ]
+        if sort is None:
+            funds = sorted(
+                (fund for fund in funds if after_id is None or fund['id'] > after_id), key=lambda fund: fund['id']
+            )
+        else:
+            funds.sort(key=lambda fund: (fund[sort], fund['id']), reverse=descending)
+
+        funds = funds[:limit]
+        if fields is None:
+            return funds
+
+        return [{field: fund[field] for field in fields} for fund in funds]
+
+    def stats(self, group_by=None):
+        groups = {}
+        for fund in self._data.values():
+            groups.setdefault(GROUP_KEYS[group_by](fund), []).append(fund)
+
+        return [
+            {**({} if group_by is None else {group_by: group}),
+             **group_stats([fund['nav'] for fund in funds], [fund['performance'] for fund in funds])}
+            for group, funds in sorted(groups.items())
+        ]
+
     def add_fund(self, fund_data):
         self._data[fund_data['id']] = fund_data
 
     def update_fund(self, id, data):
         self._data[id] = data
 
+    def update_fund_if_unchanged(self, id, expected, data):
+        if self._data.get(id) != expected:
+            return False
+
+        self._data[id] = data
+        return True
+
+    def add_funds(self, funds):
+        for fund_data in funds:
+            self.add_fund(fund_data)
+
+    def update_funds(self, data_by_id):
+        self._data.update(data_by_id)
+
+    def delete_funds(self, ids):
+        for id in ids:
+            self._data.pop(id, None)
+
     def get_fund(self, id):
         return self._data.get(id)
 
@@ -50,6 +125,26 @@ class FakeDb:
         del self._data[id]
 
 
+class AsyncFakeDb:
+    """Async interface of a `FakeDb`, every method is a coroutine."""
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def history(self):
+        return self.db.history
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+
+        async def call(*args, **kwargs):
+            # Lets the other coroutines run, as a database round trip would.
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+
+        return call
+
+
 def test_add_fund():
     """Test adding a fund."""
     db = FakeDb()
@@ -270,3 +365,274 @@ def test_combined_services():
     # Test get fund after deleting fund.
     with pytest.raises(exceptions.NotFoundError):
         services.get_fund(db, 412)
+
+
+def test_batch_services():
+    """Test adding, updating and deleting funds in batches."""
+    db = FakeDb()
+    new_funds = [{**db.get_fund(1001), 'id': id} for id in (1, 2)]
+
+    assert services.add_funds(db, new_funds) == [1, 2]
+    assert services.update_performances(db, [{'id': 1, 'performance': 1.5}, {'id': 2, 'performance': 2.5}]) == [
+        {**new_funds[0], 'performance': 1.5},
+        {**new_funds[1], 'performance': 2.5},
+    ]
+    assert db.get_fund(2)['performance'] == 2.5
+
+    services.delete_funds(db, [1, 2])
+    assert sorted(db.get_all_ids()) == [1001, 3210]
+
+
+def test_batch_services_invalid_items():
+    """Test a batch with invalid items reports every invalid item and applies nothing."""
+    db = FakeDb()
+    items = [{**db.get_fund(1001), 'id': 1}, {**db.get_fund(1001), 'id': 1}, {'id': 2}, db.get_fund(3210)]
+
+    with pytest.raises(exceptions.BatchError) as exc_info:
+        services.add_funds(db, items)
+    assert [error['index'] for error in exc_info.value.errors] == [1, 2, 3]
+    assert not db.exists(1)
+
+    with pytest.raises(exceptions.BatchError) as exc_info:
+        services.update_performances(db, [{'id': 1001, 'performance': 1.5}, {'id': 1, 'performance': 1.5}, 'x'])
+    assert [error['index'] for error in exc_info.value.errors] == [1, 2]
+    assert db.get_fund(1001)['performance'] == 12.5
+
+    with pytest.raises(exceptions.BatchError) as exc_info:
+        services.delete_funds(db, [1001, 1, '3210'])
+    assert [error['index'] for error in exc_info.value.errors] == [1, 2]
+    assert db.exists(1001)
+
+    with pytest.raises(exceptions.InvalidInputError):
+        services.delete_funds(db, [])
+
+
+def test_update_performance_invalid_data_keeps_stored_fund():
+    """Test a rejected update does not modify the stored fund."""
+    db = FakeDb()
+
+    with pytest.raises(exceptions.InvalidInputError):
+        services.update_performance(db, 3210, {'performance': '1.2345'})
+
+    assert db._data[3210]['performance'] == 7.8
+
+
+def test_get_funds_page():
+    """Test listing funds with a limit and a cursor."""
+    db = FakeDb()
+    assert [fund['id'] for fund in services.get_funds(db, {})] == [1001, 3210]
+    assert [fund['id'] for fund in services.get_funds(db, {'limit': '1'})] == [1001]
+    assert [fund['id'] for fund in services.get_funds(db, {'limit': '1', 'after_id': '1001'})] == [3210]
+    assert services.get_funds(db, {'after_id': '3210'}) == []
+
+
+def test_get_funds_fields():
+    """Test the projection always keeps the id."""
+    db = FakeDb()
+    assert services.get_funds(db, {'fields': 'name,nav'})[0] == {'id': 1001, 'name': 'Growth Fund', 'nav': 150.25}
+
+
+@pytest.mark.parametrize('args', [{'limit': '0'}, {'limit': 'ten'}, {'after_id': '1.5'}, {'fields': 'name,secret'}])
+def test_get_funds_invalid_input(args):
+    """Test listing funds with invalid query parameters."""
+    db = FakeDb()
+    with pytest.raises(exceptions.InvalidInputError):
+        services.get_funds(db, args)
+
+
+def test_iter_funds_batches():
+    """Test the iterator reads the funds in batches and honours the limit."""
+    db = FakeDb()
+    db.add_fund({**db.get_fund(1001), 'id': 2000})
+    assert [fund['id'] for fund in services.iter_funds(db, {}, batch_size=1)] == [1001, 2000, 3210]
+    assert [fund['id'] for fund in services.iter_funds(db, {'limit': '2'}, batch_size=1)] == [1001, 2000]
+    assert [fund['id'] for fund in services.iter_funds(db, {'after_id': '1001'}, batch_size=2)] == [2000, 3210]
+
+
+def test_iter_funds_invalid_input():
+    """Test invalid arguments are rejected before iterating."""
+    db = FakeDb()
+    with pytest.raises(exceptions.InvalidInputError):
+        services.iter_funds(db, {'limit': '0'})
+
+
+def test_get_funds_filters_and_sort():
+    """Test listing funds with filters and a sort order."""
+    db = FakeDb()
+    assert [fund['id'] for fund in services.get_funds(db, {'manager_name': 'Bob Smith'})] == [3210]
+    assert [fund['id'] for fund in services.get_funds(db, {'date_from': '2020-01-01'})] == [1001]
+    assert [fund['id'] for fund in services.get_funds(db, {'nav_max': '100'})] == [3210]
+    assert [fund['id'] for fund in services.get_funds(db, {'sort': 'performance'})] == [3210, 1001]
+    assert [fund['id'] for fund in services.get_funds(db, {'sort': '-performance', 'limit': '1'})] == [1001]
+
+
+@pytest.mark.parametrize('args', [
+    {'date_from': '2020/01/01'},
+    {'nav_min': 'high'},
+    {'nav_min': 'nan'},
+    {'performance_max': 'inf'},
+    {'performance_min': '-Infinity'},
+    {'sort': 'name'},
+    {'sort': 'nav', 'after_id': '1001'},
+])
+def test_get_funds_invalid_filters(args):
+    """Test listing funds with invalid filters."""
+    db = FakeDb()
+    with pytest.raises(exceptions.InvalidInputError):
+        services.get_funds(db, args)
+
+
+def test_get_stats():
+    """Test the statistics of every fund and per manager."""
+    db = FakeDb()
+    stats = services.get_stats(db, {})
+    assert len(stats) == 1
+    assert stats[0]['count'] == 2
+    assert stats[0]['performance_median'] == pytest.approx(10.15)
+    assert stats[0]['nav_p25'] == 95.75
+
+    stats = services.get_stats(db, {'group_by': 'manager_name'})
+    assert [(group['manager_name'], group['count']) for group in stats] == [('Alice Johnson', 1), ('Bob Smith', 1)]
+
+
+def test_get_stats_invalid_group():
+    """Test the statistics cannot be grouped by an unknown field."""
+    db = FakeDb()
+    with pytest.raises(exceptions.InvalidInputError):
+        services.get_stats(db, {'group_by': 'name'})
+
+
+def test_update_performance_if_match():
+    """Test the performance is only updated if the fund still has one of the expected tags."""
+    db = FakeDb()
+    tag, _ = services.get_fund_version(db, 1001)
+    with pytest.raises(exceptions.PreconditionFailedError):
+        services.update_performance(db, 1001, {'performance': 1.0}, if_match={'outdated'})
+    assert db.get_fund(1001)['performance'] == 12.5
+
+    services.update_performance(db, 1001, {'performance': 1.0}, if_match={tag})
+    assert db.get_fund(1001)['performance'] == 1.0
+    assert services.get_fund_version(db, 1001)[0] != tag
+
+    with pytest.raises(exceptions.NotFoundError):
+        services.get_fund_version(db, 1)
+
+
+def test_async_services():
+    """Test the async services return what the services do."""
+    db = FakeDb()
+    async_db = AsyncFakeDb(FakeDb())
+    new_fund = {**db.get_fund(1001), 'id': 1}
+    calls = [
+        ('add_fund', new_fund),
+        ('get_fund', 1),
+        ('get_funds', {'limit': '2', 'fields': 'nav'}),
+        ('get_funds', {'sort': '-performance', 'limit': '1'}),
+        ('get_stats', {'group_by': 'year'}),
+        ('update_performance', 1, {'performance': 3.5}),
+        ('get_fund_version', 1),
+        ('update_performances', [{'id': 1, 'performance': 4.5}]),
+        ('get_version',),
+        ('delete_fund', 1),
+        ('add_funds', [new_fund]),
+        ('delete_funds', [1]),
+    ]
+
+    async def run_async():
+        return [await getattr(async_services, name)(async_db, *args) for name, *args in calls]
+
+    assert asyncio.run(run_async()) == [getattr(services, name)(db, *args) for name, *args in calls]
+    assert async_db.db._data == db._data
+
+
+def test_async_services_invalid_input():
+    """Test the async services raise the errors of the services."""
+    async_db = AsyncFakeDb(FakeDb())
+    items = [{**FakeDb().get_fund(1001), 'id': 1}, {**FakeDb().get_fund(1001), 'id': 1}, {'id': 2}]
+
+    async def check():
+        with pytest.raises(exceptions.BatchError) as exc_info:
+            await async_services.add_funds(async_db, items)
+        assert [error['index'] for error in exc_info.value.errors] == [1, 2]
+
+        with pytest.raises(exceptions.NotFoundError):
+            await async_services.update_performance(async_db, 1, {'performance': 1.0})
+        with pytest.raises(exceptions.PreconditionFailedError):
+            await async_services.update_performance(async_db, 1001, {'performance': 1.0}, if_match={'outdated'})
+        with pytest.raises(exceptions.InvalidInputError):
+            await async_services.get_funds(async_db, {'limit': '0'})
+
+    asyncio.run(check())
+    assert async_db.db.get_fund(1001)['performance'] == 12.5
+    assert not async_db.db.exists(1)
+
+
+def test_async_iter_funds():
+    """Test the async listing iterator pages through every fund."""
+    async_db = AsyncFakeDb(FakeDb())
+
+    async def collect(args):
+        return [fund['id'] async for fund in async_services.iter_funds(async_db, args, batch_size=1)]
+
+    assert asyncio.run(collect({})) == [1001, 3210]
+    assert asyncio.run(collect({'limit': '1'})) == [1001]
+    assert asyncio.run(collect({'sort': '-nav'})) == [1001, 3210]
+    with pytest.raises(exceptions.InvalidInputError):
+        async_services.iter_funds(async_db, {'sort': 'name'})
+
+
+def _performances(points):
+    return [point['performance'] for point in points]
+
+
+def test_get_history(tmp_path):
+    """Test every write of a fund is recorded in its history."""
+    db = FakeDb()
+    db.history = HistoryStore(tmp_path / 'history')
+    services.update_performance(db, 1001, {'performance': 1.0})
+    services.add_funds(db, [{**db.get_fund(1001), 'id': 1, 'date': '2020-01-01'}])
+    services.update_performances(db, [{'id': 1, 'performance': 2.0}])
+    services.update_performance(db, 1, {'performance': 3.0})
+
+    assert _performances(services.get_history(db, 1001, {})) == [1.0]
+    assert _performances(services.get_history(db, 1, {})) == [1.0, 2.0, 3.0]
+    assert _performances(services.get_history(db, 1, {'points': '1'})) == [3.0]
+    assert services.get_history(db, 1, {'to': '2020-12-31'}) == []
+
+    services.delete_funds(db, [1])
+    services.add_fund(db, {**db.get_fund(1001), 'id': 1})
+    assert _performances(services.get_history(db, 1, {})) == [1.0]
+    assert asyncio.run(async_services.get_history(AsyncFakeDb(db), 1, {'from': '2021-05-01'})) == (
+        services.get_history(db, 1, {})
+    )
+
+
+def test_history_of_fund_with_any_date(tmp_path):
+    """Test funds whose date is not formatted yyyy-mm-dd are written and recorded."""
+    db = FakeDb()
+    db.history = HistoryStore(tmp_path / 'history')
+    services.add_fund(db, {**db.get_fund(1001), 'id': 1, 'date': '2021/05/01'})
+    services.update_performance(db, 1, {'performance': 2.0})
+
+    assert db.get_fund(1)['performance'] == 2.0
+    assert _performances(services.get_history(db, 1, {})) == [12.5, 2.0]
+
+
+@pytest.mark.parametrize('args', [{'from': '2021-13-01'}, {'to': 'today'}, {'points': '0'}])
+def test_get_history_invalid_input(tmp_path, args):
+    """Test the history range and number of points are validated."""
+    db = FakeDb()
+    db.history = HistoryStore(tmp_path / 'history')
+    with pytest.raises(exceptions.InvalidInputError):
+        services.get_history(db, 1001, args)
+
+
+def test_get_history_not_found(tmp_path):
+    """Test the history of an unknown fund, or without a history store, is not found."""
+    db = FakeDb()
+    with pytest.raises(exceptions.NotFoundError):
+        services.get_history(db, 1001, {})
+
+    db.history = HistoryStore(tmp_path / 'history')
+    with pytest.raises(exceptions.NotFoundError):
+        services.get_history(db, 1, {})